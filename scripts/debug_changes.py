@@ -1,81 +1,117 @@
 #!/usr/bin/env python3
+"""
+Depuração da estratégia "documento inteiro": pede a edição com o documento completo
+de volta em ```prompt-completo``` e mede, por diff de linhas, o que foi preservado,
+perdido ou inserido. Resposta e diff ficam em out/debug_response.txt e out/debug_diff.patch.
+"""
+import argparse
 import os
-import requests
 import re
-import json
-from difflib import SequenceMatcher
 
-API_URL = 'https://api.openai.com/v1/chat/completions'
-API_KEY = os.environ.get('OPENAI_API_KEY')
-
-with open('tests/fixtures/master_prompt.txt', 'r', encoding='utf-8') as f:
-    master_prompt = f.read()
+from prompt_edit import profiling
+from prompt_edit.corpus import load_master_prompt
+from prompt_edit.diff import preservation, unified_diff
+from prompt_edit.profiling import span
 
 ADDED_LINE = '* Sempre memorize o nome do cliente durante a conversa.'
+DOCUMENT_RE = re.compile(r'```prompt-completo\s*([\s\S]*)\n\s*```', re.IGNORECASE)  # guloso: o documento tem blocos de código
 
-system = (
+SYSTEM = (
     'Você é um editor simples de texto que faz edições cirúrgicas em documentos.\n'
     'Preservar: 100% da estrutura, espaçamento, quebras de linha.\n'
     'Fazer: APENAS a mudança pedida.\n'
     'Retornar: documento inteiro em ```prompt-completo```'
 )
 
-instruction = (
-    f'DOCUMENTO:\n```prompt-completo\n{master_prompt}\n```\n\n'
-    f'TAREFA: Adicione ao final da seção "## 3) Tecnologias padrão" a linha:\n{ADDED_LINE}\n'
-    f'Responda com o documento inteiro em ```prompt-completo```'
-)
 
-headers = {'Authorization': f'Bearer {API_KEY}', 'Content-Type': 'application/json'}
-
-payload = {
-    'model': 'gpt-5.1',
-    'messages': [
-        {'role': 'system', 'content': system},
-        {'role': 'user', 'content': instruction}
-    ],
-    'temperature': 0,
-}
-
-r = requests.post(API_URL, headers=headers, data=json.dumps(payload), timeout=120)
-data = r.json()
-text = data['choices'][0]['message']['content']
-
-# Save response to file for inspection
-with open('out/debug_response.txt', 'w', encoding='utf-8') as f:
-    f.write("=== RESPOSTA COMPLETA ===\n")
-    f.write(text)
-    f.write("\n\n=== FIM RESPOSTA ===\n")
-
-m = re.search(r'```prompt-completo\s*([\s\S]*?)\s*```', text, re.IGNORECASE)
-updated = m.group(1).strip() if m else ''
-
-print(f"Resposta salva em out/debug_response.txt")
-print(f"Tamanho total: {len(text)} chars")
-if m:
-    print(f"Bloco extraído: {len(m.group(0))} chars")
-    print(f"Conteúdo extraído: {len(updated)} chars")
-else:
-    print("Não encontrou bloco ```prompt-completo```")
-
-# Find first 500 chars of each
-print("ORIGINAL (primeiros 500 chars):")
-print(repr(master_prompt[:500]))
-print("\nATUALIZADO (primeiros 500 chars):")
-print(repr(updated[:500]))
-
-# Find where they start to differ
-for i, (c1, c2) in enumerate(zip(master_prompt, updated)):
-    if c1 != c2:
-        print(f"\nPrimeira diferença em índice {i}:")
-        print(f"  Original: {repr(master_prompt[max(0,i-50):i+50])}")
-        print(f"  Atualizado: {repr(updated[max(0,i-50):i+50])}")
-        break
-
-# Count line count differences
-orig_lines = master_prompt.count('\n')
-updated_lines = updated.count('\n')
-print(f"\nLinhas original: {orig_lines}")
-print(f"Linhas atualizado: {updated_lines}")
-print(f"Chars original: {len(master_prompt)}")
-print(f"Chars atualizado: {len(updated)}")
+def build_payload(master_prompt: str, model: str = 'gpt-5.1') -> dict:
+    instruction = (
+        f'DOCUMENTO:\n```prompt-completo\n{master_prompt}\n```\n\n'
+        f'TAREFA: Adicione ao final da seção "## 3) Tecnologias padrão" a linha:\n{ADDED_LINE}\n'
+        f'Responda com o documento inteiro em ```prompt-completo```'
+    )
+    return {
+        'model': model,
+        'messages': [
+            {'role': 'system', 'content': SYSTEM},
+            {'role': 'user', 'content': instruction}
+        ],
+        'temperature': 0,
+    }
+
+
+def extract_document(text: str):
+    """(bloco encontrado, documento extraído) da resposta; ('', '') se não houver bloco"""
+    with span("extract"):
+        m = DOCUMENT_RE.search(text)
+        return (m.group(0), m.group(1).strip()) if m else ('', '')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Depura a estratégia de documento inteiro (preservação por diff)')
+    parser.add_argument('--model', default='gpt-5.1')
+    parser.add_argument('--output-dir', default='out')
+    args = parser.parse_args(argv)
+
+    from prompt_edit.cache import ResponseCache
+    from prompt_edit.client import ChatClient
+
+    master_prompt = load_master_prompt()
+    cache = ResponseCache.from_env()  # PROMPT_EDIT_CACHE=record|replay|passthrough
+    profiling.configure_from_env()  # PROMPT_EDIT_TRACE=out/trace.json, PROMPT_EDIT_PROFILE=1
+    with ChatClient(api_key=os.environ.get('OPENAI_API_KEY'), timeout=120, cache=cache) as client:
+        text = client.chat(build_payload(master_prompt, args.model)).content
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    response_path = os.path.join(args.output_dir, 'debug_response.txt')
+    diff_path = os.path.join(args.output_dir, 'debug_diff.patch')
+
+    # Save response to file for inspection
+    with open(response_path, 'w', encoding='utf-8') as f:
+        f.write("=== RESPOSTA COMPLETA ===\n")
+        f.write(text)
+        f.write("\n\n=== FIM RESPOSTA ===\n")
+
+    block, updated = extract_document(text)
+
+    print(f"Resposta salva em {response_path}")
+    print(f"Tamanho total: {len(text)} chars")
+    if block:
+        print(f"Bloco extraído: {len(block)} chars")
+        print(f"Conteúdo extraído: {len(updated)} chars")
+    else:
+        print("Não encontrou bloco ```prompt-completo```")
+
+    # Find first 500 chars of each
+    print("ORIGINAL (primeiros 500 chars):")
+    print(repr(master_prompt[:500]))
+    print("\nATUALIZADO (primeiros 500 chars):")
+    print(repr(updated[:500]))
+
+    # Diff por linhas: onde o modelo preservou, perdeu ou inseriu conteúdo
+    with span("preservation"):
+        report = preservation(master_prompt, updated, expected_lines=[ADDED_LINE])
+    with span("unified_diff"):
+        diff_text = unified_diff(master_prompt.split('\n'), updated.split('\n'), codes=report.opcodes)
+    with open(diff_path, 'w', encoding='utf-8') as f:
+        f.write(diff_text)
+
+    summary = report.summary()
+    print(f"\nLinhas original: {summary['original_lines']}")
+    print(f"Linhas atualizado: {summary['updated_lines']}")
+    print(f"Chars original: {len(master_prompt)}")
+    print(f"Chars atualizado: {len(updated)}")
+    print(f"\nPreservação: {summary['preservation_ratio']:.2%} ({summary['preserved_lines']} linhas intactas)")
+    print(f"  Inserções esperadas: {summary['expected_insertions']}")
+    print(f"  Inserções inesperadas: {summary['unexpected_insertions']}")
+    print(f"  Perdas inesperadas: {summary['unexpected_losses']}")
+    print(f"  Só espaços/linhas em branco: {summary['whitespace_only']}")
+    for line in report.unexpected_losses[:10]:
+        print(f"    - {line[:100]}")
+    print(f"Diff completo salvo em {diff_path}")
+    profiling.finish()
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -3,23 +3,28 @@
 Estratégia fallback: em vez de pedir GPT retornar documento inteiro (que trunca),
 pedir APENAS as mudanças em JSON. Cliente injeta no documento original.
 Isso evita o problema de truncamento e garante 100% preservação.
+
+Benchmark: várias repetições por (modelo, estratégia, documento), com warmup e
+níveis de concorrência; relatório com p50/p90/p99, tokens/s, JSON válido e acerto
+da linha-alvo em out/models_test_report.json. Cada rodada também vai, amostra por
+amostra, para o histórico em out/runs.sqlite (python -m prompt_edit runs compare).
 """
 import os
-import requests
-import re
-import json
-import time
-
-MODELS = ['gpt-5.1', 'gpt-4o']
+import argparse
+from collections import Counter
 
-API_URL = 'https://api.openai.com/v1/chat/completions'
-API_KEY = os.environ.get('OPENAI_API_KEY')
-if not API_KEY:
-    print('ERROR: OPENAI_API_KEY not set')
-    exit(1)
+from prompt_edit import profiling
+from prompt_edit.bench import best_row, format_row, run_benchmark, summarize, write_report
+from prompt_edit.corpus import load_master_prompt
+from prompt_edit.edits import CHANGE_SCHEMA, response_format
+from prompt_edit.layout import build_messages, cached_tokens, prompt_cache_key
+from prompt_edit.planner import Planner
+from prompt_edit.ratelimit import RateLimiter
+from prompt_edit.runs import RunStore, sample
+from prompt_edit.synth import generate, parse_size
+from prompt_edit.tokens import TokenEstimator
 
-with open('tests/fixtures/master_prompt.txt', 'r', encoding='utf-8') as f:
-    master_prompt = f.read()
+MODELS = ['gpt-5.1', 'gpt-4o']
 
 ADDED_LINE = '* Sempre memorize o nome do cliente durante a conversa.'
 
@@ -30,8 +35,7 @@ system = (
     'Formato: {"section": "nome da seção", "lineToAdd": "texto", "position": "after"}'
 )
 
-instruction = (
-    f'DOCUMENTO:\n```\n{master_prompt}\n```\n\n'
+task = (
     f'TAREFA:\nAdicione esta linha ao final da seção "## 3) Tecnologias padrão":\n'
     f'{ADDED_LINE}\n'
     f'\n'
@@ -39,89 +43,216 @@ instruction = (
     f'{{"section": "## 3) Tecnologias padrão", "lineToAdd": "{ADDED_LINE}", "position": "after"}}'
 )
 
-headers = {'Authorization': f'Bearer {API_KEY}', 'Content-Type': 'application/json'}
 
-results = []
-success_model = None
-
-for idx, model in enumerate(MODELS):
-    print(f'\n[{idx+1}/{len(MODELS)}] Testando: {model}')
-    
-    payload = {
+def json_only(model, document):
+    return {
         'model': model,
-        'messages': [
-            {'role': 'system', 'content': system},
-            {'role': 'user', 'content': instruction}
-        ],
+        # Prefixo estável (system → documento), tarefa por último: aproveita o cache de prompts
+        'messages': build_messages(system, f'```\n{document}\n```', task),
         'temperature': 0,
+        # Mesmo documento -> mesmo servidor de cache entre repetições e modelos
+        'prompt_cache_key': prompt_cache_key(document),
     }
-    
-    start = time.time()
-    try:
-        r = requests.post(API_URL, headers=headers, data=json.dumps(payload), timeout=120)
-        r.raise_for_status()
-        data = r.json()
-        text = data['choices'][0]['message']['content']
-        duration = time.time() - start
-
-        # Extract JSON
-        m = re.search(r'\{[\s\S]*\}', text)
-        if m:
-            change = json.loads(m.group(0))
-            section = change.get('section', '')
-            line = change.get('lineToAdd', '')
-            
-            # Simulate client-side injection
-            if section in master_prompt and line:
-                # Find section and add line after it
-                section_end = master_prompt.find(section)
-                if section_end != -1:
-                    # Find end of section line
-                    next_newline = master_prompt.find('\n', section_end + len(section))
-                    if next_newline != -1:
-                        updated = master_prompt[:next_newline+1] + line + '\n' + master_prompt[next_newline+1:]
-                        has_line = line in updated
-                        
-                        result = {
-                            'model': model,
-                            'status': 'success',
-                            'has_target_line': has_line,
-                            'preserved_ratio': 1.0 if len(updated) > len(master_prompt) else 0.99,
-                            'duration_s': round(duration, 2),
-                            'tokens': data.get('usage', {}).get('total_tokens', 'N/A'),
-                            'extracted_json': change
-                        }
-                        
-                        print(f'  ✓ Extraiu JSON corretamente')
-                        print(f'  • Tem linha? {has_line}')
-                        
-                        if has_line:
-                            print(f'  ✅ FUNCIONA! {model}')
-                            success_model = model
-                            break
-                    else:
-                        result = {'model': model, 'status': 'error', 'error': 'Não encontrou seção'}
-                else:
-                    result = {'model': model, 'status': 'error', 'error': 'Seção não reconhecida'}
-            else:
-                result = {'model': model, 'status': 'error', 'error': 'JSON inválido ou seção vazia'}
+
+
+def json_schema(model, document):
+    return {**json_only(model, document), 'response_format': response_format()}
+
+
+STRATEGIES = {'json_only': json_only, 'json_schema': json_schema}
+
+# json_only não força o schema: o exemplo do prompt não tem "explanation"
+ACCEPT_SCHEMAS = {
+    'json_only': {**CHANGE_SCHEMA, 'required': ['section', 'lineToAdd', 'position']},
+    'json_schema': CHANGE_SCHEMA,
+}
+
+
+def print_row(row):
+    print(format_row(row))
+
+
+async def run_hedged(models, strategies, documents, repetitions, delay, limiter, cache=None, samples=None):
+    """
+    --hedge: cada edição vai ao primário (models[0]) e, a cada `delay` s sem resposta
+    válida, ao próximo modelo; a primeira resposta aprovada vence e o resto é cancelado.
+    Cada edição entra em `samples` (lista de runs.sample) se for passada.
+    """
+    from prompt_edit.client import AsyncChatClient
+    from prompt_edit.hedge import HedgeFailed, edit_acceptor, hedged_chat
+
+    rows = []
+    async with AsyncChatClient(api_key=os.environ.get('OPENAI_API_KEY'), timeout=120, cache=cache,
+                               limiter=limiter) as aclient:
+        for strategy in strategies:
+            for label, document in documents.items():
+                accept = edit_acceptor(document, ACCEPT_SCHEMAS[strategy], [ADDED_LINE])
+                latencies, winners, launched, failures = [], {}, 0, 0
+                tags = {'model': '>'.join(models), 'strategy': f'hedge_{strategy}', 'document': label,
+                        'document_chars': len(document)}
+                for _ in range(repetitions):
+                    try:
+                        hedged = await hedged_chat(aclient, lambda m: STRATEGIES[strategy](m, document),
+                                                   models, accept, delay)
+                    except HedgeFailed as e:
+                        failures += 1
+                        launched += len(e.attempts)
+                        if samples is not None:
+                            samples.append(sample(**tags, ok=False))
+                        continue
+                    latencies.append(hedged.latency_s)
+                    if samples is not None:
+                        usage = hedged.result.usage
+                        samples.append(sample(**tags, latency_s=hedged.latency_s, valid=True,
+                                              prompt_tokens=usage.get('prompt_tokens', 0),
+                                              completion_tokens=usage.get('completion_tokens', 0),
+                                              cached_tokens=cached_tokens(usage)))
+                    winners[hedged.model] = winners.get(hedged.model, 0) + 1
+                    launched += hedged.launched
+                row = {'models': models, 'strategy': strategy, 'document': label, 'delay_s': delay,
+                       'latency_s': summarize(latencies), 'winners': winners, 'failures': failures,
+                       'requests_per_edit': round(launched / max(1, repetitions), 3)}
+                lat = row['latency_s']
+                print(f"  hedge {'>'.join(models)} {strategy:<12} {label:<10} "
+                      f"p50={lat.get('p50', float('nan')):.2f}s p90={lat.get('p90', float('nan')):.2f}s "
+                      f"p99={lat.get('p99', float('nan')):.2f}s vencedores={winners} "
+                      f"req/edição={row['requests_per_edit']:.2f} falhas={failures}")
+                rows.append(row)
+    return rows
+
+
+def print_plans(planner, models, strategies, documents):
+    """Previsão pré-envio (sem rede) de cada combinação; devolve {(modelo, estratégia, doc): Plan}"""
+    plans = {}
+    print('Pré-envio (estimativa offline):')
+    for label, document in documents.items():
+        for strategy in strategies:
+            for model in models:
+                plan = planner.plan(STRATEGIES[strategy](model, document))
+                plans[(model, strategy, label)] = plan
+                status = '✅' if plan.ok else '⛔'
+                print(f"  {status} {label:<10} {strategy:<12} {plan.describe()}")
+    return plans
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de modelos para a estratégia JSON-only')
+    parser.add_argument('--models', nargs='+', default=MODELS)
+    parser.add_argument('--strategies', nargs='+', default=list(STRATEGIES), choices=list(STRATEGIES))
+    parser.add_argument('--repetitions', type=int, default=5)
+    parser.add_argument('--warmup', type=int, default=1)
+    parser.add_argument('--concurrency', type=int, nargs='+', default=[1])
+    parser.add_argument('--sizes', nargs='*', default=[],
+                        help='Documentos sintéticos extras (ex.: 20k 100k), além da fixture')
+    parser.add_argument('--hedge', action='store_true',
+                        help='Hedge entre --models (primário primeiro): vence a 1ª resposta válida')
+    parser.add_argument('--hedge-delay', type=float, default=1.0,
+                        help='Segundos antes de acionar o próximo modelo (0 = todos de uma vez)')
+    parser.add_argument('--plan-only', action='store_true',
+                        help='Só mostra tokens/latência/custo previstos por combinação, sem chamar a API')
+    parser.add_argument('--output', default='out/models_test_report.json')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    from prompt_edit.cache import ResponseCache
+    from prompt_edit.client import ChatClient, requires_api_key
+
+    api_key = os.environ.get('OPENAI_API_KEY')
+    cache = ResponseCache.from_env()  # PROMPT_EDIT_CACHE=record|replay|passthrough
+    if not api_key and requires_api_key() and not cache.offline and not args.plan_only:  # mock local: OPENAI_BASE_URL
+        print('ERROR: OPENAI_API_KEY not set')
+        return 1
+    master_prompt = load_master_prompt()
+
+    profiling.configure_from_env()  # PROMPT_EDIT_TRACE=out/trace.json, PROMPT_EDIT_PROFILE=1
+    # Limites iniciais via PROMPT_EDIT_RPM/TPM; ajustados ao vivo pelos headers x-ratelimit-*
+    estimator = TokenEstimator.from_env()  # calibrado pelo usage de rodadas anteriores
+    planner = Planner.from_env(estimator)   # PROMPT_EDIT_MAX_COST / _MAX_LATENCY / _MAX_PROMPT_TOKENS
+    limiter = RateLimiter(estimator=estimator)
+    documents = {f'{len(master_prompt) // 1000}k': master_prompt}
+    for size in args.sizes:
+        doc = generate(parse_size(size))
+        documents[f'synth_{doc.size_label}'] = doc.text
+
+    plans = print_plans(planner, args.models, args.strategies, documents)
+    if args.plan_only:
+        return 0
+    refused = sorted({label for (_, _, label), plan in plans.items() if not plan.ok})
+    if refused:
+        # Documento fora do contexto/orçamento em algum modelo não entra na rodada
+        print(f'⛔ Fora do orçamento, ignorados: {", ".join(refused)}')
+        documents = {label: doc for label, doc in documents.items() if label not in refused}
+
+    # Um pool por execução, com conexões suficientes para o maior nível de concorrência
+    with ChatClient(api_key=api_key, timeout=120, cache=cache, max_connections=max(args.concurrency),
+                    limiter=limiter) as client:
+        print(f'Modelos: {", ".join(args.models)} | estratégias: {", ".join(args.strategies)} | '
+              f'repetições: {args.repetitions} (+{args.warmup} warmup) | concorrência: {args.concurrency}')
+
+        samples = []
+        if args.hedge:
+            import asyncio
+            report = {'hedge': asyncio.run(run_hedged(args.models, args.strategies, documents,
+                                                      args.repetitions, args.hedge_delay, limiter, cache, samples))}
+            wins = Counter()
+            for row in report['hedge']:
+                wins.update(row['winners'])
+            success_model = wins.most_common(1)[0][0] if wins else None
+            success_strategy = None
         else:
-            result = {'model': model, 'status': 'error', 'error': 'Sem JSON na resposta'}
-            print(f'  ✗ Resposta: {text[:200]}')
-            
-    except requests.exceptions.HTTPError as e:
-        result = {'model': model, 'status': f'http_{e.response.status_code}'}
-    except Exception as e:
-        result = {'model': model, 'status': 'error', 'error': str(e)}
-    
-    results.append(result)
-    time.sleep(1)
-
-os.makedirs('out', exist_ok=True)
-with open('out/models_test_report.json', 'w', encoding='utf-8') as f:
-    json.dump({'success_model': success_model, 'strategy': 'json_only', 'results': results}, f, indent=2)
-
-if success_model:
-    print(f'\n✅ Estratégia JSON funciona com: {success_model}')
-else:
-    print(f'\n⚠️  Estratégia JSON não funcionou. Ver out/models_test_report.json')
+            def keep_samples(row, measured):
+                tags = {name: row[name] for name in ('model', 'strategy', 'document', 'document_chars', 'concurrency')}
+                samples.extend(sample(**tags, ok=s['ok'], latency_s=s['latency_s'] if s['ok'] else None,
+                                      prompt_tokens=s.get('prompt_tokens'), completion_tokens=s.get('completion_tokens'),
+                                      cached_tokens=s.get('cached_tokens'), valid=s.get('json_valid', False))
+                               for s in measured)
+
+            report = run_benchmark(
+                lambda payload: client.chat(payload).data,
+                models=args.models,
+                strategies={name: STRATEGIES[name] for name in args.strategies},
+                documents=documents,
+                target_line=ADDED_LINE,
+                repetitions=args.repetitions,
+                warmup=args.warmup,
+                concurrency_levels=args.concurrency,
+                on_result=print_row,
+                on_samples=keep_samples,
+            )
+            best = best_row(report)
+            success_model, success_strategy = (best['model'], best['strategy']) if best else (None, None)
+            report['success_model'] = success_model
+            report['success_strategy'] = success_strategy
+
+        report['strategies'] = args.strategies
+        report['rate_limits'] = limiter.stats()
+        report['token_calibration'] = estimator.calibration()
+        for row in report.get('results', ()):
+            plan = plans[(row['model'], row['strategy'], row['document'])]
+            row['predicted'] = plan.as_dict()
+        estimator.save()
+
+    os.makedirs(os.path.dirname(args.output) or '.', exist_ok=True)
+    write_report(report, args.output)
+    store = RunStore.from_env()  # PROMPT_EDIT_RUNS_DB=out/runs.sqlite, PROMPT_EDIT_RUNS=0 desliga
+    run_id = store.record('models', samples, meta={
+        'base_url': os.environ.get('OPENAI_BASE_URL', ''), 'cache': cache.mode, 'hedge': args.hedge,
+        'repetitions': args.repetitions, 'warmup': args.warmup, 'concurrency': args.concurrency,
+    })
+    store.close()
+    if run_id:
+        print(f'🗄️ Rodada {run_id} gravada em {store.path} (python -m prompt_edit runs compare)')
+    profiling.finish()
+
+    if success_model:
+        print(f'\n✅ Estratégia JSON funciona com: {success_model}'
+              + (f' (melhor estratégia: {success_strategy})' if success_strategy else ''))
+    else:
+        print(f'\n⚠️  Estratégia JSON não funcionou. Ver {args.output}')
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
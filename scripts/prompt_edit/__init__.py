@@ -0,0 +1,5 @@
+"""
+Ferramentas de edição de prompts usadas pelos scripts de teste/benchmark.
+
+Os módulos deste pacote não fazem I/O nem chamadas de rede ao serem importados.
+"""
@@ -0,0 +1,6 @@
+"""python -m prompt_edit <subcomando> ... (ver prompt_edit.cli)"""
+import sys
+
+from prompt_edit.cli import main
+
+sys.exit(main())
@@ -0,0 +1,241 @@
+"""
+Avaliações noturnas pela Batch API: compila o corpus em JSONL e ingere os resultados.
+
+Entrada (uma requisição por linha, formato da Batch API):
+    {"custom_id": "<id do cenário>|<hash do payload>", "method": "POST",
+     "url": "/v1/chat/completions", "body": {...payload...}}
+O custom_id é estável: o mesmo cenário com o mesmo payload gera o mesmo id, e um
+prompt alterado gera outro (resultados antigos não se misturam aos novos).
+Arquivos acima dos limites da API (50 000 requisições / 200 MB) são divididos em
+partes. A saída ({"custom_id", "response": {"status_code", "body"}, "error"}) é
+lida em streaming e cada linha vira um ChatResult, para passar pela mesma
+pontuação do modo interativo.
+
+`run_local` é o substituto local: responde cada linha com o MockBackend do
+mockserver, sem rede, e grava um arquivo de saída no mesmo formato.
+
+    python -m prompt_edit.batch local out/batch/input.jsonl out/batch/output.jsonl \\
+        --fixtures tests/fixtures/mock_responses.jsonl
+    python -m prompt_edit.batch submit out/batch/input.jsonl out/batch/output.jsonl
+"""
+import argparse
+import json
+import os
+import time
+import uuid
+from dataclasses import dataclass
+
+import httpx
+
+from prompt_edit.cache import cache_key
+from prompt_edit.client import DEFAULT_BASE_URL, ChatResult
+
+CHAT_ENDPOINT = "/v1/chat/completions"
+MAX_REQUESTS = 50_000
+MAX_BYTES = 200 * 1024 * 1024
+ID_SEPARATOR = "|"
+TERMINAL_STATES = {"completed", "failed", "expired", "cancelled"}
+
+
+def custom_id(item_id: str, payload: dict) -> str:
+    return f"{item_id}{ID_SEPARATOR}{cache_key(payload)[:12]}"
+
+
+def item_id(custom: str) -> str:
+    """Id do cenário de volta a partir do custom_id"""
+    return custom.rsplit(ID_SEPARATOR, 1)[0]
+
+
+def _part_path(path: str, part: int) -> str:
+    if part == 1:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}.part{part}{ext}"
+
+
+def write_batch(items, path: str, max_requests: int = MAX_REQUESTS, max_bytes: int = MAX_BYTES) -> list:
+    """
+    `items`: iterável (id, payload), consumido em streaming. Devolve [(arquivo, requisições)];
+    custom_ids repetidos (mesmo cenário e payload) entram uma vez só.
+    """
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    parts = []
+    seen = set()
+    part = count = size = 0
+    f = None
+    try:
+        for key, payload in items:
+            custom = custom_id(key, payload)
+            if custom in seen:
+                continue
+            seen.add(custom)
+            line = (json.dumps({"custom_id": custom, "method": "POST", "url": CHAT_ENDPOINT, "body": payload},
+                               ensure_ascii=False, separators=(",", ":")) + "\n").encode("utf-8")
+            if f is None or count >= max_requests or size + len(line) > max_bytes:
+                if f is not None:
+                    f.close()
+                    parts.append((_part_path(path, part), count))
+                part += 1
+                f = open(_part_path(path, part), "wb")
+                count = size = 0
+            f.write(line)
+            count += 1
+            size += len(line)
+    finally:
+        if f is not None:
+            f.close()
+            parts.append((_part_path(path, part), count))
+    return parts
+
+
+@dataclass
+class BatchOutcome:
+    custom_id: str
+    status: int
+    result: ChatResult = None      # None quando a requisição falhou
+    error: str = ""
+
+    @property
+    def id(self) -> str:
+        return item_id(self.custom_id)
+
+
+def iter_output(path: str):
+    """BatchOutcome por linha do arquivo de saída (ou de erros) da Batch API"""
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            response = record.get("response") or {}
+            status = response.get("status_code") or 0
+            body = response.get("body") or {}
+            if record.get("error") or status != 200:
+                error = record.get("error") or body.get("error") or {}
+                message = error.get("message") if isinstance(error, dict) else str(error)
+                yield BatchOutcome(record["custom_id"], status, error=message or f"HTTP {status}")
+                continue
+            yield BatchOutcome(record["custom_id"], status, ChatResult(
+                content=body["choices"][0]["message"]["content"] or "",
+                usage=body.get("usage") or {},
+                latency_s=0.0,
+                status=status,
+                data=body,
+            ))
+
+
+def run_local(input_path: str, output_path: str, backend) -> int:
+    """Substituto local da Batch API: responde cada linha com um mockserver.MockBackend"""
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    done = 0
+    with open(input_path, "r", encoding="utf-8") as src, open(output_path, "w", encoding="utf-8") as out:
+        for line in src:
+            if not line.strip():
+                continue
+            request = json.loads(line)
+            plan = backend.respond(request["body"])
+            record = {"id": f"batch_req_{uuid.uuid4().hex[:12]}", "custom_id": request["custom_id"], "error": None}
+            if plan["status"] != 200:
+                record["response"] = {"status_code": plan["status"], "body": {
+                    "error": {"message": "Rate limit reached (mock)", "type": "rate_limit_exceeded"}}}
+            else:
+                record["response"] = {"status_code": 200, "request_id": uuid.uuid4().hex, "body": {
+                    "id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+                    "object": "chat.completion",
+                    "created": int(time.time()),
+                    "model": plan["model"],
+                    "choices": [{"index": 0, "message": {"role": "assistant", "content": plan["content"]},
+                                 "finish_reason": plan["finish_reason"]}],
+                    "usage": plan["usage"],
+                }}
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            done += 1
+    return done
+
+
+class BatchAPI:
+    """Files + Batches da API (upload, criação, acompanhamento e download)."""
+
+    def __init__(self, api_key: str = None, base_url: str = None, timeout: float = 120.0):
+        base_url = (base_url or os.environ.get("OPENAI_BASE_URL") or DEFAULT_BASE_URL).rstrip("/")
+        api_key = api_key or os.environ.get("OPENAI_API_KEY")
+        headers = {"Authorization": f"Bearer {api_key}"} if api_key else {}
+        self.http = httpx.Client(base_url=base_url, headers=headers, timeout=timeout)
+
+    def _check(self, response: httpx.Response) -> httpx.Response:
+        if response.status_code >= 400:
+            raise RuntimeError(f"Batch API HTTP {response.status_code}: {response.text[:300]}")
+        return response
+
+    def upload(self, path: str) -> str:
+        with open(path, "rb") as f:
+            response = self.http.post("/files", data={"purpose": "batch"},
+                                      files={"file": (os.path.basename(path), f, "application/jsonl")})
+        return self._check(response).json()["id"]
+
+    def create(self, file_id: str, metadata: dict = None) -> dict:
+        body = {"input_file_id": file_id, "endpoint": CHAT_ENDPOINT, "completion_window": "24h"}
+        if metadata:
+            body["metadata"] = metadata
+        return self._check(self.http.post("/batches", json=body)).json()
+
+    def get(self, batch_id: str) -> dict:
+        return self._check(self.http.get(f"/batches/{batch_id}")).json()
+
+    def download(self, file_id: str, path: str):
+        with self.http.stream("GET", f"/files/{file_id}/content") as response:
+            self._check(response)
+            with open(path, "wb") as f:
+                for chunk in response.iter_bytes():
+                    f.write(chunk)
+
+    def run(self, input_path: str, output_path: str, poll_s: float = 30.0, on_status=None) -> dict:
+        """Envia, espera o lote terminar e baixa saída (+ erros em <saída>.errors.jsonl)"""
+        batch = self.create(self.upload(input_path), {"source": os.path.basename(input_path)})
+        while batch["status"] not in TERMINAL_STATES:
+            if on_status:
+                on_status(batch)
+            time.sleep(poll_s)
+            batch = self.get(batch["id"])
+        if batch.get("output_file_id"):
+            self.download(batch["output_file_id"], output_path)
+        if batch.get("error_file_id"):
+            root, ext = os.path.splitext(output_path)
+            self.download(batch["error_file_id"], f"{root}.errors{ext}")
+        return batch
+
+    def close(self):
+        self.http.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Batch API: execução local (mock) ou envio real")
+    sub = parser.add_subparsers(dest="command", required=True)
+    local = sub.add_parser("local", help="Gera a saída com o MockBackend, sem rede")
+    local.add_argument("input")
+    local.add_argument("output")
+    local.add_argument("--fixtures", help="Regras JSONL do mockserver")
+    local.add_argument("--seed", type=int, default=0)
+    submit = sub.add_parser("submit", help="Envia à Batch API e espera o resultado")
+    submit.add_argument("input")
+    submit.add_argument("output")
+    submit.add_argument("--poll", type=float, default=30.0)
+    args = parser.parse_args(argv)
+
+    if args.command == "local":
+        from prompt_edit.mockserver import MockBackend, load_rules
+        backend = MockBackend(profile="instant", rules=load_rules(args.fixtures) if args.fixtures else (),
+                              seed=args.seed)
+        print(f"{run_local(args.input, args.output, backend)} respostas em {args.output}")
+        return
+    api = BatchAPI()
+    try:
+        batch = api.run(args.input, args.output, args.poll,
+                        on_status=lambda b: print(f"{b['id']}: {b['status']} {b.get('request_counts', {})}"))
+    finally:
+        api.close()
+    print(f"{batch['id']}: {batch['status']} {batch.get('request_counts', {})}")
+
+
+if __name__ == "__main__":
+    main()
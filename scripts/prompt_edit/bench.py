@@ -0,0 +1,241 @@
+"""
+Harness de benchmark para as estratégias de edição (latência, throughput e acerto).
+
+Para cada (modelo, estratégia, documento) e cada nível de concorrência: descarta
+`warmup` chamadas e mede `repetitions` amostras. O relatório traz p50/p90/p99 de
+latência, tokens/s, taxa de JSON válido e taxa de acerto da linha-alvo, em um JSON
+estável (chaves ordenadas, uma linha por combinação) fácil de comparar entre execuções.
+
+    python -m prompt_edit.bench out/models_test_report.json [relatório-base.json]
+"""
+import argparse
+import json
+import math
+import re
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from prompt_edit.edits import apply_change
+from prompt_edit.layout import cached_tokens
+from prompt_edit.outline import outline_for
+
+JSON_BLOCK_RE = re.compile(r'\{[\s\S]*\}')
+
+
+def percentile(values: list, q: float) -> float:
+    """Percentil com interpolação linear (q em 0..100)"""
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    pos = (len(ordered) - 1) * q / 100
+    lo, hi = math.floor(pos), math.ceil(pos)
+    return ordered[lo] + (ordered[hi] - ordered[lo]) * (pos - lo)
+
+
+def summarize(values: list) -> dict:
+    if not values:
+        return {"n": 0}
+    return {
+        "n": len(values),
+        "mean": round(statistics.fmean(values), 4),
+        "stdev": round(statistics.stdev(values), 4) if len(values) > 1 else 0.0,
+        "p50": round(percentile(values, 50), 4),
+        "p90": round(percentile(values, 90), 4),
+        "p99": round(percentile(values, 99), 4),
+        "min": round(min(values), 4),
+        "max": round(max(values), 4),
+    }
+
+
+def score_response(document: str, text: str, target_line: str) -> dict:
+    """JSON válido? Seção existe no documento? A linha-alvo entrou no documento final?"""
+    m = JSON_BLOCK_RE.search(text or "")
+    if not m:
+        return {"json_valid": False, "section_found": False, "section_confidence": 0.0, "target_hit": False}
+    try:
+        change = json.loads(m.group(0))
+    except ValueError:
+        return {"json_valid": False, "section_found": False, "section_confidence": 0.0, "target_hit": False}
+    if not isinstance(change, dict) or not {"section", "lineToAdd"} <= change.keys():
+        return {"json_valid": False, "section_found": False, "section_confidence": 0.0, "target_hit": False}
+
+    match = outline_for(document).match(change["section"])
+    section_found = match is not None
+    change.setdefault("position", "after")
+    updated = apply_change(document, change) if section_found else document
+    return {
+        "json_valid": True,
+        "section_found": section_found,
+        "section_confidence": match.confidence if match else 0.0,
+        "target_hit": section_found and target_line in updated,
+    }
+
+
+def measure(send, payload: dict, document: str, target_line: str) -> dict:
+    start = time.perf_counter()
+    try:
+        data = send(payload)
+        latency = time.perf_counter() - start
+        # Resposta vazia ou malformada é amostra com falha, não aborta o benchmark
+        usage = data.get("usage") or {}
+        text = data["choices"][0]["message"]["content"]
+    except Exception as e:
+        return {"ok": False, "latency_s": time.perf_counter() - start, "error": str(e)[:200]}
+
+    completion = usage.get("completion_tokens", 0)
+    sample = {
+        "ok": True,
+        "latency_s": latency,
+        "prompt_tokens": usage.get("prompt_tokens", 0),
+        "cached_tokens": cached_tokens(usage),
+        "completion_tokens": completion,
+        "tokens_per_sec": completion / latency if latency > 0 else 0.0,
+    }
+    sample.update(score_response(document, text, target_line))
+    return sample
+
+
+def aggregate(samples: list) -> dict:
+    ok = [s for s in samples if s["ok"]]
+    n = len(samples)
+    return {
+        "samples": n,
+        "errors": n - len(ok),
+        "latency_s": summarize([s["latency_s"] for s in ok]),
+        "tokens_per_sec": summarize([s["tokens_per_sec"] for s in ok]),
+        "prompt_tokens": summarize([s["prompt_tokens"] for s in ok]),
+        "completion_tokens": summarize([s["completion_tokens"] for s in ok]),
+        "cache_hit_ratio": round(sum(s["cached_tokens"] for s in ok) / max(1, sum(s["prompt_tokens"] for s in ok)), 4),
+        "json_valid_rate": round(sum(s["json_valid"] for s in ok) / n, 4) if n else 0.0,
+        "target_hit_rate": round(sum(s["target_hit"] for s in ok) / n, 4) if n else 0.0,
+        "section_confidence": summarize([s["section_confidence"] for s in ok if s["section_found"]]),
+    }
+
+
+def run_benchmark(send, models: list, strategies: dict, documents: dict, target_line: str,
+                  repetitions: int = 5, warmup: int = 1, concurrency_levels=(1,),
+                  on_result=None, on_samples=None) -> dict:
+    """
+    `send(payload) -> resposta JSON`; `strategies` mapeia nome -> build(model, document) -> payload;
+    `documents` mapeia rótulo -> texto. `on_result(linha)` é chamado a cada combinação medida e
+    `on_samples(linha, amostras)` recebe as amostras cruas dela (histórico de rodadas).
+    """
+    rows = []
+    for model in models:
+        for strategy, build in strategies.items():
+            for doc_label, document in documents.items():
+                payload = build(model, document)
+                for concurrency in concurrency_levels:
+                    for _ in range(warmup):
+                        measure(send, payload, document, target_line)
+
+                    started = time.perf_counter()
+                    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+                        samples = list(pool.map(
+                            lambda _: measure(send, payload, document, target_line),
+                            range(repetitions)
+                        ))
+                    wall = time.perf_counter() - started
+
+                    row = {
+                        "model": model,
+                        "strategy": strategy,
+                        "document": doc_label,
+                        "document_chars": len(document),
+                        "concurrency": concurrency,
+                        "wall_s": round(wall, 4),
+                        "throughput_rps": round(repetitions / wall, 4) if wall > 0 else 0.0,
+                        **aggregate(samples),
+                        "error_examples": sorted({s["error"] for s in samples if not s["ok"]})[:3],
+                    }
+                    rows.append(row)
+                    if on_result:
+                        on_result(row)
+                    if on_samples:
+                        on_samples(row, samples)
+
+    return {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "repetitions": repetitions,
+            "warmup": warmup,
+            "concurrency_levels": list(concurrency_levels),
+            "target_line": target_line,
+        },
+        "results": rows,
+    }
+
+
+def best_row(report: dict):
+    """Melhor combinação: maior acerto da linha-alvo, depois menor p50 (None se nenhuma acerta)"""
+    candidates = [r for r in report["results"] if r["target_hit_rate"] > 0]
+    if not candidates:
+        return None
+    return min(candidates, key=lambda r: (-r["target_hit_rate"], r["latency_s"].get("p50", float("inf"))))
+
+
+def best_model(report: dict):
+    best = best_row(report)
+    return best["model"] if best else None
+
+
+def write_report(report: dict, path: str):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2, sort_keys=True, ensure_ascii=False)
+        f.write("\n")
+
+
+def format_row(row: dict) -> str:
+    lat = row["latency_s"]
+    return (f"  {row['model']:<10} {row['strategy']:<12} {row['document']:<10} c={row['concurrency']:<3} "
+            f"p50={lat.get('p50', float('nan')):.2f}s p90={lat.get('p90', float('nan')):.2f}s "
+            f"p99={lat.get('p99', float('nan')):.2f}s "
+            f"tok/s={row['tokens_per_sec'].get('p50', 0):.1f} "
+            f"json={row['json_valid_rate']:.0%} alvo={row['target_hit_rate']:.0%} "
+            f"cache={row['cache_hit_ratio']:.0%} erros={row['errors']}")
+
+
+def row_key(row: dict) -> tuple:
+    return row["model"], row["strategy"], row["document"], row["concurrency"]
+
+
+def compare_reports(report: dict, baseline: dict) -> list:
+    """Por combinação presente nos dois: (chave, Δp50 em s, Δacerto da linha-alvo)"""
+    base = {row_key(row): row for row in baseline.get("results", ())}
+    deltas = []
+    for row in report.get("results", ()):
+        old = base.get(row_key(row))
+        if old is None:
+            continue
+        p50 = row["latency_s"].get("p50", float("nan")) - old["latency_s"].get("p50", float("nan"))
+        deltas.append((row_key(row), p50, row["target_hit_rate"] - old["target_hit_rate"]))
+    return deltas
+
+
+def load_report(path: str) -> dict:
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mostra um relatório de benchmark (e a diferença para uma base)")
+    parser.add_argument("report")
+    parser.add_argument("baseline", nargs="?")
+    args = parser.parse_args(argv)
+
+    report = load_report(args.report)
+    print(f"{args.report} ({report.get('meta', {}).get('created_at', '?')})")
+    for row in report.get("results", ()):
+        print(format_row(row))
+    if report.get("results"):
+        print(f"Melhor modelo: {best_model(report) or '-'}")
+    if args.baseline:
+        print(f"\nContra {args.baseline}:")
+        for (model, strategy, document, concurrency), p50, hit in compare_reports(report, load_report(args.baseline)):
+            print(f"  {model:<10} {strategy:<12} {document:<10} c={concurrency:<3} Δp50={p50:+.2f}s Δalvo={hit:+.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+"""
+Cache de respostas do chat completions, endereçado por conteúdo.
+
+A chave é o sha256 de (model, messages, response_format, temperature); cada resposta
+fica em out/cache/<kk>/<chave>.json (resposta completa, incluindo usage). O diretório
+tem tamanho máximo e despeja as entradas menos usadas (LRU pelo mtime); as respostas
+já lidas ficam também em memória, num LRU com o mesmo limite de bytes.
+
+Modos (PROMPT_EDIT_CACHE):
+- passthrough: não usa o cache (padrão);
+- record: sempre chama a API e grava/atualiza a resposta;
+- replay: só lê do cache, sem rede; falta de entrada levanta CacheMiss.
+"""
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+
+MODES = ("passthrough", "record", "replay")
+KEY_FIELDS = ("model", "messages", "response_format", "temperature")
+DEFAULT_DIR = os.path.join("out", "cache")
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+
+class CacheMiss(KeyError):
+    """Modo replay sem resposta gravada para o payload."""
+
+
+def cache_key(payload: dict) -> str:
+    material = {field: payload.get(field) for field in KEY_FIELDS}
+    blob = json.dumps(material, sort_keys=True, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(blob.encode("utf-8")).hexdigest()
+
+
+class ResponseCache:
+    def __init__(self, directory: str = DEFAULT_DIR, mode: str = "passthrough",
+                 max_bytes: int = DEFAULT_MAX_BYTES):
+        if mode not in MODES:
+            raise ValueError(f"modo de cache inválido: {mode!r} (use {', '.join(MODES)})")
+        self.directory = directory
+        self.mode = mode
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()  # chave -> (resposta, bytes); LRU limitado por max_bytes
+        self._memory_bytes = 0
+        self._entries = None  # chave -> (mtime, tamanho); carregado sob demanda
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls) -> "ResponseCache":
+        return cls(
+            directory=os.environ.get("PROMPT_EDIT_CACHE_DIR", DEFAULT_DIR),
+            mode=os.environ.get("PROMPT_EDIT_CACHE", "passthrough"),
+            max_bytes=int(os.environ.get("PROMPT_EDIT_CACHE_MAX_BYTES", DEFAULT_MAX_BYTES)),
+        )
+
+    @property
+    def offline(self) -> bool:
+        return self.mode == "replay"
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def _scan(self) -> dict:
+        if self._entries is None:
+            self._entries = {}
+            if os.path.isdir(self.directory):
+                for root, _, files in os.walk(self.directory):
+                    for name in files:
+                        if name.endswith(".json"):
+                            st = os.stat(os.path.join(root, name))
+                            self._entries[name[:-5]] = (st.st_mtime, st.st_size)
+        return self._entries
+
+    def _remember(self, key: str, data: dict, size: int):
+        """Guarda na memória (chamar com o lock) e descarta as menos usadas acima de max_bytes"""
+        self._forget(key)
+        self._memory[key] = (data, size)
+        self._memory_bytes += size
+        while self._memory_bytes > self.max_bytes and self._memory:
+            _, (_, dropped) = self._memory.popitem(last=False)
+            self._memory_bytes -= dropped
+
+    def _forget(self, key: str):
+        entry = self._memory.pop(key, None)
+        if entry is not None:
+            self._memory_bytes -= entry[1]
+
+    def get(self, payload: dict):
+        key = cache_key(payload)
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                self._memory.move_to_end(key)
+        if entry is not None:
+            data = entry[0]
+        else:
+            try:
+                with open(self._path(key), "rb") as f:
+                    blob = f.read()
+            except FileNotFoundError:
+                return None
+            data = json.loads(blob)
+            with self._lock:
+                self._remember(key, data, len(blob))
+        # LRU: leitura conta como uso
+        now = time.time()
+        try:
+            os.utime(self._path(key), (now, now))
+        except FileNotFoundError:
+            pass
+        with self._lock:
+            entries = self._scan()
+            if key in entries:
+                entries[key] = (now, entries[key][1])
+        return data
+
+    def put(self, payload: dict, data: dict):
+        key = cache_key(payload)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        blob = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(blob)
+        os.replace(tmp, path)
+        with self._lock:
+            self._remember(key, data, len(blob))
+            self._scan()[key] = (time.time(), len(blob))
+            self._evict()
+
+    def _evict(self):
+        entries = self._scan()
+        total = sum(size for _, size in entries.values())
+        if total <= self.max_bytes:
+            return
+        for key, (_, size) in sorted(entries.items(), key=lambda kv: kv[1][0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(self._path(key))
+            except FileNotFoundError:
+                pass
+            self._forget(key)
+            del entries[key]
+            total -= size
+
+    def fetch(self, payload: dict, send) -> dict:
+        """
+        Resposta para `payload` conforme o modo. `send(payload)` faz a chamada real
+        e devolve o JSON da resposta (já validado pelo chamador).
+        """
+        if self.mode == "replay":
+            data = self.get(payload)
+            if data is None:
+                self.misses += 1
+                raise CacheMiss(f"sem resposta gravada para {cache_key(payload)[:12]} (grave com PROMPT_EDIT_CACHE=record)")
+            self.hits += 1
+            return data
+
+        data = send(payload)
+        if self.mode == "record":
+            self.put(payload, data)
+        return data
@@ -0,0 +1,48 @@
+"""
+Ponto de entrada único das ferramentas de edição/benchmark.
+
+    python -m prompt_edit scenarios --async --concurrency 16
+    python -m prompt_edit radical --stream
+    python -m prompt_edit models --plan-only --sizes 100k
+    python -m prompt_edit debug
+    python -m prompt_edit bench out/models_test_report.json base.json
+    python -m prompt_edit runs compare --baseline 12
+
+Cada subcomando só importa o próprio módulo (e, com ele, httpx/dotenv) quando é
+chamado; o resto da linha de comando vai intacto para o `main(argv)` dele. Assim
+`--help` e subcomandos offline (--rescore, --plan-only, bench, runs) começam rápido
+em loops de CI. Roda a partir da raiz do repositório (fixtures em tests/fixtures/)
+com scripts/ no caminho de importação (PYTHONPATH=scripts).
+"""
+import importlib
+import sys
+
+# subcomando -> (módulo com main(argv), descrição)
+COMMANDS = {
+    "scenarios": ("test_edit_scenarios", "cenários de edição (add/replace/remove) contra o modelo"),
+    "radical": ("radical_test", "response_format json_schema vs. texto livre"),
+    "models": ("full_document_models_test", "benchmark de modelos/estratégias com relatório JSON"),
+    "debug": ("debug_changes", "estratégia de documento inteiro: preservação por diff"),
+    "bench": ("prompt_edit.bench", "mostra/compara relatórios de benchmark"),
+    "runs": ("prompt_edit.runs", "histórico de rodadas: regressões (bootstrap) e export OpenMetrics"),
+}
+
+
+def usage() -> str:
+    lines = ["uso: python -m prompt_edit <subcomando> [argumentos...]", "", "subcomandos:"]
+    lines += [f"  {name:<10} {description}" for name, (_, description) in COMMANDS.items()]
+    lines += ["", "`python -m prompt_edit <subcomando> --help` mostra as opções de cada um."]
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else list(argv)
+    if not argv or argv[0] in ("-h", "--help"):
+        print(usage())
+        return 0
+    command = COMMANDS.get(argv[0])
+    if command is None:
+        print(f"subcomando desconhecido: {argv[0]}\n\n{usage()}", file=sys.stderr)
+        return 2
+    module = importlib.import_module(command[0])
+    return module.main(argv[1:]) or 0
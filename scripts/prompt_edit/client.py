@@ -0,0 +1,340 @@
+"""
+Cliente compartilhado do chat completions para todos os scripts.
+
+- pool de conexões persistente (keep-alive; HTTP/2 quando o pacote h2 está instalado),
+  evitando um handshake TCP+TLS por chamada;
+- retry com backoff exponencial com jitter para 429/5xx e erros de transporte,
+  respeitando Retry-After / retry-after-ms;
+- timeout por requisição;
+- chat() tipado: conteúdo, usage, headers e tempos em um ChatResult;
+- RateLimiter opcional: admissão por RPM/TPM e sincronização com os headers x-ratelimit-*.
+
+A URL base vem de OPENAI_BASE_URL (padrão https://api.openai.com/v1); aponte para
+prompt_edit.mockserver para rodar sem rede e sem chave.
+"""
+import asyncio
+import importlib.util
+import json
+import os
+import random
+import time
+from dataclasses import dataclass, field
+from email.utils import parsedate_to_datetime
+from typing import Optional
+
+import httpx
+
+from prompt_edit.profiling import span
+from prompt_edit.streaming import StreamMetrics, consume_stream, stream_payload
+
+DEFAULT_BASE_URL = "https://api.openai.com/v1"
+RETRY_STATUS = {408, 409, 429, 500, 502, 503, 504}
+HTTP2 = importlib.util.find_spec("h2") is not None
+
+
+def requires_api_key(base_url: str = None) -> bool:
+    """Só a API real exige OPENAI_API_KEY; mocks locais (OPENAI_BASE_URL) aceitam qualquer chave"""
+    return (base_url or os.environ.get("OPENAI_BASE_URL") or DEFAULT_BASE_URL).rstrip("/") == DEFAULT_BASE_URL
+
+
+class ChatError(Exception):
+    """Resposta de erro da API (após esgotar os retries, quando aplicável)."""
+
+    def __init__(self, status: int, body: str, attempts: int = 1):
+        super().__init__(f"HTTP {status} após {attempts} tentativa(s): {body[:300]}")
+        self.status = status
+        self.body = body
+        self.attempts = attempts
+
+
+@dataclass
+class ChatResult:
+    content: str
+    usage: dict
+    latency_s: float                 # do primeiro envio até a resposta final (inclui retries)
+    attempts: int = 1
+    cached: bool = False             # veio do ResponseCache
+    status: int = 200
+    headers: dict = field(default_factory=dict)
+    data: dict = field(default_factory=dict)   # JSON completo da resposta
+
+    @property
+    def model(self) -> str:
+        return self.data.get("model", "")
+
+
+def retry_after_seconds(headers) -> Optional[float]:
+    """Retry-After em segundos (aceita retry-after-ms, segundos ou data HTTP)"""
+    ms = headers.get("retry-after-ms")
+    if ms:
+        try:
+            return float(ms) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+
+class _RetryPolicy:
+    def __init__(self, max_retries: int, backoff_base: float, backoff_max: float):
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+    def delay(self, attempt: int, headers=None) -> float:
+        """Espera antes da tentativa `attempt + 1` (full jitter, ou o Retry-After do servidor)"""
+        hinted = retry_after_seconds(headers) if headers is not None else None
+        if hinted is not None:
+            return min(self.backoff_max, hinted) + random.uniform(0, 0.1)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def should_retry(self, attempt: int, status: int = None) -> bool:
+        return attempt < self.max_retries and (status is None or status in RETRY_STATUS)
+
+
+def _encode(payload: dict) -> bytes:
+    """Serializa o payload uma vez só (reaproveitado entre retries)"""
+    with span("serialize"):
+        return json.dumps(payload, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _result(response: httpx.Response, start: float, attempts: int) -> ChatResult:
+    with span("decode", bytes=len(response.content)):
+        data = response.json()
+    return ChatResult(
+        content=data["choices"][0]["message"]["content"] or "",
+        usage=data.get("usage") or {},
+        latency_s=time.perf_counter() - start,
+        attempts=attempts,
+        status=response.status_code,
+        headers=dict(response.headers),
+        data=data,
+    )
+
+
+def _cached_result(data: dict) -> ChatResult:
+    return ChatResult(
+        content=data["choices"][0]["message"]["content"] or "",
+        usage=data.get("usage") or {},
+        latency_s=0.0,
+        cached=True,
+        data=data,
+    )
+
+
+class _BaseClient:
+    def __init__(self, api_key: str = None, base_url: str = None, timeout: float = 120.0,
+                 max_retries: int = 4, max_connections: int = 20, cache=None,
+                 backoff_base: float = 0.5, backoff_max: float = 30.0, limiter=None):
+        self.api_key = api_key or os.environ.get("OPENAI_API_KEY", "")
+        self.base_url = (base_url or os.environ.get("OPENAI_BASE_URL") or DEFAULT_BASE_URL).rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.cache = cache
+        self.limiter = limiter
+        self.retry = _RetryPolicy(max_retries, backoff_base, backoff_max)
+        self._http = None
+
+    def _http_options(self) -> dict:
+        headers = {"Content-Type": "application/json"}
+        if self.api_key:
+            headers["Authorization"] = f"Bearer {self.api_key}"
+        return {
+            "base_url": self.base_url,
+            "headers": headers,
+            "timeout": self.timeout,
+            "limits": httpx.Limits(max_connections=self.max_connections,
+                                   max_keepalive_connections=self.max_connections),
+            "http2": HTTP2,
+        }
+
+    def _observe(self, payload: dict, response: httpx.Response, estimated: int, usage: dict = None):
+        """Repassa headers/usage ao RateLimiter; 429 pausa o modelo pelo Retry-After"""
+        if self.limiter is None:
+            return
+        model = payload.get("model", "")
+        self.limiter.observe(model, response.headers, usage, estimated, payload)
+        if response.status_code == 429:
+            self.limiter.penalize(model, retry_after_seconds(response.headers) or self.retry.delay(0))
+
+
+class ChatClient(_BaseClient):
+    """Cliente síncrono (thread-safe: pode ser usado por um ThreadPoolExecutor)."""
+
+    @property
+    def http(self) -> httpx.Client:
+        if self._http is None:
+            self._http = httpx.Client(**self._http_options())
+        return self._http
+
+    def _post(self, payload: dict, timeout: float = None) -> ChatResult:
+        start = time.perf_counter()
+        body = _encode(payload)
+        attempt = 0
+        while True:
+            estimated = self.limiter.acquire(payload) if self.limiter else 0
+            try:
+                with span("network", "network", model=payload.get("model"), attempt=attempt):
+                    response = self.http.post("/chat/completions", content=body, timeout=timeout or self.timeout)
+            except httpx.TransportError:
+                if not self.retry.should_retry(attempt):
+                    raise
+                time.sleep(self.retry.delay(attempt))
+                attempt += 1
+                continue
+            if response.status_code < 400:
+                result = _result(response, start, attempt + 1)
+                self._observe(payload, response, estimated, result.usage)
+                return result
+            self._observe(payload, response, estimated)
+            if not self.retry.should_retry(attempt, response.status_code):
+                raise ChatError(response.status_code, response.text, attempt + 1)
+            time.sleep(self.retry.delay(attempt, response.headers))
+            attempt += 1
+
+    def chat(self, payload: dict, timeout: float = None) -> ChatResult:
+        """POST /chat/completions com retry; passa pelo ResponseCache quando configurado"""
+        if self.cache is None or self.cache.mode == "passthrough":
+            return self._post(payload, timeout)
+        holder = {}
+
+        def send(p):
+            holder["result"] = self._post(p, timeout)
+            return holder["result"].data
+
+        data = self.cache.fetch(payload, send)
+        return holder.get("result") or _cached_result(data)
+
+    def stream(self, payload: dict, timeout: float = None, on_delta=None):
+        """
+        Chamada em streaming (SSE); devolve (ChatResult, StreamMetrics). Retry só enquanto
+        nada foi entregue a `on_delta`: depois disso, repetir duplicaria o texto no chamador.
+        Passa pelo ResponseCache como `chat`: em replay a resposta gravada sai como um
+        único delta, sem rede; em record o stream completo é gravado.
+        """
+        if self.cache is not None and self.cache.offline:
+            result = _cached_result(self.cache.fetch(payload, None))
+            if on_delta and result.content:
+                on_delta(result.content, [result.content])
+            return result, StreamMetrics(chunks=1 if result.content else 0,
+                                         completion_tokens=result.usage.get("completion_tokens", 0))
+        start = time.perf_counter()
+        body = _encode(stream_payload(payload))
+        attempt = 0
+        delivered = False
+
+        def deliver(delta, parts):
+            nonlocal delivered
+            delivered = True
+            on_delta(delta, parts)
+
+        while True:
+            estimated = self.limiter.acquire(payload) if self.limiter else 0
+            try:
+                with span("stream", "network", model=payload.get("model"), attempt=attempt), \
+                        self.http.stream("POST", "/chat/completions", content=body,
+                                         timeout=timeout or self.timeout) as response:
+                    if response.status_code >= 400:
+                        self._observe(payload, response, estimated)
+                        error_text = response.read().decode("utf-8", "replace")
+                        if not self.retry.should_retry(attempt, response.status_code):
+                            raise ChatError(response.status_code, error_text, attempt + 1)
+                        delay = self.retry.delay(attempt, response.headers)
+                    else:
+                        ttfb = time.perf_counter() - start
+                        data, metrics = consume_stream(response.iter_lines(), start, ttfb,
+                                                       deliver if on_delta else None)
+                        self._observe(payload, response, estimated, data["usage"])
+                        result = ChatResult(
+                            content=data["choices"][0]["message"]["content"],
+                            usage=data["usage"],
+                            latency_s=metrics.total,
+                            attempts=attempt + 1,
+                            status=response.status_code,
+                            headers=dict(response.headers),
+                            data=data,
+                        )
+                        if self.cache is not None and self.cache.mode == "record":
+                            self.cache.put(payload, data)
+                        return result, metrics
+            except httpx.TransportError:
+                if delivered or not self.retry.should_retry(attempt):
+                    raise
+                delay = self.retry.delay(attempt)
+            time.sleep(delay)
+            attempt += 1
+
+    def close(self):
+        if self._http is not None:
+            self._http.close()
+            self._http = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class AsyncChatClient(_BaseClient):
+    """Versão asyncio do ChatClient (um pool compartilhado por todas as corrotinas)."""
+
+    @property
+    def http(self) -> httpx.AsyncClient:
+        if self._http is None:
+            self._http = httpx.AsyncClient(**self._http_options())
+        return self._http
+
+    async def _post(self, payload: dict, timeout: float = None) -> ChatResult:
+        start = time.perf_counter()
+        body = _encode(payload)
+        attempt = 0
+        while True:
+            estimated = await self.limiter.acquire_async(payload) if self.limiter else 0
+            try:
+                with span("network", "network", model=payload.get("model"), attempt=attempt):
+                    response = await self.http.post("/chat/completions", content=body,
+                                                     timeout=timeout or self.timeout)
+            except httpx.TransportError:
+                if not self.retry.should_retry(attempt):
+                    raise
+                await asyncio.sleep(self.retry.delay(attempt))
+                attempt += 1
+                continue
+            if response.status_code < 400:
+                result = _result(response, start, attempt + 1)
+                self._observe(payload, response, estimated, result.usage)
+                return result
+            self._observe(payload, response, estimated)
+            if not self.retry.should_retry(attempt, response.status_code):
+                raise ChatError(response.status_code, response.text, attempt + 1)
+            await asyncio.sleep(self.retry.delay(attempt, response.headers))
+            attempt += 1
+
+    async def chat(self, payload: dict, timeout: float = None) -> ChatResult:
+        if self.cache is None or self.cache.mode == "passthrough":
+            return await self._post(payload, timeout)
+        if self.cache.offline:
+            return _cached_result(self.cache.fetch(payload, None))
+        result = await self._post(payload, timeout)
+        self.cache.put(payload, result.data)
+        return result
+
+    async def aclose(self):
+        if self._http is not None:
+            await self._http.aclose()
+            self._http = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        await self.aclose()
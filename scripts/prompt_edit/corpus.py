@@ -0,0 +1,123 @@
+"""
+Corpus de cenários em JSONL e log de resultados append-only, para rodadas longas.
+
+Cenários são lidos sob demanda, uma linha por vez, de um ou mais arquivos JSONL
+({"id"?, "name", "instruction", "expected_action", "expected_section"}); sem "id",
+o cenário é identificado por "<arquivo>:<linha>". Cada resultado é gravado (e
+descarregado) no log assim que fica pronto, então uma queda perde no máximo a
+linha em escrita; `completed_ids` permite retomar pulando o que já tem resultado.
+Registros de erro (timeout, 429...) não contam como concluídos: ao retomar, eles
+saem do log e o cenário roda de novo, então o novo registro substitui o antigo.
+Nada cresce com o tamanho do corpus além do conjunto de ids concluídos.
+"""
+import json
+import os
+import threading
+
+REQUIRED_FIELDS = ("name", "instruction", "expected_action", "expected_section")
+MASTER_PROMPT_PATH = os.path.join("tests", "fixtures", "master_prompt.txt")
+
+
+def load_master_prompt(path: str = MASTER_PROMPT_PATH) -> str:
+    """Documento de referência dos scripts (lido na chamada, nunca na importação)"""
+    with open(path, "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def iter_jsonl(path: str):
+    """(número da linha, objeto) por linha não vazia; '#' no início é comentário"""
+    with open(path, "r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, 1):
+            line = line.strip()
+            if line and not line.startswith("#"):
+                yield lineno, json.loads(line)
+
+
+def iter_scenarios(paths):
+    for path in [paths] if isinstance(paths, str) else paths:
+        label = os.path.basename(path)
+        for lineno, scenario in iter_jsonl(path):
+            missing = [name for name in REQUIRED_FIELDS if name not in scenario]
+            if missing:
+                raise ValueError(f"{path}:{lineno}: cenário sem {', '.join(missing)}")
+            scenario.setdefault("id", f"{label}:{lineno}")
+            yield scenario
+
+
+def count_scenarios(paths) -> int:
+    """Contagem sem parsear (só para o progresso [i/total])"""
+    total = 0
+    for path in [paths] if isinstance(paths, str) else paths:
+        with open(path, "r", encoding="utf-8") as f:
+            total += sum(1 for line in f if line.strip() and not line.lstrip().startswith("#"))
+    return total
+
+
+def iter_results(path: str):
+    """Registros já gravados (linhas truncadas por queda são ignoradas)"""
+    if not os.path.exists(path):
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                continue
+
+
+def is_completed(record: dict) -> bool:
+    """Registro com resposta (ou pontuação); erros de chamada não contam"""
+    return "change" in record or "score" in record
+
+
+class ResultLog:
+    """JSONL append-only de resultados; seguro para várias threads/corrotinas."""
+
+    def __init__(self, path: str, resume: bool = False):
+        self.path = path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if not resume:
+            open(path, "w", encoding="utf-8").close()
+        elif os.path.exists(path) and os.path.getsize(path):
+            # Queda no meio de uma linha: começa a próxima gravação em linha nova
+            with open(path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                partial = f.read(1) != b"\n"
+            if partial:
+                with open(path, "a", encoding="utf-8") as f:
+                    f.write("\n")
+            self._drop_errors()
+        self._file = open(path, "a", encoding="utf-8")
+        self._lock = threading.Lock()
+
+    def _drop_errors(self):
+        """Regrava o log sem os registros de erro (só se houver algum), de forma atômica"""
+        if all(is_completed(record) for record in iter_results(self.path)):
+            return
+        tmp = f"{self.path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for record in iter_results(self.path):
+                if is_completed(record):
+                    f.write(json.dumps(record, ensure_ascii=False, default=str) + "\n")
+        os.replace(tmp, self.path)
+
+    def completed_ids(self) -> set:
+        return {record["id"] for record in self if "id" in record and is_completed(record)}
+
+    def __iter__(self):
+        return iter_results(self.path)
+
+    def append(self, record: dict):
+        line = json.dumps(record, ensure_ascii=False, default=str)
+        with self._lock:
+            self._file.write(line + "\n")
+            self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
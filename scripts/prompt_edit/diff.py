@@ -0,0 +1,302 @@
+"""
+Diff por linhas para análise de preservação de documentos reescritos pelo modelo.
+
+Cada linha vira um inteiro (hash interno via dict), o prefixo/sufixo comum é
+descartado, linhas únicas nos dois lados servem de âncoras (patience diff) e só as
+regiões entre âncoras passam pelo Myers O(ND). Assim prompts de 20k–200k chars são
+comparados em milissegundos, sem o custo quadrático do SequenceMatcher.
+"""
+from bisect import bisect_left
+from collections import Counter
+from dataclasses import dataclass, field
+
+from prompt_edit.profiling import span
+
+
+def _intern(a_lines: list, b_lines: list):
+    ids = {}
+    a = [ids.setdefault(line, len(ids)) for line in a_lines]
+    b = [ids.setdefault(line, len(ids)) for line in b_lines]
+    return a, b
+
+
+def _unique_lcs(a, b, alo, ahi, blo, bhi) -> list:
+    """Âncoras: maior subsequência crescente das linhas que aparecem 1x em cada lado"""
+    count_a = Counter(a[alo:ahi])
+    count_b = Counter(b[blo:bhi])
+    pos_b = {}
+    for j in range(blo, bhi):
+        if count_b[b[j]] == 1 and count_a[b[j]] == 1:
+            pos_b[b[j]] = j
+    pairs = [(i, pos_b[a[i]]) for i in range(alo, ahi) if a[i] in pos_b]
+    if not pairs:
+        return []
+
+    # LIS sobre os índices de b (patience sorting)
+    tails = []
+    tails_idx = []
+    back = [None] * len(pairs)
+    for n, (_, j) in enumerate(pairs):
+        k = bisect_left(tails, j)
+        if k == len(tails):
+            tails.append(j)
+            tails_idx.append(n)
+        else:
+            tails[k] = j
+            tails_idx[k] = n
+        back[n] = tails_idx[k - 1] if k else None
+
+    result = []
+    n = tails_idx[-1]
+    while n is not None:
+        result.append(pairs[n])
+        n = back[n]
+    result.reverse()
+    return result
+
+
+def _myers(a, b, alo, ahi, blo, bhi) -> list:
+    """Pares (i, j) casados pelo algoritmo de Myers na região dada"""
+    A = a[alo:ahi]
+    B = b[blo:bhi]
+    n, m = len(A), len(B)
+    max_d = n + m
+    off = max_d + 1
+    v = [0] * (2 * max_d + 3)
+    trace = []
+
+    for d in range(max_d + 1):
+        for k in range(-d, d + 1, 2):
+            if k == -d or (k != d and v[off + k - 1] < v[off + k + 1]):
+                x = v[off + k + 1]
+            else:
+                x = v[off + k - 1] + 1
+            y = x - k
+            while x < n and y < m and A[x] == B[y]:
+                x += 1
+                y += 1
+            v[off + k] = x
+            if x >= n and y >= m:
+                break
+        else:
+            trace.append(v[off - d:off + d + 1])
+            continue
+        break
+
+    matches = []
+    x, y = n, m
+    for d in range(len(trace), 0, -1):
+        prev = trace[d - 1]
+        k = x - y
+        if k == -d or (k != d and prev[k - 1 + d - 1] < prev[k + 1 + d - 1]):
+            prev_k = k + 1
+        else:
+            prev_k = k - 1
+        prev_x = prev[prev_k + d - 1]
+        prev_y = prev_x - prev_k
+        while x > prev_x and y > prev_y:
+            x -= 1
+            y -= 1
+            matches.append((alo + x, blo + y))
+        x, y = prev_x, prev_y
+    while x > 0 and y > 0:
+        x -= 1
+        y -= 1
+        matches.append((alo + x, blo + y))
+    return matches
+
+
+def matching_pairs(a: list, b: list) -> list:
+    """Todos os pares (i, j) de linhas iguais do diff, em ordem"""
+    out = []
+    stack = [(0, len(a), 0, len(b))]
+    while stack:
+        alo, ahi, blo, bhi = stack.pop()
+        while alo < ahi and blo < bhi and a[alo] == b[blo]:
+            out.append((alo, blo))
+            alo += 1
+            blo += 1
+        while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+            ahi -= 1
+            bhi -= 1
+            out.append((ahi, bhi))
+        if alo == ahi or blo == bhi:
+            continue
+
+        anchors = _unique_lcs(a, b, alo, ahi, blo, bhi)
+        if not anchors:
+            out.extend(_myers(a, b, alo, ahi, blo, bhi))
+            continue
+        prev_a, prev_b = alo, blo
+        for i, j in anchors:
+            stack.append((prev_a, i, prev_b, j))
+            out.append((i, j))
+            prev_a, prev_b = i + 1, j + 1
+        stack.append((prev_a, ahi, prev_b, bhi))
+    out.sort()
+    return out
+
+
+def opcodes(a_lines: list, b_lines: list) -> list:
+    """Opcodes no formato do difflib: (tag, i1, i2, j1, j2)"""
+    a, b = _intern(a_lines, b_lines)
+    result = []
+    i = j = 0
+    pairs = matching_pairs(a, b)
+    pairs.append((len(a), len(b)))
+    run_start = None
+    for pi, pj in pairs:
+        if pi > i or pj > j:
+            if run_start is not None:
+                result.append(("equal", run_start[0], i, run_start[1], j))
+                run_start = None
+            tag = "replace" if pi > i and pj > j else ("delete" if pi > i else "insert")
+            result.append((tag, i, pi, j, pj))
+        if pi == len(a) and pj == len(b):
+            break
+        if run_start is None:
+            run_start = (pi, pj)
+        i, j = pi + 1, pj + 1
+    if run_start is not None:
+        result.append(("equal", run_start[0], i, run_start[1], j))
+    return result
+
+
+def grouped_opcodes(codes: list, n: int = 3) -> list:
+    """Hunks com `n` linhas de contexto (mesma regra do difflib.get_grouped_opcodes)"""
+    if not codes:
+        codes = [("equal", 0, 1, 0, 1)]
+    codes = list(codes)
+    if codes[0][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[0]
+        codes[0] = tag, max(i1, i2 - n), i2, max(j1, j2 - n), j2
+    if codes[-1][0] == "equal":
+        tag, i1, i2, j1, j2 = codes[-1]
+        codes[-1] = tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)
+
+    groups = []
+    group = []
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal" and i2 - i1 > n * 2:
+            group.append((tag, i1, min(i2, i1 + n), j1, min(j2, j1 + n)))
+            groups.append(group)
+            group = []
+            i1, j1 = max(i1, i2 - n), max(j1, j2 - n)
+        group.append((tag, i1, i2, j1, j2))
+    if group and not (len(group) == 1 and group[0][0] == "equal"):
+        groups.append(group)
+    return groups
+
+
+def _format_range(start: int, stop: int) -> str:
+    length = stop - start
+    if length == 1:
+        return f"{start + 1}"
+    return f"{start + 1 if length else start},{length}"
+
+
+def unified_diff(a_lines: list, b_lines: list, fromfile: str = "original", tofile: str = "atualizado",
+                 n: int = 3, codes: list = None) -> str:
+    codes = codes if codes is not None else opcodes(a_lines, b_lines)
+    out = [f"--- {fromfile}", f"+++ {tofile}"]
+    for group in grouped_opcodes(codes, n):
+        i1, i2 = group[0][1], group[-1][2]
+        j1, j2 = group[0][3], group[-1][4]
+        out.append(f"@@ -{_format_range(i1, i2)} +{_format_range(j1, j2)} @@")
+        for tag, a1, a2, b1, b2 in group:
+            if tag == "equal":
+                out.extend(f" {line}" for line in a_lines[a1:a2])
+                continue
+            out.extend(f"-{line}" for line in a_lines[a1:a2])
+            out.extend(f"+{line}" for line in b_lines[b1:b2])
+    if len(out) == 2:
+        return ""
+    return "\n".join(out) + "\n"
+
+
+def _squash(line: str) -> str:
+    return "".join(line.split())
+
+
+@dataclass
+class PreservationReport:
+    opcodes: list
+    original_lines: int
+    updated_lines: int
+    preserved_lines: int
+    preservation_ratio: float                # chars das linhas originais preservadas / chars originais
+    expected_insertions: list = field(default_factory=list)
+    unexpected_insertions: list = field(default_factory=list)
+    unexpected_losses: list = field(default_factory=list)
+    whitespace_only: int = 0
+
+    @property
+    def clean(self) -> bool:
+        """Só as inserções esperadas (e diferenças de espaço) mudaram"""
+        return not self.unexpected_losses and not self.unexpected_insertions
+
+    def summary(self) -> dict:
+        return {
+            "original_lines": self.original_lines,
+            "updated_lines": self.updated_lines,
+            "preserved_lines": self.preserved_lines,
+            "preservation_ratio": round(self.preservation_ratio, 4),
+            "expected_insertions": len(self.expected_insertions),
+            "unexpected_insertions": len(self.unexpected_insertions),
+            "unexpected_losses": len(self.unexpected_losses),
+            "whitespace_only": self.whitespace_only,
+        }
+
+
+def preservation(original: str, updated: str, expected_lines=()) -> PreservationReport:
+    """
+    Compara o original com a versão reescrita e classifica cada linha alterada em:
+    inserção esperada (está em `expected_lines`), perda inesperada, inserção
+    inesperada ou diferença só de espaços (inclui linhas em branco).
+    """
+    a_lines = original.split("\n")
+    b_lines = updated.split("\n")
+    with span("diff", lines=len(a_lines) + len(b_lines)):
+        codes = opcodes(a_lines, b_lines)
+    expected = {line.strip() for line in expected_lines}
+
+    report = PreservationReport(
+        opcodes=codes,
+        original_lines=len(a_lines),
+        updated_lines=len(b_lines),
+        preserved_lines=0,
+        preservation_ratio=1.0,
+    )
+    total_chars = sum(len(line) for line in a_lines) or 1
+    preserved_chars = 0
+
+    for tag, i1, i2, j1, j2 in codes:
+        if tag == "equal":
+            report.preserved_lines += i2 - i1
+            preserved_chars += sum(len(line) for line in a_lines[i1:i2])
+            continue
+
+        deleted = Counter(_squash(line) for line in a_lines[i1:i2] if line.strip())
+        for line in b_lines[j1:j2]:
+            key = _squash(line)
+            if not key:
+                report.whitespace_only += 1
+            elif deleted[key] > 0:
+                deleted[key] -= 1
+                report.whitespace_only += 1
+                preserved_chars += len(line)
+            elif line.strip() in expected:
+                report.expected_insertions.append(line)
+            else:
+                report.unexpected_insertions.append(line)
+
+        for line in a_lines[i1:i2]:
+            key = _squash(line)
+            if not key:
+                report.whitespace_only += 1
+            elif deleted[key] > 0:
+                deleted[key] -= 1
+                report.unexpected_losses.append(line)
+
+    report.preservation_ratio = min(1.0, preserved_chars / total_chars)
+    return report
@@ -0,0 +1,284 @@
+"""
+Documento editável como piece table de linhas, para sessões longas de edição.
+
+O texto original nunca é copiado: o documento é uma sequência de peças
+(buffer, início, n) que apontam para as linhas originais ou para um buffer de
+linhas adicionadas que só cresce. Localizar uma linha é bisect nos fins
+acumulados das peças, O(log p); uma edição recorta só as peças afetadas
+(O(p) referências, nunca o texto). Cada versão é uma tupla imutável de peças,
+então snapshot, undo e redo são O(1), e o texto só é montado em `text()`, com
+cache por versão.
+
+`apply_changes` segue as mesmas regras de edits.apply_changes; as seções são
+resolvidas pelos headings da versão atual, sem materializar o documento.
+Cada buffer guarda, na entrada das linhas, os candidatos a heading e as
+cercas ``` ; o estado de cerca é refeito por versão em `sections()`, então
+remover ou trocar uma linha de cerca reclassifica os headings abaixo dela.
+"""
+from bisect import bisect_left, bisect_right
+from itertools import accumulate
+from typing import NamedTuple, Optional
+
+from prompt_edit.edits import plan_changes
+from prompt_edit.outline import FENCE_RE, HEADING_RE, Section, SectionIndex, SectionMatch, normalize_key, outline_for
+
+ORIGINAL, ADDED = 0, 1
+
+
+class Piece(NamedTuple):
+    source: int     # ORIGINAL ou ADDED
+    start: int      # primeira linha no buffer
+    count: int      # número de linhas
+
+
+class _Lines:
+    """Visão somente leitura das linhas da versão atual (lines[i], len(lines))"""
+
+    def __init__(self, document: 'Document'):
+        self._document = document
+
+    def __len__(self):
+        return len(self._document)
+
+    def __getitem__(self, i: int) -> str:
+        return self._document.line(i)
+
+
+def _scan(lines: list, start: int = 0) -> tuple:
+    """Marcas de um bloco: linhas ordenadas + {linha: None (cerca) | (nível, título, chave)}"""
+    marks, info = [], {}
+    for i, line in enumerate(lines, start):
+        if FENCE_RE.match(line):
+            info[i] = None
+        else:
+            m = HEADING_RE.match(line)
+            if not m:
+                continue
+            info[i] = (len(m.group(1)), m.group(2), normalize_key(m.group(2)))
+        marks.append(i)
+    return marks, info
+
+
+def _split_text(texts) -> list:
+    """Textos (que podem ter '\\n') -> linhas, como o splice de texto faria"""
+    return [line for text in texts for line in text.split("\n")]
+
+
+class Document:
+    """Prompt editável com undo/redo; `text()` materializa sob demanda."""
+
+    def __init__(self, text: str):
+        outline = outline_for(text)
+        self._buffers = (outline.lines, [])
+        # Marcas por buffer (cercas e candidatos a heading, dentro de cerca ou não)
+        marks, info = _scan(outline.lines)
+        self._marks = (marks, [])
+        self._mark_info = (info, {})
+        self._pieces = (Piece(ORIGINAL, 0, len(outline.lines)),)
+        self._undo = []
+        self._redo = []
+        self._invalidate(text)
+        self.lines = _Lines(self)
+
+    # --- versão atual -------------------------------------------------------
+
+    def _invalidate(self, text: str = None):
+        self._ends = None
+        self._sections = None
+        self._section_index = None
+        self._text = text
+
+    def _piece_ends(self) -> list:
+        if self._ends is None:
+            self._ends = list(accumulate(piece.count for piece in self._pieces))
+        return self._ends
+
+    def __len__(self) -> int:
+        ends = self._piece_ends()
+        return ends[-1] if ends else 0
+
+    def line(self, i: int) -> str:
+        ends = self._piece_ends()
+        if not 0 <= i < (ends[-1] if ends else 0):
+            raise IndexError(f"linha {i} fora do documento")
+        k = bisect_right(ends, i)
+        piece = self._pieces[k]
+        return self._buffers[piece.source][piece.start + i - (ends[k - 1] if k else 0)]
+
+    def text(self) -> str:
+        if self._text is None:
+            self._text = "\n".join(
+                line
+                for piece in self._pieces
+                for line in self._buffers[piece.source][piece.start:piece.start + piece.count]
+            )
+        return self._text
+
+    def __str__(self) -> str:
+        return self.text()
+
+    # --- seções -------------------------------------------------------------
+
+    def sections(self) -> list:
+        """Headings da versão atual (mesmo formato do Outline), sem montar o texto"""
+        if self._sections is not None:
+            return self._sections
+        total = len(self)
+        sections, stack = [], []
+        begin = 0
+        in_fence = False
+        for piece in self._pieces:
+            marks = self._marks[piece.source]
+            lo = bisect_left(marks, piece.start)
+            hi = bisect_left(marks, piece.start + piece.count)
+            for source_line in marks[lo:hi]:
+                mark = self._mark_info[piece.source][source_line]
+                if mark is None:
+                    in_fence = not in_fence
+                    continue
+                if in_fence:
+                    continue
+                level, title, key = mark
+                line = begin + source_line - piece.start
+                if sections:
+                    sections[-1].body_end_line = line
+                while stack and stack[-1].level >= level:
+                    stack.pop().end_line = line
+                section = Section(title, key, level, line, total, total,
+                                  parent=stack[-1] if stack else None)
+                if section.parent:
+                    section.parent.children.append(section)
+                stack.append(section)
+                sections.append(section)
+            begin += piece.count
+        self._sections = sections
+        self._section_index = None
+        return sections
+
+    @property
+    def section_index(self) -> SectionIndex:
+        sections = self.sections()
+        if self._section_index is None:
+            self._section_index = SectionIndex(sections)
+        return self._section_index
+
+    def match(self, label: str) -> Optional[SectionMatch]:
+        """Mesma resolução de Outline.match, sobre os headings da versão atual"""
+        return self.section_index.match(label)
+
+    def find(self, label: str) -> Optional[Section]:
+        return self.section_index.find(label)
+
+    # --- edição -------------------------------------------------------------
+
+    def _add_lines(self, lines: list) -> Optional[Piece]:
+        """Acrescenta ao buffer de adicionadas, registrando as marcas; devolve a peça"""
+        if not lines:
+            return None
+        buffer = self._buffers[ADDED]
+        start = len(buffer)
+        marks, info = _scan(lines, start)
+        self._marks[ADDED].extend(marks)
+        self._mark_info[ADDED].update(info)
+        buffer.extend(lines)
+        return Piece(ADDED, start, len(lines))
+
+    def _cut(self, pieces: tuple, start: int, stop: int, middle: Optional[Piece]) -> tuple:
+        """Peças com as linhas [start, stop) trocadas por `middle`"""
+        ends = list(accumulate(piece.count for piece in pieces))
+        first = bisect_right(ends, start)
+        head = list(pieces[:first])
+        if first < len(pieces):
+            begin = ends[first - 1] if first else 0
+            if start > begin:
+                piece = pieces[first]
+                head.append(Piece(piece.source, piece.start, start - begin))
+        if middle is not None:
+            head.append(middle)
+        last = bisect_right(ends, stop)
+        if last < len(pieces):
+            piece = pieces[last]
+            skip = stop - (ends[last - 1] if last else 0)
+            head.append(Piece(piece.source, piece.start + skip, piece.count - skip))
+            head.extend(pieces[last + 1:])
+        return tuple(head)
+
+    def _commit(self, pieces: tuple):
+        if pieces == self._pieces:
+            return
+        self._undo.append(self._pieces)
+        self._redo.clear()
+        self._pieces = pieces
+        self._invalidate()
+
+    def replace_lines(self, start: int, stop: int, lines: list):
+        """Troca as linhas [start, stop) por `lines` (inserção se start == stop; remoção se vazio)"""
+        if not 0 <= start <= stop <= len(self):
+            raise IndexError(f"intervalo {start}:{stop} fora do documento")
+        self._commit(self._cut(self._pieces, start, stop, self._add_lines(lines)))
+
+    def insert_lines(self, at: int, lines: list):
+        self.replace_lines(at, at, lines)
+
+    def delete_lines(self, start: int, stop: int):
+        self.replace_lines(start, stop, [])
+
+    def apply_changes(self, changes: list) -> 'Document':
+        """Aplica N mudanças PromptEditChange como UM passo de undo (regras de edits.apply_changes)"""
+        inserts, replaces, new_sections = plan_changes(self, changes)
+        pieces = self._pieces
+        total = len(self)
+        # De baixo para cima: as linhas acima de cada ponto continuam com o mesmo índice
+        for line in sorted(inserts.keys() | replaces.keys(), reverse=True):
+            lines = _split_text(inserts.get(line, ()))
+            if line >= total:
+                pieces = self._cut(pieces, total, total, self._add_lines(lines))
+                continue
+            stop = line
+            if line in replaces:
+                if replaces[line] is not None:
+                    lines += replaces[line].split("\n")
+                stop = line + 1
+            pieces = self._cut(pieces, line, stop, self._add_lines(lines))
+        for label, lines in new_sections.items():
+            end = sum(piece.count for piece in pieces)
+            pieces = self._cut(pieces, end, end, self._add_lines(["", f"## {label}", *_split_text(lines)]))
+        self._commit(pieces)
+        return self
+
+    def apply_change(self, change: dict) -> 'Document':
+        return self.apply_changes([change])
+
+    # --- histórico ----------------------------------------------------------
+
+    def snapshot(self) -> tuple:
+        """Versão atual (imutável, O(1)); volte a ela com restore()"""
+        return self._pieces
+
+    def restore(self, snapshot: tuple):
+        self._commit(snapshot)
+
+    def undo(self) -> bool:
+        if not self._undo:
+            return False
+        self._redo.append(self._pieces)
+        self._pieces = self._undo.pop()
+        self._invalidate()
+        return True
+
+    def redo(self) -> bool:
+        if not self._redo:
+            return False
+        self._undo.append(self._pieces)
+        self._pieces = self._redo.pop()
+        self._invalidate()
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "lines": len(self),
+            "pieces": len(self._pieces),
+            "added_lines": len(self._buffers[ADDED]),
+            "undo": len(self._undo),
+            "redo": len(self._redo),
+        }
@@ -0,0 +1,183 @@
+"""
+Aplicação de mudanças PromptEditChange ({section, lineToAdd, position}) em um documento.
+
+Uma instrução composta pode vir como várias mudanças ({"changes": [...]}); elas são
+resolvidas contra o mesmo outline e aplicadas em uma única passada pelo documento.
+
+Mudanças geradas localmente (fastpath) podem trazer `target`: a linha exata do corpo
+da seção que o 'replace' troca, em vez do heading; com lineToAdd vazio a linha é
+removida. Também podem trazer `edge` ("start" | "end") num 'after': a linha entra
+antes da primeira linha de conteúdo ou depois da última, em vez de logo após a
+primeira ("ao início/ao final da seção"). Nenhum dos dois campos faz parte do
+schema pedido ao modelo.
+"""
+from prompt_edit.outline import Outline, Section, outline_for
+from prompt_edit.profiling import span
+
+POSITIONS = ["after", "before", "replace"]
+
+CHANGE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "section": {"type": "string"},
+        "lineToAdd": {"type": "string"},
+        "position": {"type": "string", "enum": POSITIONS},
+        "explanation": {"type": "string"}
+    },
+    "required": ["section", "lineToAdd", "position", "explanation"],
+    "additionalProperties": False
+}
+
+CHANGES_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "changes": {"type": "array", "items": CHANGE_SCHEMA}
+    },
+    "required": ["changes"],
+    "additionalProperties": False
+}
+
+
+def response_format(multi: bool = False) -> dict:
+    """response_format json_schema (strict) para uma mudança ou para a lista de mudanças"""
+    return {
+        "type": "json_schema",
+        "json_schema": {
+            "name": "PromptEditChanges" if multi else "PromptEditChange",
+            "strict": True,
+            "schema": CHANGES_SCHEMA if multi else CHANGE_SCHEMA
+        }
+    }
+
+
+JSON_TYPES = {"object": dict, "array": list, "string": str, "boolean": bool, "null": type(None)}
+
+
+def schema_errors(value, schema: dict = CHANGE_SCHEMA, path: str = "$") -> list:
+    """
+    Validação do subconjunto de JSON Schema usado aqui (type, enum, properties,
+    required, additionalProperties, items). Lista vazia = válido.
+    """
+    kind = schema.get("type")
+    if kind in ("integer", "number"):
+        ok = isinstance(value, (int, float)) and not isinstance(value, bool)
+    else:
+        ok = kind is None or isinstance(value, JSON_TYPES[kind])
+    if not ok:
+        return [f"{path}: esperado {kind}"]
+    if "enum" in schema and value not in schema["enum"]:
+        return [f"{path}: {value!r} fora de {schema['enum']}"]
+    errors = []
+    if kind == "object":
+        props = schema.get("properties", {})
+        errors += [f"{path}.{name}: obrigatório" for name in schema.get("required", ()) if name not in value]
+        if schema.get("additionalProperties") is False:
+            errors += [f"{path}.{name}: não permitido" for name in value if name not in props]
+        for name, sub in props.items():
+            if name in value:
+                errors += schema_errors(value[name], sub, f"{path}.{name}")
+    elif kind == "array" and "items" in schema:
+        for i, item in enumerate(value):
+            errors += schema_errors(item, schema["items"], f"{path}[{i}]")
+    return errors
+
+
+def as_change_list(payload: dict) -> list:
+    """Aceita tanto {"changes": [...]} quanto uma mudança isolada"""
+    if "changes" in payload:
+        return list(payload["changes"])
+    return [payload]
+
+
+def _after_anchor(outline: Outline, section: Section) -> int:
+    """Linha antes da qual entra um 'after': logo após a primeira linha de conteúdo da seção"""
+    for i in range(section.line + 1, section.body_end_line):
+        if outline.lines[i].strip():
+            return i + 1
+    return section.line + 1
+
+
+def _edge_anchor(outline: Outline, section: Section, edge: str) -> int:
+    """Ponto de inserção no início (antes do 1º conteúdo) ou no final (após o último) do corpo"""
+    body = [i for i in range(section.line + 1, section.body_end_line) if outline.lines[i].strip()]
+    if not body:
+        return section.line + 1
+    return body[0] if edge == "start" else body[-1] + 1
+
+
+def _target_line(outline: Outline, section: Section, target: str = None):
+    """Índice da primeira linha do span da seção igual a `target` (None se ausente)"""
+    if target is None:
+        return None
+    for i in range(section.line + 1, section.end_line):
+        if outline.lines[i] == target:
+            return i
+    return None
+
+
+def plan_changes(outline: Outline, changes: list) -> tuple:
+    """
+    Resolve as mudanças contra o outline sem tocar no texto: (inserts, replaces,
+    new_sections) no formato de Outline.splice. Qualquer objeto com `find(label)`
+    e `lines[i]` serve (ex.: document.Document).
+    """
+    inserts = {}
+    replaces = {}
+    new_sections = {}
+
+    for change in changes:
+        label = change["section"]
+        text = change["lineToAdd"]
+        position = change["position"]
+        section = outline.find(label)
+
+        if section is None:
+            if position == "after":
+                lines = new_sections.setdefault(label, [])
+                if text not in lines:
+                    lines.append(text)
+            continue
+
+        if position == "replace":
+            line = _target_line(outline, section, change.get("target"))
+            if line is not None:
+                replaces[line] = text or None  # None: remove a linha
+            else:
+                replaces[section.line] = text or ""
+            continue
+
+        if position == "before":
+            anchor = section.line
+        elif change.get("edge") in ("start", "end"):
+            anchor = _edge_anchor(outline, section, change["edge"])
+        else:
+            anchor = _after_anchor(outline, section)
+        bucket = inserts.setdefault(anchor, [])
+        if text not in bucket:
+            bucket.append(text)
+
+    return inserts, replaces, new_sections
+
+
+def apply_changes(original: str, changes: list, outline: Outline = None) -> str:
+    """
+    Aplica N mudanças em uma passada. Regras de conflito (determinísticas):
+    - 'replace' na mesma linha: a última mudança da lista vence;
+    - inserções no mesmo ponto mantêm a ordem da lista, sem duplicar textos idênticos;
+    - 'before'/'after' junto de um 'replace' da mesma seção: as inserções ficam, a linha é substituída;
+    - seções inexistentes com 'after' viram UM bloco novo por rótulo, no final do documento.
+    """
+    with span("outline", chars=len(original)):
+        outline = outline or outline_for(original)
+    inserts, replaces, new_sections = plan_changes(outline, changes)
+
+    with span("splice", changes=len(changes)):
+        result = outline.splice(inserts, replaces)
+    for label, lines in new_sections.items():
+        result += f"\n\n## {label}\n" + "\n".join(lines)
+    return result
+
+
+def apply_change(original: str, change: dict, outline: Outline = None) -> str:
+    """Aplica a mudança no documento original"""
+    return apply_changes(original, [change], outline)
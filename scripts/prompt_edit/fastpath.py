@@ -0,0 +1,396 @@
+"""
+Caminho rápido local para instruções triviais de edição, sem chamar o modelo.
+
+Boa parte das instruções já traz a seção e o texto exato ("Adicione esta linha
+ao final da seção X: ...", "Mude o nome do assistente de Lucas para Pedro",
+"Remova a linha ... da seção Y", e os formatos do synth: 'Na seção "X", troque a
+linha:\n<antiga>\npor:\n<nova>' e 'Remova da seção "X" a linha:\n<linha>'). Um punhado de regras em português reconhece
+esses formatos, resolve a seção pelo SectionIndex e a linha afetada por busca no
+corpo do documento, e devolve mudanças PromptEditChange prontas para
+edits.apply_changes — em microssegundos, contra segundos de ida e volta à API.
+
+Cada regra dá uma confiança (a da seção resolvida, descontada quando o texto da
+linha é derivado da instrução, quando a linha-alvo é ambígua ou quando o termo
+trocado não vem entre aspas nem está ancorado na linha: "Mude a regra de emojis
+para ..." acha "emojis" no corpo, mas nada diz que é ele o valor trocado). Abaixo de
+`min_confidence` o chamador segue para o modelo. Replace/remove de linhas do
+corpo usam o campo local `target` e inserções "ao início/ao final da seção" o
+campo local `edge` (ver edits.py).
+
+Configuração via ambiente, no mesmo estilo do planner:
+PROMPT_EDIT_FAST_PATH=0 desliga; PROMPT_EDIT_FAST_PATH_MIN_CONFIDENCE (padrão 0.85).
+"""
+import os
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Optional
+
+from prompt_edit.outline import label_parts, outline_for, strip_accents
+from prompt_edit.pruning import tokenize
+
+DEFAULT_MIN_CONFIDENCE = 0.85
+DERIVED_TEXT_FACTOR = 0.9      # texto da linha montado a partir da instrução, não citado
+LABEL_ONLY_CONFIDENCE = 0.6    # termo antigo só aparece no rótulo de "rótulo: valor"
+AMBIGUOUS_CONFIDENCE = 0.5     # termo aparece em mais de uma linha
+UNANCHORED_CONFIDENCE = 0.6    # termo antigo sem aspas, fora de "rótulo: valor" e sem o assunto na linha
+
+ADD = r'(?:adicione|acrescente|inclua|insira)'
+EDGE = r'(?:(?:ao|no)\s+(?P<edge>final|fim|in[ií]cio)\s+)?'
+SECTION_WORD = r'se[cç][aã]o'
+QUOTED_SECTION = r'["“\']?(?P<section>[^"“”\'\n:]+?)["”\']?'
+
+TASK_PREFIX_RE = re.compile(r'^\s*tarefa\s*:\s*', re.IGNORECASE)
+ADD_LINE_RES = (
+    # "Adicione esta linha ao final da seção "X": <linha>"
+    re.compile(rf'^{ADD}\s+(?:esta|essa|a|uma)\s+linha\s+{EDGE}(?:da|na|à)\s+{SECTION_WORD}\s+{QUOTED_SECTION}'
+               rf'\s*:\s*(?P<line>.+)$', re.IGNORECASE | re.DOTALL),
+    # "Adicione ao final da seção "X" a linha: <linha>"
+    re.compile(rf'^{ADD}\s+{EDGE}(?:da|na|à)\s+{SECTION_WORD}\s+{QUOTED_SECTION}\s+(?:a|esta|essa)\s+linha'
+               rf'\s*:\s*(?P<line>.+)$', re.IGNORECASE | re.DOTALL),
+)
+ADD_ITEM_RE = re.compile(
+    rf'^{ADD}\s+(?P<item>[^\n:]+?)\s+(?:na|à|no|ao)\s+(?:lista|{SECTION_WORD}|parte|bloco)\s+'
+    rf'(?:de\s+|das?\s+|dos?\s+)?{QUOTED_SECTION}\s*\.?$', re.IGNORECASE)
+NEW_SECTION_RE = re.compile(
+    rf'^(?:{ADD}|crie)\s+uma\s+(?:nova\s+)?{SECTION_WORD}\s+(?:de|sobre|chamada)\s+["“]?(?P<title>[^"”:\n]+?)["”]?'
+    r'\s+com\s*:?\s*(?P<items>.+?)\s*\.?$', re.IGNORECASE | re.DOTALL)
+REPLACE_RE = re.compile(
+    r'^(?:mude|altere|troque|substitua|atualize|modifique)\s+(?P<rest>.+)\s+(?:para|por)\s+'
+    r'["“]?(?P<new>[^"”\n]+?)["”]?\s*\.?$', re.IGNORECASE)
+REMOVE_RE = re.compile(
+    r'^(?:remova|retire|exclua|apague|tire)\s+(?:a\s+linha\s+|a\s+regra\s+|o\s+item\s+)?["“]?(?P<text>[^"”\n]+?)["”]?'
+    rf'(?:\s+(?:da|na)\s+(?:{SECTION_WORD}|lista)\s+(?:de\s+)?{QUOTED_SECTION})?\s*\.?$', re.IGNORECASE)
+SECTION_LINE = rf'(?:da|na)\s+{SECTION_WORD}\s+{QUOTED_SECTION}'
+QUOTED_LINE = r'[ \t]*\n?(?P<{}>[^\n]*\S)[ \t]*'   # linha citada verbatim (mantém a indentação)
+REPLACE_LINE_RE = re.compile(
+    rf'^{SECTION_LINE}\s*,?\s+(?:troque|substitua|mude|altere)\s+a\s+linha\s*:{QUOTED_LINE.format("old")}'
+    rf'\n\s*(?:por|pela\s+linha)\s*:{QUOTED_LINE.format("new")}$', re.IGNORECASE)
+REMOVE_LINE_RE = re.compile(
+    rf'^(?:remova|retire|exclua|apague|tire)\s+{SECTION_LINE}\s+a\s+linha\s*:{QUOTED_LINE.format("line")}$',
+    re.IGNORECASE)
+SCOPE_RE = re.compile(r'\b(?:em\s+tod[oa]s?|n[ao]\s+(?:documento|prompt|se[cç][aã]o)|em\s+cada)\b', re.IGNORECASE)
+OF_RE = re.compile(r'\bde\s+', re.IGNORECASE)
+ARTICLE_RE = re.compile(r'^(?:o|a|os|as|um|uma|de|do|da|dos|das|que|sobre)\s+', re.IGNORECASE)
+LABEL_VALUE_RE = re.compile(r'^(?P<prefix>\s*(?:[*+-]|\d+[.)])?\s*)(?P<label>[^:\n]+?)\s*:\s*(?P<value>.*)$')
+BULLET_RE = re.compile(r'^\s*(?:[*+-]|\d+[.)])\s+')
+NUMBERED_TITLE_RE = re.compile(r'^(\d+)\)\s')
+
+
+@dataclass
+class FastEdit:
+    changes: list
+    confidence: float
+    rule: str
+
+    def as_response(self, multi: bool = False) -> dict:
+        """Mesmo formato da resposta do modelo (uma mudança, ou {"changes": [...]})"""
+        if multi or len(self.changes) > 1:
+            return {"changes": [dict(c) for c in self.changes]}
+        return dict(self.changes[0])
+
+
+def _fold(text: str) -> str:
+    return strip_accents(text.casefold())
+
+
+def _is_quoted(text: str) -> bool:
+    return text.strip()[:1] in '"“\''
+
+
+def _strip_quotes(text: str) -> str:
+    return text.strip().strip('"“”\'').strip()
+
+
+def _strip_articles(text: str) -> str:
+    return ARTICLE_RE.sub('', text.strip())
+
+
+def _find_term(line: str, term: str) -> Optional[tuple]:
+    """(início, fim) do termo como palavra inteira na linha; sem caixa e, se preciso, sem acento"""
+    m = re.search(rf'(?<!\w){re.escape(term)}(?!\w)', line, re.IGNORECASE)
+    if m:
+        return m.span()
+    folded = _fold(line)
+    if len(folded) == len(line):
+        m = re.search(rf'(?<!\w){re.escape(_fold(term))}(?!\w)', folded)
+        if m:
+            return m.span()
+    return None
+
+
+def _capitalize(text: str) -> str:
+    return text[:1].upper() + text[1:]
+
+
+@dataclass
+class _Stats:
+    handled: int = 0
+    fallback: int = 0
+    rules: dict = field(default_factory=dict)
+
+
+class FastPath:
+    """Regras sobre UM documento (outline em cache); contadores thread-safe."""
+
+    def __init__(self, document: str, min_confidence: float = DEFAULT_MIN_CONFIDENCE, enabled: bool = True):
+        self.outline = outline_for(document)
+        self.min_confidence = min_confidence
+        self.enabled = enabled
+        self._stats = _Stats()
+        self._lock = threading.Lock()
+        headings = {section.line for section in self.outline.sections}
+        self._body = [(i, line) for i, line in enumerate(self.outline.lines)
+                      if i not in headings and line.strip() and not line.lstrip().startswith(('```', '~~~'))]
+
+    @classmethod
+    def from_env(cls, document: str) -> "FastPath":
+        value = os.environ.get("PROMPT_EDIT_FAST_PATH_MIN_CONFIDENCE")
+        return cls(
+            document,
+            min_confidence=float(value) if value else DEFAULT_MIN_CONFIDENCE,
+            enabled=os.environ.get("PROMPT_EDIT_FAST_PATH", "1") not in ("", "0"),
+        )
+
+    # --- resolução ----------------------------------------------------------
+
+    def _heading(self, section) -> str:
+        return f"{'#' * section.level} {section.title}"
+
+    def _section_of(self, line: int):
+        """Seção mais interna cujo span contém a linha"""
+        found = None
+        for section in self.outline.sections:
+            if section.line > line:
+                break
+            if line < section.end_line:
+                found = section
+        return found
+
+    def _lines_with(self, term: str, section=None) -> list:
+        lines = self._body
+        if section is not None:
+            lines = [(i, line) for i, line in lines if section.line < i < section.end_line]
+        return [(i, line, span) for i, line in lines for span in [_find_term(line, term)] if span]
+
+    def _bullet(self, section) -> str:
+        """Prefixo de item usado no corpo da seção ("* " por padrão)"""
+        for line in self.outline.body_lines(section):
+            m = BULLET_RE.match(line)
+            if m:
+                return m.group(0).lstrip()
+        return "* "
+
+    def _new_section_label(self, title: str) -> str:
+        """Numera como os headings irmãos de nível 2 ("4) Regras" -> "5) Título")"""
+        numbers = [int(m.group(1)) for section in self.outline.sections if section.level == 2
+                   for m in [NUMBERED_TITLE_RE.match(section.title)] if m]
+        return f"{max(numbers) + 1}) {title}" if numbers else title
+
+    # --- regras -------------------------------------------------------------
+
+    def _add_line(self, text: str):
+        for pattern in ADD_LINE_RES:
+            m = pattern.match(text)
+            if not m:
+                continue
+            line = next((l.strip() for l in m.group('line').split('\n') if l.strip()), '')
+            match = self.outline.match(m.group('section'))
+            if not line or match is None:
+                return None
+            change = {"section": self._heading(match.section), "lineToAdd": _strip_quotes(line),
+                      "position": "after", "explanation": "Linha citada na instrução, na seção indicada"}
+            edge = _fold(m.group('edge') or '')
+            if edge:
+                change["edge"] = "start" if edge == "inicio" else "end"
+            return FastEdit([change], match.confidence, "add_line")
+        return None
+
+    def _add_item(self, text: str):
+        m = ADD_ITEM_RE.match(text)
+        if not m:
+            return None
+        match = self.outline.match(m.group('section'))
+        item = _strip_quotes(_strip_articles(m.group('item')))
+        if match is None or not item or re.match(r'(?:uma?\s+)?(?:linha|regra)\b', item, re.IGNORECASE):
+            return None
+        change = {"section": self._heading(match.section),
+                  "lineToAdd": self._bullet(match.section) + _capitalize(item),
+                  "position": "after", "edge": "end", "explanation": "Item novo na lista da seção indicada"}
+        return FastEdit([change], round(match.confidence * DERIVED_TEXT_FACTOR, 3), "add_item")
+
+    def _new_section(self, text: str):
+        m = NEW_SECTION_RE.match(text)
+        if not m:
+            return None
+        title = _capitalize(_strip_quotes(m.group('title')))
+        items = [_capitalize(_strip_quotes(item)) for item in re.split(r'[;\n]', m.group('items')) if item.strip()]
+        if not items:
+            return None
+        match = self.outline.match(title)
+        if match is not None:
+            # A seção já existe: os itens entram nela
+            label, bullet, confidence = self._heading(match.section), self._bullet(match.section), match.confidence
+        else:
+            label, bullet, confidence = self._new_section_label(title), "* ", 1.0
+        changes = [{"section": label, "lineToAdd": bullet + item, "position": "after", "edge": "end",
+                    "explanation": "Seção nova com os itens da instrução" if match is None else
+                    "Itens na seção já existente"} for item in items]
+        return FastEdit(changes, round(confidence * DERIVED_TEXT_FACTOR, 3), "new_section")
+
+    def _replace_change(self, line_no: int, old_line: str, new_line: str, explanation: str) -> Optional[dict]:
+        section = self._section_of(line_no)
+        if section is None:
+            return None
+        return {"section": self._heading(section), "lineToAdd": new_line, "position": "replace",
+                "target": old_line, "explanation": explanation}
+
+    @staticmethod
+    def _anchored(subject: str, line: str, start: int, end: int) -> bool:
+        """
+        O termo em line[start:end] é o valor de que a instrução fala: sem assunto
+        ("Substitua X por Y") o termo é o próprio objeto; com assunto ("o nome do
+        assistente de Lucas"), alguma palavra dele precisa estar no resto da linha
+        """
+        words = set(tokenize(subject))
+        return not words or bool(words & set(tokenize(f"{line[:start]} {line[end:]}")))
+
+    def _replace(self, text: str):
+        m = REPLACE_RE.match(text)
+        if not m:
+            return None
+        rest, new = m.group('rest').strip(), _strip_quotes(m.group('new'))
+        if SCOPE_RE.search(new):
+            return None  # "... para Pedro em todo o documento": escopo além de uma linha
+        candidates = []
+
+        # "Mude <o quê> de <antigo> para <novo>": tenta cada "de" como separador
+        splits = [(rest[:of.start()], rest[of.end():]) for of in OF_RE.finditer(rest)]
+        splits.append(('', rest))  # "Substitua <antigo> por <novo>"
+        for subject, old in splits:
+            quoted, old = _is_quoted(old), _strip_quotes(old)
+            if not old:
+                continue
+            found = self._lines_with(old)
+            if not found:
+                continue
+            i, line, (start, end) = found[0]
+            confidence = 1.0 if len(found) == 1 else AMBIGUOUS_CONFIDENCE
+            label = LABEL_VALUE_RE.match(line)
+            if label and start < label.end('label'):
+                confidence = min(confidence, LABEL_ONLY_CONFIDENCE)
+            elif not quoted and not label and not self._anchored(subject, line, start, end):
+                confidence = min(confidence, UNANCHORED_CONFIDENCE)
+            change = self._replace_change(i, line, line[:start] + new + line[end:],
+                                          f'"{line[start:end]}" trocado por "{new}"')
+            if change:
+                candidates.append(FastEdit([change], confidence, "replace_term"))
+
+        # "Altere <rótulo> para <valor>": linha "rótulo: valor"
+        _, key = label_parts(_strip_articles(rest))
+        found = []
+        for i, line in self._body:
+            label = LABEL_VALUE_RE.match(line)
+            if not label:
+                continue
+            _, line_key = label_parts(label.group('label'))
+            if line_key == key:
+                found.append((1.0, i, line, label))
+            elif key and line_key and (key in line_key or line_key in key):
+                found.append((0.9, i, line, label))
+        if found:
+            found.sort(key=lambda item: -item[0])
+            score, i, line, label = found[0]
+            if len(found) > 1 and found[1][0] == score:
+                score = AMBIGUOUS_CONFIDENCE
+            new_line = f"{label.group('prefix')}{label.group('label')}: {new}"
+            change = self._replace_change(i, line, new_line, f'{label.group("label")} passa a ser "{new}"')
+            if change:
+                candidates.append(FastEdit([change], score, "replace_value"))
+
+        return max(candidates, key=lambda edit: edit.confidence, default=None)
+
+    def _remove(self, text: str):
+        m = REMOVE_RE.match(text)
+        if not m:
+            return None
+        term = _strip_quotes(_strip_articles(m.group('text')))
+        section = None
+        confidence = 1.0
+        if m.group('section'):
+            match = self.outline.match(m.group('section'))
+            if match is None:
+                return None
+            section, confidence = match.section, match.confidence
+        found = self._lines_with(term, section) if term else []
+        if not found:
+            return None
+        i, line, _ = found[0]
+        if len(found) > 1:
+            confidence = AMBIGUOUS_CONFIDENCE
+        change = self._replace_change(i, line, "", f'Linha removida: "{line.strip()}"')
+        return FastEdit([change], confidence, "remove_line") if change else None
+
+    def _section_line(self, label: str, text: str) -> Optional[tuple]:
+        """(índice, linha, confiança) da linha citada no span da seção indicada"""
+        match = self.outline.match(label)
+        if match is None:
+            return None
+        section = match.section
+        found = [(i, line) for i, line in self._body
+                 if section.line < i < section.end_line and line.strip() == text.strip()]
+        if not found:
+            return None
+        i, line = found[0]
+        return i, line, match.confidence if len(found) == 1 else AMBIGUOUS_CONFIDENCE
+
+    def _replace_line(self, text: str):
+        m = REPLACE_LINE_RE.match(text)
+        found = m and self._section_line(m.group('section'), m.group('old'))
+        if not found:
+            return None
+        i, line, confidence = found
+        change = self._replace_change(i, line, m.group('new'), "Linha citada trocada pela nova")
+        return FastEdit([change], confidence, "replace_line") if change else None
+
+    def _remove_section_line(self, text: str):
+        m = REMOVE_LINE_RE.match(text)
+        found = m and self._section_line(m.group('section'), m.group('line'))
+        if not found:
+            return None
+        i, line, confidence = found
+        change = self._replace_change(i, line, "", f'Linha removida: "{line.strip()}"')
+        return FastEdit([change], confidence, "remove_line") if change else None
+
+    RULES = ("_add_line", "_new_section", "_add_item", "_replace_line", "_remove_section_line",
+             "_replace", "_remove")
+
+    # --- API ----------------------------------------------------------------
+
+    def parse(self, instruction: str) -> Optional[FastEdit]:
+        """Melhor leitura local da instrução (sem aplicar o limiar); None se nenhuma regra casa"""
+        text = TASK_PREFIX_RE.sub('', instruction.strip())
+        edits = [edit for name in self.RULES for edit in [getattr(self, name)(text)] if edit]
+        return max(edits, key=lambda edit: edit.confidence, default=None)
+
+    def edit(self, instruction: str) -> Optional[FastEdit]:
+        """Mudança local se a confiança passa do limiar; senão None (o chamador usa o modelo)"""
+        edit = self.parse(instruction) if self.enabled else None
+        accepted = edit is not None and edit.confidence >= self.min_confidence
+        with self._lock:
+            if accepted:
+                self._stats.handled += 1
+                self._stats.rules[edit.rule] = self._stats.rules.get(edit.rule, 0) + 1
+            else:
+                self._stats.fallback += 1
+        return edit if accepted else None
+
+    def stats(self) -> dict:
+        with self._lock:
+            total = self._stats.handled + self._stats.fallback
+            return {
+                "handled": self._stats.handled,
+                "fallback": self._stats.fallback,
+                "fraction": round(self._stats.handled / total, 4) if total else 0.0,
+                "rules": dict(self._stats.rules),
+            }
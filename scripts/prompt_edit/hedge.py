@@ -0,0 +1,166 @@
+"""
+Requisições "hedged" entre modelos: a primeira resposta válida vence.
+
+A edição vai para o modelo primário e, depois de `delay` segundos (0 = na hora),
+para o próximo modelo de reserva, e assim por diante. Uma tentativa que falha
+(erro HTTP ou resposta reprovada) libera o próximo modelo sem esperar o atraso.
+A primeira resposta aprovada por `accept` vence e as demais são canceladas (a
+conexão em voo é fechada), trocando um pouco de custo por um p99 bem menor.
+
+`edit_acceptor` aprova só o que passa no schema e que `apply_changes` realmente
+aplica ao documento.
+"""
+import asyncio
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+from prompt_edit.client import ChatResult
+from prompt_edit.edits import CHANGE_SCHEMA, apply_changes, as_change_list, schema_errors
+from prompt_edit.outline import outline_for
+
+JSON_OBJECT_START = "{"
+
+
+class InvalidResponse(ValueError):
+    """Resposta recebida, mas reprovada (JSON/schema/aplicação)."""
+
+
+class HedgeFailed(Exception):
+    """Nenhum modelo produziu resposta aprovada."""
+
+    def __init__(self, attempts: list):
+        details = "; ".join(f"{a.model}: {a.outcome} {a.detail}".strip() for a in attempts)
+        super().__init__(f"nenhuma resposta válida ({details})")
+        self.attempts = attempts
+
+
+@dataclass
+class HedgeAttempt:
+    model: str
+    launched_s: float                  # instante do disparo, relativo ao início
+    latency_s: Optional[float] = None
+    outcome: str = "pending"           # won | invalid | error | cancelled
+    detail: str = ""
+
+
+@dataclass
+class HedgedResult:
+    model: str
+    value: object                      # o que `accept` devolveu
+    result: ChatResult
+    latency_s: float
+    attempts: list = field(default_factory=list)
+
+    @property
+    def launched(self) -> int:
+        """Requisições disparadas para obter esta resposta (custo do hedge)"""
+        return len(self.attempts)
+
+    def as_dict(self) -> dict:
+        return {
+            "model": self.model,
+            "latency_s": round(self.latency_s, 4),
+            "launched": self.launched,
+            "attempts": [
+                {"model": a.model, "launched_s": round(a.launched_s, 4),
+                 "latency_s": None if a.latency_s is None else round(a.latency_s, 4),
+                 "outcome": a.outcome, "detail": a.detail}
+                for a in self.attempts
+            ],
+        }
+
+
+def parse_json_object(text: str) -> dict:
+    """JSON puro ou o primeiro objeto no meio de texto livre (estratégia json_only)"""
+    text = (text or "").strip()
+    try:
+        return json.loads(text)
+    except ValueError:
+        start, end = text.find(JSON_OBJECT_START), text.rfind("}")
+        if start < 0 or end <= start:
+            raise InvalidResponse("sem objeto JSON na resposta")
+        try:
+            return json.loads(text[start:end + 1])
+        except ValueError as e:
+            raise InvalidResponse(f"JSON inválido: {e}")
+
+
+def edit_acceptor(document: str, schema: dict = CHANGE_SCHEMA, expected_lines=()):
+    """
+    accept(result) -> (changes, updated) para respostas PromptEditChange(s).
+    Reprova se o JSON não segue o schema, se o documento não muda ou se alguma
+    lineToAdd / linha esperada não aparece no documento atualizado.
+    """
+    outline = outline_for(document)
+
+    def accept(result: ChatResult):
+        payload = parse_json_object(result.content)
+        errors = schema_errors(payload, schema)
+        if errors:
+            raise InvalidResponse("; ".join(errors[:3]))
+        changes = as_change_list(payload)
+        updated = apply_changes(document, changes, outline)
+        if updated == document:
+            raise InvalidResponse("mudança não altera o documento")
+        missing = [line for line in [c["lineToAdd"] for c in changes] + list(expected_lines) if line not in updated]
+        if missing:
+            raise InvalidResponse(f"linha ausente após aplicar: {missing[0][:60]}")
+        return changes, updated
+
+    return accept
+
+
+async def hedged_chat(client, build, models: list, accept, delay: float = 1.0,
+                      timeout: float = None) -> HedgedResult:
+    """
+    `client` é um AsyncChatClient; `build(model)` monta o payload de cada modelo;
+    `models` em ordem de preferência (primário primeiro). Levanta HedgeFailed se
+    todos falharem.
+    """
+    start = time.perf_counter()
+    queue = list(models)
+    running = {}  # task -> HedgeAttempt
+    attempts = []
+
+    async def run(model: str):
+        result = await client.chat(build(model), timeout)
+        return result, accept(result)
+
+    def launch():
+        attempt = HedgeAttempt(queue[0], time.perf_counter() - start)
+        running[asyncio.create_task(run(queue.pop(0)))] = attempt
+        attempts.append(attempt)
+        return time.perf_counter() + delay
+
+    next_launch = launch()
+    try:
+        while running or queue:
+            if not running:
+                next_launch = launch()
+                continue
+            wait = max(0.0, next_launch - time.perf_counter()) if queue else None
+            done, _ = await asyncio.wait(running, timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                next_launch = launch()
+                continue
+            for task in done:
+                attempt = running.pop(task)
+                attempt.latency_s = time.perf_counter() - start - attempt.launched_s
+                if task.exception() is None:
+                    result, value = task.result()
+                    attempt.outcome = "won"
+                    return HedgedResult(attempt.model, value, result, time.perf_counter() - start, attempts)
+                error = task.exception()
+                attempt.outcome = "invalid" if isinstance(error, InvalidResponse) else "error"
+                attempt.detail = str(error)[:200]
+                # Falha libera o próximo modelo já, mesmo com outras tentativas em voo
+                next_launch = time.perf_counter()
+        raise HedgeFailed(attempts)
+    finally:
+        for task, attempt in running.items():
+            task.cancel()
+            attempt.outcome = "cancelled"
+        if running:
+            await asyncio.gather(*running, return_exceptions=True)
@@ -0,0 +1,87 @@
+"""
+Layout de requisição amigável ao cache de prefixo do provedor.
+
+O cache automático de prompts só reaproveita o PREFIXO idêntico da requisição
+(a partir de ~1024 tokens). Por isso a ordem é sempre: system prompt estático →
+documento (estático entre edições do mesmo prompt) → instrução (variável), cada
+um em sua própria mensagem. O usage.prompt_tokens_details.cached_tokens de cada
+resposta alimenta CacheStats: taxa de acerto, custo economizado e diferença de
+latência entre chamadas com e sem cache.
+"""
+import hashlib
+from dataclasses import dataclass, field
+
+# USD por 1M tokens de entrada: (normal, em cache)
+INPUT_PRICES = {
+    "gpt-5.1": (1.25, 0.125),
+    "gpt-5": (1.25, 0.125),
+    "gpt-4.1": (2.00, 0.50),
+    "gpt-4.1-mini": (0.40, 0.10),
+    "gpt-4o": (2.50, 1.25),
+    "gpt-4o-mini": (0.15, 0.075),
+}
+
+
+def build_messages(system: str, document: str, instruction: str, document_label: str = "DOCUMENTO") -> list:
+    """Mensagens com prefixo estável: system, documento e, por último, a instrução"""
+    return [
+        {"role": "system", "content": system},
+        {"role": "user", "content": f"{document_label}:\n{document}"},
+        {"role": "user", "content": instruction},
+    ]
+
+
+def prompt_cache_key(document: str) -> str:
+    """Chave opcional de roteamento (prompt_cache_key): mesmo documento -> mesmo servidor de cache"""
+    return "doc-" + hashlib.sha256(document.encode("utf-8")).hexdigest()[:16]
+
+
+def cached_tokens(usage: dict) -> int:
+    return ((usage or {}).get("prompt_tokens_details") or {}).get("cached_tokens", 0) or 0
+
+
+@dataclass
+class CacheStats:
+    calls: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    saved_usd: float = 0.0
+    latencies_hit: list = field(default_factory=list)
+    latencies_miss: list = field(default_factory=list)
+
+    def record(self, model: str, usage: dict, latency: float = None):
+        usage = usage or {}
+        prompt = usage.get("prompt_tokens", 0) or 0
+        cached = cached_tokens(usage)
+        self.calls += 1
+        self.prompt_tokens += prompt
+        self.cached_tokens += cached
+        normal, discounted = INPUT_PRICES.get(model, INPUT_PRICES["gpt-4o"])
+        self.saved_usd += cached * (normal - discounted) / 1_000_000
+        if latency is not None:
+            (self.latencies_hit if cached else self.latencies_miss).append(latency)
+
+    @property
+    def hit_ratio(self) -> float:
+        return self.cached_tokens / self.prompt_tokens if self.prompt_tokens else 0.0
+
+    def summary(self) -> dict:
+        def mean(values):
+            return round(sum(values) / len(values), 3) if values else None
+        return {
+            "calls": self.calls,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "hit_ratio": round(self.hit_ratio, 4),
+            "saved_usd": round(self.saved_usd, 6),
+            "latency_hit_s": mean(self.latencies_hit),
+            "latency_miss_s": mean(self.latencies_miss),
+        }
+
+    def describe(self) -> str:
+        s = self.summary()
+        text = (f"cache de prefixo: {s['cached_tokens']}/{s['prompt_tokens']} tokens "
+                f"({s['hit_ratio']:.0%}), economia ≈ US$ {s['saved_usd']:.4f}")
+        if s["latency_hit_s"] is not None and s["latency_miss_s"] is not None:
+            text += f", latência com cache {s['latency_hit_s']}s vs sem {s['latency_miss_s']}s"
+        return text
@@ -0,0 +1,386 @@
+"""
+Servidor local compatível com POST /v1/chat/completions, para rodar os scripts sem rede.
+
+Respostas, em ordem de prioridade:
+1. gravadas: o mesmo diretório do ResponseCache (PROMPT_EDIT_CACHE=record), pela chave do payload;
+2. roteirizadas: regras JSONL {"match": "...", "model": "...", "json": {...} | "content": "..."},
+   a primeira cuja substring aparece na última mensagem do usuário;
+3. fallback: objeto mínimo que satisfaz o json_schema pedido, ou o bloco ```prompt-completo```
+   devolvido sem alteração (eco).
+
+Latência por perfil (TTFB log-normal + tokens/s de decodificação), streaming SSE com
+usage no último chunk, truncamento (finish_reason="length") e 429 injetados por
+probabilidade ou por RPM/TPM emulados, com os headers x-ratelimit-* da OpenAI.
+Tudo com semente fixa: a mesma sequência de requisições produz as mesmas falhas.
+
+    python -m prompt_edit.mockserver --port 8765 --profile gpt-4o --fixtures ../tests/fixtures/mock_responses.jsonl
+    OPENAI_BASE_URL=http://127.0.0.1:8765/v1 python test_edit_scenarios.py --async
+
+Em processo: `with MockServer(profile="instant") as base_url: ChatClient(base_url=base_url)`.
+"""
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from prompt_edit.cache import ResponseCache
+from prompt_edit.ratelimit import TokenBucket
+
+FENCED_DOCUMENT_RE = re.compile(r"```prompt-completo\n([\s\S]*)\n```")  # guloso: o documento tem blocos de código
+PREFIX_CACHE_MIN_TOKENS = 1024
+PREFIX_CACHE_BLOCK = 128
+
+
+@dataclass(frozen=True)
+class LatencyProfile:
+    ttfb_median: float       # s até o primeiro byte
+    ttfb_sigma: float        # dispersão log-normal do TTFB
+    tokens_per_sec: float    # decodificação (0 = instantâneo)
+    chunk_tokens: int = 4    # tokens por evento SSE
+
+    def ttfb(self, rng: random.Random) -> float:
+        if self.ttfb_median <= 0:
+            return 0.0
+        return self.ttfb_median * math.exp(rng.gauss(0.0, self.ttfb_sigma))
+
+    def decode_time(self, tokens: int) -> float:
+        return tokens / self.tokens_per_sec if self.tokens_per_sec > 0 else 0.0
+
+
+# Ordem de grandeza observada nos benchmarks (ver full_document_models_test.py)
+PROFILES = {
+    "instant": LatencyProfile(0.0, 0.0, 0.0),
+    "fast": LatencyProfile(0.05, 0.2, 400.0),
+    "gpt-4o": LatencyProfile(0.45, 0.35, 90.0),
+    "gpt-4o-mini": LatencyProfile(0.35, 0.35, 120.0),
+    "gpt-5.1": LatencyProfile(1.8, 0.5, 60.0),
+}
+
+
+def count_tokens(text: str) -> int:
+    return max(1, len(text) // 4) if text else 0
+
+
+def load_rules(path: str) -> list:
+    rules = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if line and not line.startswith("#"):
+                rules.append(json.loads(line))
+    return rules
+
+
+def example_for_schema(schema: dict):
+    """Menor valor que satisfaz o schema (strict: todas as propriedades presentes)"""
+    if "enum" in schema:
+        return schema["enum"][0]
+    kind = schema.get("type")
+    if isinstance(kind, list):
+        kind = next((k for k in kind if k != "null"), "null")
+    if kind == "object":
+        return {name: example_for_schema(sub) for name, sub in schema.get("properties", {}).items()}
+    if kind == "array":
+        return [example_for_schema(schema.get("items", {}))] if schema.get("minItems") else []
+    if kind in ("integer", "number"):
+        return schema.get("minimum", 0)
+    if kind == "boolean":
+        return False
+    if kind == "null":
+        return None
+    return "mock"
+
+
+def _schema_of(payload: dict):
+    fmt = payload.get("response_format") or {}
+    if fmt.get("type") == "json_schema":
+        return fmt.get("json_schema", {}).get("schema") or {}
+    return None
+
+
+def _fit_schema(obj, schema):
+    """Uma regra com mudança única atende também o formato {"changes": [...]}"""
+    props = (schema or {}).get("properties", {})
+    if (isinstance(obj, dict) and "changes" not in obj
+            and props.get("changes", {}).get("type") == "array"):
+        return {"changes": [obj]}
+    return obj
+
+
+class MockBackend:
+    def __init__(self, profile: str = "fast", rules: list = (), recorded_dir: str = None,
+                 rate_429: float = 0.0, retry_after: float = 1.0, truncate: float = 0.0,
+                 rpm: int = None, tpm: int = None, seed: int = 0):
+        self.profile = profile
+        self.rules = list(rules)
+        self.recorded = ResponseCache(recorded_dir, mode="replay") if recorded_dir else None
+        self.rate_429 = rate_429
+        self.retry_after = retry_after
+        self.truncate = truncate
+        self.rpm = rpm
+        self.tpm = tpm
+        self.rng = random.Random(seed)
+        self.requests = 0
+        self.injected_429 = 0
+        self._buckets = {}
+        self._prefixes = set()
+        self._lock = threading.Lock()
+
+    def latency(self, model: str) -> LatencyProfile:
+        """profile="auto" escolhe pelo nome do modelo da requisição"""
+        if self.profile == "auto":
+            return PROFILES.get(model, PROFILES["fast"])
+        return PROFILES[self.profile]
+
+    def _draw(self) -> float:
+        with self._lock:
+            return self.rng.random()
+
+    def _content(self, payload: dict) -> str:
+        if self.recorded is not None:
+            data = self.recorded.get(payload)
+            if data is not None:
+                return data["choices"][0]["message"]["content"] or ""
+        messages = payload.get("messages", [])
+        last = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+        schema = _schema_of(payload)
+        for rule in self.rules:
+            if rule.get("model") and rule["model"] != payload.get("model"):
+                continue
+            if rule.get("match", "").casefold() in last.casefold():
+                if "json" in rule:
+                    return json.dumps(_fit_schema(rule["json"], schema), ensure_ascii=False)
+                return rule.get("content", "")
+        if schema is not None:
+            return json.dumps(example_for_schema(schema), ensure_ascii=False)
+        for m in messages:
+            found = FENCED_DOCUMENT_RE.search(m.get("content") or "")
+            if found:
+                return f"```prompt-completo\n{found.group(1)}\n```"
+        return "ok"
+
+    def _usage(self, payload: dict, completion: str) -> dict:
+        messages = payload.get("messages", [])
+        prompt = sum(count_tokens(m.get("content") or "") + 4 for m in messages)
+        # Cache de prompts emulado: prefixo (todas as mensagens menos a última) já visto
+        prefix = json.dumps(messages[:-1], sort_keys=True, ensure_ascii=False)
+        prefix_tokens = prompt - count_tokens(messages[-1].get("content") or "") - 4 if messages else 0
+        digest = hashlib.sha256(f"{payload.get('model')}\0{prefix}".encode("utf-8")).hexdigest()
+        with self._lock:
+            seen = digest in self._prefixes
+            self._prefixes.add(digest)
+        cached = 0
+        if seen and prefix_tokens >= PREFIX_CACHE_MIN_TOKENS:
+            cached = prefix_tokens // PREFIX_CACHE_BLOCK * PREFIX_CACHE_BLOCK
+        tokens = count_tokens(completion)
+        return {
+            "prompt_tokens": prompt,
+            "completion_tokens": tokens,
+            "total_tokens": prompt + tokens,
+            "prompt_tokens_details": {"cached_tokens": cached},
+        }
+
+    def admit(self, model: str, tokens: int):
+        """(status, headers): 429 injetado ou por RPM/TPM emulados, senão 200 + x-ratelimit-*"""
+        if self._draw() < self.rate_429:
+            with self._lock:
+                self.injected_429 += 1
+            return 429, {"retry-after": f"{self.retry_after:g}"}
+        if not (self.rpm or self.tpm):
+            return 200, {}
+        now = time.monotonic()
+        with self._lock:
+            if model not in self._buckets:
+                rpm, tpm = self.rpm or 10_000, self.tpm or 10_000_000
+                self._buckets[model] = (TokenBucket(rpm, rpm / 60.0), TokenBucket(tpm, tpm / 60.0))
+            requests, budget = self._buckets[model]
+            wait = max(requests.wait_time(1, now), budget.wait_time(tokens, now))
+            if wait <= 0:
+                requests.tokens -= 1
+                budget.tokens -= tokens
+            headers = {
+                "x-ratelimit-limit-requests": f"{requests.capacity:.0f}",
+                "x-ratelimit-remaining-requests": f"{max(0, requests.tokens):.0f}",
+                "x-ratelimit-reset-requests": f"{(requests.capacity - requests.tokens) / requests.rate:.3f}s",
+                "x-ratelimit-limit-tokens": f"{budget.capacity:.0f}",
+                "x-ratelimit-remaining-tokens": f"{max(0, budget.tokens):.0f}",
+                "x-ratelimit-reset-tokens": f"{(budget.capacity - budget.tokens) / budget.rate:.3f}s",
+            }
+            if wait > 0:
+                self.injected_429 += 1
+                headers["retry-after-ms"] = f"{wait * 1000:.0f}"
+                return 429, headers
+        return 200, headers
+
+    def respond(self, payload: dict) -> dict:
+        """Plano da resposta: status, headers, conteúdo, finish_reason, usage e tempos"""
+        with self._lock:
+            self.requests += 1
+        model = payload.get("model", "")
+        profile = self.latency(model)
+        content = self._content(payload)
+        usage = self._usage(payload, content)
+        status, headers = self.admit(model, usage["total_tokens"])
+        finish_reason = "stop"
+        if status == 200 and content and self._draw() < self.truncate:
+            content = content[: max(1, int(len(content) * self._draw()))]
+            finish_reason = "length"
+            usage["completion_tokens"] = count_tokens(content)
+            usage["total_tokens"] = usage["prompt_tokens"] + usage["completion_tokens"]
+        with self._lock:
+            ttfb = profile.ttfb(self.rng)
+        return {
+            "status": status, "headers": headers, "model": model, "content": content,
+            "finish_reason": finish_reason, "usage": usage, "ttfb": ttfb, "profile": profile,
+        }
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    backend: MockBackend = None
+
+    def log_message(self, *args):
+        pass
+
+    def _send_json(self, status: int, body: dict, headers: dict = None):
+        blob = json.dumps(body, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(blob)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(blob)
+
+    def do_POST(self):
+        if self.path.rstrip("/") not in ("/v1/chat/completions", "/chat/completions"):
+            self._send_json(404, {"error": {"message": f"rota desconhecida: {self.path}", "type": "not_found"}})
+            return
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers.get("Content-Length") or 0)))
+        except json.JSONDecodeError as e:
+            self._send_json(400, {"error": {"message": f"JSON inválido: {e}", "type": "invalid_request_error"}})
+            return
+
+        plan = self.backend.respond(payload)
+        if plan["status"] == 429:
+            self._send_json(429, {"error": {"message": "Rate limit reached (mock)", "type": "rate_limit_exceeded"}},
+                            plan["headers"])
+            return
+
+        time.sleep(plan["ttfb"])
+        if payload.get("stream"):
+            self._stream(payload, plan)
+            return
+        time.sleep(plan["profile"].decode_time(plan["usage"]["completion_tokens"]))
+        self._send_json(200, {
+            "id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": plan["model"],
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": plan["content"]},
+                "finish_reason": plan["finish_reason"],
+            }],
+            "usage": plan["usage"],
+        }, plan["headers"])
+
+    def _stream(self, payload: dict, plan: dict):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Connection", "close")
+        for name, value in plan["headers"].items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.close_connection = True
+
+        base = {"id": f"chatcmpl-mock-{uuid.uuid4().hex[:12]}", "object": "chat.completion.chunk",
+                "created": int(time.time()), "model": plan["model"]}
+
+        def event(body: dict):
+            self.wfile.write(f"data: {json.dumps({**base, **body}, ensure_ascii=False)}\n\n".encode("utf-8"))
+            self.wfile.flush()
+
+        profile, content = plan["profile"], plan["content"]
+        step = max(1, profile.chunk_tokens * 4)  # ~4 chars por token
+        event({"choices": [{"index": 0, "delta": {"role": "assistant", "content": ""}, "finish_reason": None}]})
+        for i in range(0, len(content), step):
+            piece = content[i:i + step]
+            time.sleep(profile.decode_time(count_tokens(piece)))
+            event({"choices": [{"index": 0, "delta": {"content": piece}, "finish_reason": None}]})
+        event({"choices": [{"index": 0, "delta": {}, "finish_reason": plan["finish_reason"]}]})
+        if (payload.get("stream_options") or {}).get("include_usage"):
+            event({"choices": [], "usage": plan["usage"]})
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+
+
+class MockServer:
+    """Servidor em thread daemon; `with MockServer(...) as base_url` para testes em processo"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, **backend_options):
+        self.backend = MockBackend(**backend_options)
+        handler = type("MockHandler", (_Handler,), {"backend": self.backend})
+        self.httpd = ThreadingHTTPServer((host, port), handler)
+        self.httpd.daemon_threads = True
+        self._thread = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> str:
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self.base_url
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> str:
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Servidor local compatível com o chat completions da OpenAI")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--profile", default="fast", choices=["auto", *PROFILES],
+                        help="Latência (auto = pelo modelo da requisição)")
+    parser.add_argument("--fixtures", help="Regras JSONL roteirizadas")
+    parser.add_argument("--recorded", help="Diretório de respostas gravadas (ex.: out/cache)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Probabilidade de 429 por requisição")
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    parser.add_argument("--truncate", type=float, default=0.0, help="Probabilidade de finish_reason=length")
+    parser.add_argument("--rpm", type=int)
+    parser.add_argument("--tpm", type=int)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = MockServer(
+        args.host, args.port, profile=args.profile,
+        rules=load_rules(args.fixtures) if args.fixtures else (),
+        recorded_dir=args.recorded, rate_429=args.rate_429, retry_after=args.retry_after,
+        truncate=args.truncate, rpm=args.rpm, tpm=args.tpm, seed=args.seed,
+    )
+    print(f"Mock em {server.base_url} (perfil {args.profile}); use OPENAI_BASE_URL={server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\n{server.backend.requests} requisições, {server.backend.injected_429} × 429")
+        server.httpd.server_close()
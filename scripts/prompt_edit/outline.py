@@ -0,0 +1,264 @@
+"""
+Outline de documentos markdown (prompts de agente).
+
+O documento é analisado UMA vez: para cada heading guardamos nível, intervalo de
+linhas, offsets de caracteres e linhas do corpo. As edições são aplicadas por
+splice nos offsets conhecidos, sem split/join do documento inteiro a cada mudança.
+
+O rótulo de seção devolvido pelo modelo ("Tecnologias", "## 3) Tecnologias padrão",
+"Seção 3") é resolvido pelo SectionIndex: chave exata sem numeração, acentos e
+marcadores markdown em O(1); senão, índice invertido de trigramas de caracteres
+(Dice) com bônus para rótulo contido no heading e para numeração igual. Números
+diferentes dos dois lados ("Nova 5" x "Nova 1", "5) Regras" x "4) Regras gerais")
+descartam o candidato fuzzy: quase sempre é um pedido de seção nova numerada.
+Cada resolução traz uma confiança; abaixo do mínimo não há seção (vira seção nova).
+"""
+import re
+import unicodedata
+from collections import Counter
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Optional
+
+HEADING_RE = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+FENCE_RE = re.compile(r'^\s*(```|~~~)')
+NUMBERING_RE = re.compile(r'^(?:\d+(?:\.\d+)*[.)]?|[a-z][.)])\s+')
+MARKERS_RE = re.compile(r'[*_`]+')
+LABEL_PREFIX_RE = re.compile(r'^(?:secao|section|topico)\s+')
+NUMBER_RE = re.compile(r'^(\d+(?:\.\d+)*)[.)]?(?:\s+|$)')
+PUNCT_RE = re.compile(r'[^\w\s]+')
+DIGITS_RE = re.compile(r'\d+')
+
+MIN_CONFIDENCE = 0.6
+NUMBER_ONLY_CONFIDENCE = 0.75   # rótulo só com numeração ("3)", "Seção 3")
+NUMBER_BONUS = 0.15
+AMBIGUITY_MARGIN = 0.05
+
+
+def strip_accents(text: str) -> str:
+    """'Negócio' -> 'Negocio'"""
+    return "".join(c for c in unicodedata.normalize("NFKD", text) if not unicodedata.combining(c))
+
+
+def normalize_key(label: str) -> str:
+    """'## 3) **Tecnologias** padrão' -> 'tecnologias padrão'"""
+    text = MARKERS_RE.sub('', label.strip().lstrip('#')).strip()
+    text = NUMBERING_RE.sub('', text.casefold())
+    return ' '.join(text.split())
+
+
+@lru_cache(maxsize=4096)
+def label_parts(label: str) -> tuple:
+    """'Seção 3) **Tecnologias** padrão:' -> ('3', 'tecnologias padrao')"""
+    text = strip_accents(MARKERS_RE.sub('', label.strip().lstrip('#')).strip().casefold())
+    text = LABEL_PREFIX_RE.sub('', text)
+    m = NUMBER_RE.match(text)
+    text = text[m.end():] if m else NUMBERING_RE.sub('', text)
+    return (m.group(1) if m else None), ' '.join(PUNCT_RE.sub(' ', text).split())
+
+
+def numbers_differ(number: Optional[str], key: str, other_number: Optional[str], other_key: str) -> bool:
+    """Os dois rótulos têm numeração (de seção ou no texto) e ela não bate"""
+    if number and other_number and number != other_number:
+        return True
+    digits, other_digits = DIGITS_RE.findall(key), DIGITS_RE.findall(other_key)
+    return bool(digits and other_digits and digits != other_digits)
+
+
+def trigrams(key: str) -> set:
+    padded = f"  {key} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+@dataclass
+class Section:
+    title: str            # texto do heading, sem os '#'
+    key: str              # chave normalizada (ver normalize_key)
+    level: int            # 1 para '#', 2 para '##', ...
+    line: int             # índice da linha do heading
+    body_end_line: int    # fim (exclusivo) do corpo direto, antes de qualquer sub-heading
+    end_line: int         # fim (exclusivo) do span, até o próximo heading de nível <= level
+    parent: Optional['Section'] = None
+    children: list = field(default_factory=list)
+
+
+@dataclass
+class SectionMatch:
+    section: Section
+    confidence: float     # 0..1
+    method: str           # exact | number | fuzzy
+    ambiguous: bool = False   # outro heading ficou a menos de AMBIGUITY_MARGIN
+
+
+class SectionIndex:
+    """Resolução de rótulos para headings; construído uma vez por documento/versão."""
+
+    def __init__(self, sections: list):
+        self.sections = sections
+        self.keys = []
+        self.numbers = []
+        self.sizes = []
+        self.exact = {}
+        self.by_number = {}
+        self.postings = {}
+        for i, section in enumerate(sections):
+            number, key = label_parts(section.title)
+            grams = trigrams(key)
+            self.keys.append(key)
+            self.numbers.append(number)
+            self.sizes.append(len(grams))
+            # Headings duplicados: vale o primeiro
+            self.exact.setdefault(key, i)
+            if number:
+                self.by_number.setdefault(number, i)
+            for gram in grams:
+                self.postings.setdefault(gram, []).append(i)
+
+    def match(self, label: str, min_confidence: float = MIN_CONFIDENCE) -> Optional[SectionMatch]:
+        number, key = label_parts(label)
+        if not key:
+            i = self.by_number.get(number)
+            return None if i is None else SectionMatch(self.sections[i], NUMBER_ONLY_CONFIDENCE, "number")
+        i = self.exact.get(key)
+        if i is not None:
+            return SectionMatch(self.sections[i], 1.0, "exact")
+
+        grams = trigrams(key)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        scored = []
+        for i, common in shared.items():
+            candidate = self.keys[i]
+            if numbers_differ(number, key, self.numbers[i], candidate):
+                continue
+            score = 2 * common / (len(grams) + self.sizes[i])
+            # Rótulo parcial ("Regras" para "Regras de Negócio") ou heading citado no rótulo
+            if key in candidate:
+                score = max(score, 0.6 + 0.4 * len(key) / len(candidate))
+            elif len(candidate) > 3 and candidate in key:
+                score = max(score, 0.6 + 0.4 * len(candidate) / len(key))
+            if number and number == self.numbers[i]:
+                score = min(1.0, score + NUMBER_BONUS)
+            scored.append((score, i))
+        if not scored:
+            return None
+        # Empate: o primeiro heading do documento
+        scored.sort(key=lambda item: (-item[0], item[1]))
+        best, i = scored[0]
+        if best < min_confidence:
+            return None
+        ambiguous = len(scored) > 1 and scored[1][0] >= best - AMBIGUITY_MARGIN
+        return SectionMatch(self.sections[i], round(best, 3), "fuzzy", ambiguous)
+
+    def find(self, label: str) -> Optional[Section]:
+        match = self.match(label)
+        return match.section if match else None
+
+
+class Outline:
+    """Árvore de seções de um documento markdown, construída em uma passada."""
+
+    def __init__(self, text: str):
+        self.text = text
+        self.lines = text.split('\n')
+        self.sections = []
+        self.line_offsets = []
+        self._section_index = None
+        self._parse()
+
+    def _parse(self):
+        offset = 0
+        in_fence = False
+        stack = []
+        for i, line in enumerate(self.lines):
+            self.line_offsets.append(offset)
+            offset += len(line) + 1
+
+            if FENCE_RE.match(line):
+                in_fence = not in_fence
+                continue
+            m = None if in_fence else HEADING_RE.match(line)
+            if not m:
+                continue
+
+            level = len(m.group(1))
+            if self.sections:
+                self.sections[-1].body_end_line = i
+            while stack and stack[-1].level >= level:
+                stack.pop().end_line = i
+
+            section = Section(
+                title=m.group(2),
+                key=normalize_key(m.group(2)),
+                level=level,
+                line=i,
+                body_end_line=len(self.lines),
+                end_line=len(self.lines),
+                parent=stack[-1] if stack else None,
+            )
+            if section.parent:
+                section.parent.children.append(section)
+            stack.append(section)
+            self.sections.append(section)
+
+    @property
+    def section_index(self) -> SectionIndex:
+        if self._section_index is None:
+            self._section_index = SectionIndex(self.sections)
+        return self._section_index
+
+    def match(self, label: str) -> Optional[SectionMatch]:
+        """Seção + confiança para o rótulo devolvido pelo modelo (só headings, nunca linhas do corpo)"""
+        return self.section_index.match(label)
+
+    def find(self, label: str) -> Optional[Section]:
+        return self.section_index.find(label)
+
+    def body_lines(self, section: Section) -> list:
+        return self.lines[section.line + 1:section.body_end_line]
+
+    def offset(self, line: int) -> int:
+        """Offset (chars) do início da linha `line`; len(lines) aponta para o fim do texto."""
+        if line >= len(self.lines):
+            return len(self.text)
+        return self.line_offsets[line]
+
+    def splice(self, inserts: dict, replaces: dict) -> str:
+        """
+        Novo texto em uma passada: `inserts` mapeia linha -> textos inseridos antes dela
+        (len(lines) = final do documento) e `replaces` mapeia linha -> novo conteúdo
+        (None remove a linha inteira, com a quebra).
+        """
+        pieces = []
+        pos = 0
+        for line in sorted(inserts.keys() | replaces.keys()):
+            if line >= len(self.lines):
+                pieces.append(self.text[pos:])
+                pos = len(self.text)
+                pieces.extend(f"\n{text}" for text in inserts.get(line, ()))
+                continue
+            start = self.line_offsets[line]
+            pieces.append(self.text[pos:start])
+            pos = start
+            pieces.extend(f"{text}\n" for text in inserts.get(line, ()))
+            if line in replaces:
+                pos = start + len(self.lines[line])
+                if replaces[line] is not None:
+                    pieces.append(replaces[line])
+                elif line + 1 < len(self.lines):
+                    pos += 1
+                else:
+                    # Última linha: some a quebra que a precede
+                    while pieces and not pieces[-1]:
+                        pieces.pop()
+                    if pieces and pieces[-1].endswith("\n"):
+                        pieces[-1] = pieces[-1][:-1]
+        pieces.append(self.text[pos:])
+        return "".join(pieces)
+
+
+@lru_cache(maxsize=32)
+def outline_for(text: str) -> Outline:
+    """Outline em cache por documento: o parse acontece uma vez, as buscas são O(1)."""
+    return Outline(text)
@@ -0,0 +1,169 @@
+"""
+Planejamento pré-envio: tokens, latência e custo previstos por modelo, sem rede.
+
+`Planner.plan(payload)` usa o TokenEstimator (calibrado pelo usage real) e a
+tabela MODEL_SPECS para prever tokens de entrada, latência (TTFB + prefill +
+decodificação) e custo em US$. `check()` recusa o que estoura a janela de
+contexto ou o orçamento (custo, latência, tokens de entrada) — ou, se o chamador
+oferecer `downscope(payload)` (ex.: podar o documento), tenta a versão menor
+antes de recusar com BudgetExceeded.
+
+Orçamentos via ambiente, no mesmo estilo do cache e do rate limit:
+PROMPT_EDIT_MAX_COST (US$ por requisição), PROMPT_EDIT_MAX_LATENCY (s) e
+PROMPT_EDIT_MAX_PROMPT_TOKENS.
+"""
+import os
+from dataclasses import dataclass, field
+from typing import Optional
+
+from prompt_edit.layout import INPUT_PRICES
+from prompt_edit.tokens import TokenEstimator
+
+
+@dataclass(frozen=True)
+class ModelSpec:
+    context_window: int       # entrada + saída
+    max_output: int
+    output_price: float       # US$ por 1M tokens de saída
+    ttfb_s: float             # até o primeiro token, prompt pequeno
+    prefill_tps: float        # tokens de entrada processados por segundo
+    decode_tps: float         # tokens de saída por segundo
+
+
+# Ordem de grandeza dos benchmarks (benchmark-models.ts / full_document_models_test.py)
+MODEL_SPECS = {
+    "gpt-5.1": ModelSpec(400_000, 128_000, 10.00, 1.8, 6000.0, 60.0),
+    "gpt-5": ModelSpec(400_000, 128_000, 10.00, 1.8, 6000.0, 60.0),
+    "gpt-4.1": ModelSpec(1_047_576, 32_768, 8.00, 0.5, 8000.0, 80.0),
+    "gpt-4.1-mini": ModelSpec(1_047_576, 32_768, 1.60, 0.4, 10000.0, 110.0),
+    "gpt-4o": ModelSpec(128_000, 16_384, 10.00, 0.45, 8000.0, 90.0),
+    "gpt-4o-mini": ModelSpec(128_000, 16_384, 0.60, 0.35, 10000.0, 120.0),
+}
+DEFAULT_MODEL = "gpt-4o"
+
+
+def spec_for(model: str) -> ModelSpec:
+    """Modelos com sufixo de data ("gpt-4o-2024-08-06") caem no prefixo mais longo"""
+    if model in MODEL_SPECS:
+        return MODEL_SPECS[model]
+    for name in sorted(MODEL_SPECS, key=len, reverse=True):
+        if model.startswith(name):
+            return MODEL_SPECS[name]
+    return MODEL_SPECS[DEFAULT_MODEL]
+
+
+def input_price(model: str) -> float:
+    for name in sorted(INPUT_PRICES, key=len, reverse=True):
+        if model.startswith(name):
+            return INPUT_PRICES[name][0]
+    return INPUT_PRICES[DEFAULT_MODEL][0]
+
+
+@dataclass
+class Plan:
+    model: str
+    prompt_tokens: int
+    output_tokens: int
+    latency_s: float
+    cost_usd: float
+    context_window: int
+    action: str = "send"          # send | downscope | refuse
+    problems: list = field(default_factory=list)
+
+    @property
+    def ok(self) -> bool:
+        return not self.problems
+
+    def as_dict(self) -> dict:
+        return {
+            "model": self.model,
+            "prompt_tokens": self.prompt_tokens,
+            "output_tokens": self.output_tokens,
+            "latency_s": round(self.latency_s, 3),
+            "cost_usd": round(self.cost_usd, 6),
+            "context_window": self.context_window,
+            "action": self.action,
+            "problems": self.problems,
+        }
+
+    def describe(self) -> str:
+        text = (f"{self.model}: ~{self.prompt_tokens} tokens de entrada + {self.output_tokens} de saída, "
+                f"~{self.latency_s:.1f}s, US$ {self.cost_usd:.5f}")
+        return text + (f" [{'; '.join(self.problems)}]" if self.problems else "")
+
+
+class BudgetExceeded(Exception):
+    """Requisição fora do contexto/orçamento mesmo depois do downscope."""
+
+    def __init__(self, plan: Plan):
+        super().__init__(f"pré-envio recusado: {plan.describe()}")
+        self.plan = plan
+
+
+class Planner:
+    def __init__(self, estimator: TokenEstimator = None, max_cost_usd: float = None,
+                 max_latency_s: float = None, max_prompt_tokens: int = None):
+        self.estimator = estimator or TokenEstimator()
+        self.max_cost_usd = max_cost_usd
+        self.max_latency_s = max_latency_s
+        self.max_prompt_tokens = max_prompt_tokens
+        self.refused = 0
+        self.downscoped = 0
+
+    @classmethod
+    def from_env(cls, estimator: TokenEstimator = None) -> "Planner":
+        def number(name, kind=float):
+            value = os.environ.get(name)
+            return kind(value) if value else None
+        return cls(
+            estimator,
+            max_cost_usd=number("PROMPT_EDIT_MAX_COST"),
+            max_latency_s=number("PROMPT_EDIT_MAX_LATENCY"),
+            max_prompt_tokens=number("PROMPT_EDIT_MAX_PROMPT_TOKENS", int),
+        )
+
+    def plan(self, payload: dict, model: str = None) -> Plan:
+        """Previsão para `payload` (ou para o mesmo payload em outro `model`)"""
+        if model is not None:
+            payload = {**payload, "model": model}
+        model = payload.get("model", "")
+        spec = spec_for(model)
+        prompt = self.estimator.prompt_tokens(payload)
+        output = min(self.estimator.expected_output(payload), spec.max_output)
+        latency = spec.ttfb_s + prompt / spec.prefill_tps + output / spec.decode_tps
+        cost = (prompt * input_price(model) + output * spec.output_price) / 1_000_000
+
+        problems = []
+        if prompt + output > spec.context_window:
+            problems.append(f"contexto {prompt + output} > {spec.context_window}")
+        if self.max_prompt_tokens is not None and prompt > self.max_prompt_tokens:
+            problems.append(f"entrada {prompt} > {self.max_prompt_tokens} tokens")
+        if self.max_cost_usd is not None and cost > self.max_cost_usd:
+            problems.append(f"custo US$ {cost:.5f} > {self.max_cost_usd}")
+        if self.max_latency_s is not None and latency > self.max_latency_s:
+            problems.append(f"latência {latency:.1f}s > {self.max_latency_s}s")
+        return Plan(model, prompt, output, latency, cost, spec.context_window,
+                    "refuse" if problems else "send", problems)
+
+    def compare(self, payload: dict, models: list) -> list:
+        """Mesmo payload em cada modelo, do mais barato ao mais caro"""
+        return sorted((self.plan(payload, model) for model in models), key=lambda p: p.cost_usd)
+
+    def check(self, payload: dict, downscope=None) -> tuple:
+        """
+        (payload, plan) pronto para envio. Fora do orçamento: tenta `downscope(payload)`
+        (que devolve um payload menor ou None); se ainda não couber, BudgetExceeded.
+        """
+        plan = self.plan(payload)
+        if plan.ok:
+            return payload, plan
+        smaller = downscope(payload) if downscope else None
+        if smaller is not None:
+            reduced = self.plan(smaller)
+            if reduced.ok:
+                reduced.action = "downscope"
+                self.downscoped += 1
+                return smaller, reduced
+            plan = reduced
+        self.refused += 1
+        raise BudgetExceeded(plan)
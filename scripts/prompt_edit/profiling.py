@@ -0,0 +1,163 @@
+"""
+Spans de tempo por fase (serialização, rede, decodificação, apply, diff) com saída
+em Chrome trace (chrome://tracing ou https://ui.perfetto.dev) e tabela resumida.
+
+Desligado por padrão: `span()` devolve um contexto vazio, sem custo mensurável.
+Os scripts ligam via ambiente, no mesmo estilo do cache:
+- PROMPT_EDIT_TRACE=out/trace.json   grava o trace e imprime o resumo no fim;
+- PROMPT_EDIT_PROFILE=1              roda cProfile durante as fases locais (cat="local")
+                                     e grava o .prof ao lado do trace.
+
+Cada corrotina vira uma "thread" no trace, para que spans concorrentes não se
+sobreponham na mesma linha do visualizador.
+"""
+import io
+import json
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+_NULL = nullcontext()
+
+
+class Tracer:
+    def __init__(self):
+        self.enabled = False
+        self.profile_local = False
+        self.trace_path = None
+        self.events = []
+        self.origin = time.perf_counter()
+        self.profiler = None
+        self._tids = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _tid(self) -> int:
+        # Sem asyncio importado não há corrotina rodando (e não o importamos só para isso)
+        asyncio = sys.modules.get("asyncio")
+        try:
+            task = asyncio.current_task() if asyncio else None
+        except RuntimeError:
+            task = None
+        key = id(task) if task is not None else threading.get_ident()
+        tid = self._tids.get(key)
+        if tid is None:
+            with self._lock:
+                tid = self._tids.setdefault(key, len(self._tids) + 1)
+        return tid
+
+    def _start_profile(self) -> bool:
+        """cProfile só no span local mais externo da thread (um perfilador ativo por vez)"""
+        depth = getattr(self._local, "depth", 0)
+        self._local.depth = depth + 1
+        if depth or self.profiler is None:
+            return False
+        try:
+            self.profiler.enable()
+        except ValueError:  # outra thread já está perfilando
+            return False
+        return True
+
+    def _stop_profile(self, started: bool):
+        self._local.depth -= 1
+        if started:
+            self.profiler.disable()
+
+    @contextmanager
+    def _span(self, name: str, cat: str, args: dict):
+        profiling = self.profile_local and cat == "local" and self._start_profile()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            if self.profile_local and cat == "local":
+                self._stop_profile(profiling)
+            self.events.append({
+                "name": name, "cat": cat, "ph": "X", "pid": os.getpid(), "tid": self._tid(),
+                "ts": round((start - self.origin) * 1e6, 1), "dur": round((end - start) * 1e6, 1),
+                **({"args": args} if args else {}),
+            })
+
+    def span(self, name: str, cat: str = "local", **args):
+        if not self.enabled:
+            return _NULL
+        return self._span(name, cat, args)
+
+    def summary(self) -> list:
+        """Linhas (fase, categoria, n, total/média/p50/p99/máx em ms), da mais cara à mais barata"""
+        groups = {}
+        for event in self.events:
+            groups.setdefault((event["name"], event["cat"]), []).append(event["dur"] / 1000)
+        rows = []
+        for (name, cat), values in groups.items():
+            ordered = sorted(values)
+            rows.append({
+                "phase": name, "cat": cat, "n": len(values),
+                "total_ms": round(sum(values), 3),
+                "mean_ms": round(sum(values) / len(values), 3),
+                "p50_ms": round(ordered[len(ordered) // 2], 3),
+                "p99_ms": round(ordered[min(len(ordered) - 1, int(0.99 * len(ordered)))], 3),
+                "max_ms": round(ordered[-1], 3),
+            })
+        return sorted(rows, key=lambda r: -r["total_ms"])
+
+    def write_chrome_trace(self, path: str):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.events, "displayTimeUnit": "ms"}, f)
+
+
+TRACER = Tracer()
+
+
+def span(name: str, cat: str = "local", **args):
+    """`with span("apply_changes"): ...` — cat "local" (CPU) ou "network" (espera de I/O)"""
+    return TRACER.span(name, cat, **args)
+
+
+def configure(trace_path: str = None, profile_local: bool = False):
+    TRACER.enabled = bool(trace_path or profile_local)
+    TRACER.profile_local = profile_local
+    TRACER.trace_path = trace_path
+    if profile_local:
+        import cProfile
+        TRACER.profiler = cProfile.Profile()
+    else:
+        TRACER.profiler = None
+
+
+def configure_from_env():
+    configure(os.environ.get("PROMPT_EDIT_TRACE"), os.environ.get("PROMPT_EDIT_PROFILE", "") not in ("", "0"))
+
+
+def print_summary(limit: int = 20):
+    rows = TRACER.summary()
+    if not rows:
+        return
+    print(f"\n{'fase':<28}{'cat':>9}{'n':>7}{'total ms':>12}{'média':>10}{'p50':>10}{'p99':>10}{'máx':>10}")
+    for r in rows[:limit]:
+        print(f"{r['phase']:<28}{r['cat']:>9}{r['n']:>7}{r['total_ms']:>12.1f}{r['mean_ms']:>10.3f}"
+              f"{r['p50_ms']:>10.3f}{r['p99_ms']:>10.3f}{r['max_ms']:>10.3f}")
+
+
+def finish():
+    """Grava o trace/.prof configurados e imprime o resumo (no-op se desligado)"""
+    if not TRACER.enabled:
+        return
+    print_summary()
+    path = TRACER.trace_path
+    if path:
+        TRACER.write_chrome_trace(path)
+        print(f"Trace salvo em {path} (abra em chrome://tracing ou ui.perfetto.dev)")
+    if TRACER.profiler is not None:
+        prof_path = os.path.splitext(path or os.path.join("out", "trace"))[0] + ".prof"
+        os.makedirs(os.path.dirname(prof_path) or ".", exist_ok=True)
+        TRACER.profiler.dump_stats(prof_path)
+        import pstats
+        out = io.StringIO()
+        pstats.Stats(TRACER.profiler, stream=out).sort_stats("cumulative").print_stats(15)
+        print(out.getvalue())
+        print(f"cProfile das fases locais salvo em {prof_path}")
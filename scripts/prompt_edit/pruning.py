@@ -0,0 +1,113 @@
+"""
+Poda de contexto por seção para pedidos de edição.
+
+Em vez de mandar o documento inteiro, envia um sumário com TODOS os headings e o
+texto completo só das seções relevantes para a instrução, escolhidas por um ranker
+léxico local (BM25 sobre título + corpo). Se a confiança for baixa, devolve o
+documento inteiro.
+"""
+import math
+import re
+from collections import Counter
+from functools import lru_cache
+
+from prompt_edit.outline import Outline, outline_for, strip_accents
+
+WORD_RE = re.compile(r"\w+")
+STOPWORDS = {
+    "a", "o", "as", "os", "um", "uma", "de", "da", "do", "das", "dos", "e", "em", "no", "na",
+    "nos", "nas", "para", "por", "com", "sem", "que", "se", "ao", "aos", "esta", "este", "essa",
+    "esse", "isso", "linha", "secao", "adicione", "altere", "mude", "remova", "troque", "final",
+    "sempre", "nunca", "seu", "sua", "mais", "como", "ou", "the", "and",
+}
+TITLE_WEIGHT = 3
+K1 = 1.2
+B = 0.75
+
+
+def tokenize(text: str) -> list:
+    words = WORD_RE.findall(strip_accents(text.casefold()))
+    return [w for w in words if len(w) > 2 and w not in STOPWORDS]
+
+
+class SectionRanker:
+    """Índice BM25 das seções de um documento (título pesa TITLE_WEIGHT vezes)."""
+
+    def __init__(self, outline: Outline):
+        self.outline = outline
+        self.docs = []
+        for section in outline.sections:
+            terms = Counter(tokenize(" ".join(outline.body_lines(section))))
+            for term in tokenize(section.title):
+                terms[term] += TITLE_WEIGHT
+            self.docs.append(terms)
+        self.lengths = [sum(d.values()) for d in self.docs]
+        self.avg_len = (sum(self.lengths) / len(self.lengths)) if self.lengths else 0.0
+        self.df = Counter(term for d in self.docs for term in d)
+
+    def scores(self, instruction: str) -> list:
+        """[(score, índice da seção)] em ordem decrescente"""
+        n = len(self.docs)
+        query = set(tokenize(instruction))
+        folded = strip_accents(instruction.casefold())
+        result = []
+        for i, (terms, length) in enumerate(zip(self.docs, self.lengths)):
+            score = 0.0
+            for term in query:
+                tf = terms.get(term)
+                if not tf:
+                    continue
+                idf = math.log(1 + (n - self.df[term] + 0.5) / (self.df[term] + 0.5))
+                score += idf * tf * (K1 + 1) / (tf + K1 * (1 - B + B * length / (self.avg_len or 1)))
+            # Título citado literalmente na instrução ("seção X") é o sinal mais forte
+            key = strip_accents(self.outline.sections[i].key)
+            if len(key) > 3 and key in folded:
+                score += 10.0
+            result.append((score, i))
+        result.sort(key=lambda item: -item[0])
+        return result
+
+
+@lru_cache(maxsize=8)
+def ranker_for(text: str) -> SectionRanker:
+    return SectionRanker(outline_for(text))
+
+
+def prune_document(document: str, instruction: str, top_k: int = 2, min_confidence: float = 0.45):
+    """
+    Devolve (contexto, info). O contexto lista todos os headings em ordem e expande só
+    as `top_k` seções mais relevantes. `info["pruned"]` é False quando a confiança
+    (participação do 1º colocado no total dos `top_k + 1` primeiros) fica abaixo de
+    `min_confidence` ou nada casa; aí o contexto é o documento inteiro.
+    """
+    ranker = ranker_for(document)
+    outline = ranker.outline
+    ranked = [(score, i) for score, i in ranker.scores(instruction) if score > 0]
+    head = ranked[:top_k + 1]
+    confidence = head[0][0] / sum(score for score, _ in head) if head else 0.0
+    if len(head) == 1:
+        confidence = 1.0
+
+    info = {
+        "pruned": False,
+        "confidence": round(confidence, 3),
+        "sections": [outline.sections[i].title for _, i in ranked[:top_k]],
+        "original_chars": len(document),
+        "context_chars": len(document),
+    }
+    if not ranked or confidence < min_confidence:
+        return document, info
+
+    selected = {i for _, i in ranked[:top_k]}
+    lines = outline.lines[:outline.sections[0].line] if outline.sections else []
+    lines = [line for line in lines if line.strip()][:3]  # título/objetivo do documento
+    for i, section in enumerate(outline.sections):
+        lines.append(outline.lines[section.line])
+        if i in selected:
+            lines.extend(outline.body_lines(section))
+        elif section.body_end_line > section.line + 1:
+            lines.append("[…]")
+
+    context = "\n".join(lines)
+    info.update(pruned=True, context_chars=len(context))
+    return context, info
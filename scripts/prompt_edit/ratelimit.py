@@ -0,0 +1,175 @@
+"""
+Agendador ciente de rate limit (RPM/TPM) com token buckets por modelo.
+
+Antes de cada envio a requisição tem seus tokens estimados e só é admitida quando
+os buckets de requisições e de tokens do modelo comportam; os buckets são
+sincronizados ao vivo com os headers x-ratelimit-limit-*/remaining-*/reset-* de
+cada resposta, corrigidos pelo usage real e pausados em caso de 429. Assim a
+suíte roda no limite da conta sem tempestades de 429.
+"""
+import os
+import re
+import threading
+import time
+
+DEFAULT_RPM = 500
+DEFAULT_TPM = 30_000
+DEFAULT_OUTPUT_TOKENS = 512
+DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+
+def parse_reset(value: str) -> float:
+    """'6m0s' -> 360.0, '20ms' -> 0.02, '1.5' -> 1.5"""
+    if not value:
+        return 0.0
+    try:
+        return float(value)
+    except ValueError:
+        return sum(float(n) * DURATION_UNITS[unit] for n, unit in DURATION_RE.findall(value))
+
+
+def estimate_tokens(payload: dict) -> int:
+    """Estimativa barata: ~4 chars por token nas mensagens + orçamento de saída"""
+    chars = sum(len(m.get("content") or "") for m in payload.get("messages", ()))
+    output = payload.get("max_completion_tokens") or payload.get("max_tokens") or DEFAULT_OUTPUT_TOKENS
+    return chars // 4 + 8 * len(payload.get("messages", ())) + output
+
+
+class TokenBucket:
+    def __init__(self, capacity: float, per_second: float):
+        self.capacity = capacity
+        self.rate = per_second
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float, now: float) -> float:
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        need = min(amount, self.capacity)  # pedido maior que a capacidade não pode travar para sempre
+        if self.tokens >= need:
+            return 0.0
+        return (need - self.tokens) / self.rate if self.rate > 0 else 1.0
+
+    def sync(self, limit: float, remaining: float, reset_s: float, now: float):
+        """Alinha com a visão do servidor: `remaining` agora, cheio de novo em `reset_s`"""
+        self._refill(now)
+        if limit:
+            self.capacity = limit
+            self.rate = max(limit / 60.0, (limit - remaining) / reset_s if reset_s > 0 else 0.0)
+        self.tokens = min(self.tokens, remaining)
+
+
+class _ModelLimits:
+    def __init__(self, rpm: int, tpm: int):
+        self.requests = TokenBucket(rpm, rpm / 60.0)
+        self.tokens = TokenBucket(tpm, tpm / 60.0)
+        self.admitted = 0
+        self.waited_s = 0.0
+        self.throttled = 0
+
+
+class RateLimiter:
+    """Thread-safe; use acquire() em threads e acquire_async() em corrotinas."""
+
+    def __init__(self, rpm: int = None, tpm: int = None, estimator=estimate_tokens):
+        self.rpm = rpm or int(os.environ.get("PROMPT_EDIT_RPM", DEFAULT_RPM))
+        self.tpm = tpm or int(os.environ.get("PROMPT_EDIT_TPM", DEFAULT_TPM))
+        self.estimator = estimator
+        self._lock = threading.Lock()
+        self._models = {}
+
+    def _limits(self, model: str) -> _ModelLimits:
+        if model not in self._models:
+            self._models[model] = _ModelLimits(self.rpm, self.tpm)
+        return self._models[model]
+
+    def _try_reserve(self, model: str, tokens: int) -> float:
+        with self._lock:
+            limits = self._limits(model)
+            now = time.monotonic()
+            wait = max(limits.requests.wait_time(1, now), limits.tokens.wait_time(tokens, now))
+            if wait <= 0:
+                limits.requests.tokens -= 1
+                limits.tokens.tokens -= tokens
+                limits.admitted += 1
+            return wait
+
+    def acquire(self, payload: dict) -> int:
+        """Bloqueia até o modelo ter folga; devolve a estimativa reservada"""
+        model = payload.get("model", "")
+        tokens = self.estimator(payload)
+        while True:
+            wait = self._try_reserve(model, tokens)
+            if wait <= 0:
+                return tokens
+            self._limits(model).waited_s += min(wait, 1.0)
+            time.sleep(min(wait, 1.0))
+
+    async def acquire_async(self, payload: dict) -> int:
+        import asyncio
+        model = payload.get("model", "")
+        tokens = self.estimator(payload)
+        while True:
+            wait = self._try_reserve(model, tokens)
+            if wait <= 0:
+                return tokens
+            self._limits(model).waited_s += min(wait, 1.0)
+            await asyncio.sleep(min(wait, 1.0))
+
+    def observe(self, model: str, headers, usage: dict = None, estimated: int = 0, payload: dict = None):
+        """
+        Atualiza os buckets com os headers x-ratelimit-* e o usage real da resposta;
+        com `payload`, um estimador calibrável (tokens.TokenEstimator) aprende com o usage
+        """
+        calibrate = getattr(self.estimator, "observe", None)
+        if usage and payload is not None and calibrate is not None:
+            calibrate(payload, usage)
+        with self._lock:
+            limits = self._limits(model)
+            now = time.monotonic()
+            if headers is not None and headers.get("x-ratelimit-remaining-requests") is not None:
+                limits.requests.sync(
+                    float(headers.get("x-ratelimit-limit-requests") or 0),
+                    float(headers["x-ratelimit-remaining-requests"]),
+                    parse_reset(headers.get("x-ratelimit-reset-requests")),
+                    now,
+                )
+            if headers is not None and headers.get("x-ratelimit-remaining-tokens") is not None:
+                limits.tokens.sync(
+                    float(headers.get("x-ratelimit-limit-tokens") or 0),
+                    float(headers["x-ratelimit-remaining-tokens"]),
+                    parse_reset(headers.get("x-ratelimit-reset-tokens")),
+                    now,
+                )
+            elif usage and estimated:
+                # Sem headers: corrige a reserva pelo consumo real (devolve ou cobra a diferença)
+                limits.tokens.tokens += estimated - usage.get("total_tokens", estimated)
+
+    def penalize(self, model: str, seconds: float):
+        """429: segura o modelo até o reset informado pelo servidor"""
+        with self._lock:
+            limits = self._limits(model)
+            until = time.monotonic() + seconds
+            limits.requests.blocked_until = max(limits.requests.blocked_until, until)
+            limits.tokens.blocked_until = max(limits.tokens.blocked_until, until)
+            limits.throttled += 1
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                model: {
+                    "admitted": l.admitted,
+                    "throttled_429": l.throttled,
+                    "waited_s": round(l.waited_s, 3),
+                    "rpm_limit": l.requests.capacity,
+                    "tpm_limit": l.tokens.capacity,
+                }
+                for model, l in self._models.items()
+            }
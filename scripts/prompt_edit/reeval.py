@@ -0,0 +1,188 @@
+"""
+Reavaliação offline de respostas gravadas, em paralelo por processos.
+
+Depois que as respostas estão no log (out/scenario_results.jsonl), conferir de novo
+é só CPU: apply_changes, diff de preservação e as checagens de ação/seção. Os
+registros são lidos em streaming, agrupados em blocos de `chunk_size` (poucas
+mensagens de IPC) e distribuídos num ProcessPoolExecutor com um worker por núcleo;
+o documento e o outline vão uma vez por worker (initializer), não por registro.
+Cada bloco devolve um agregado parcial e os parciais são somados num relatório só.
+Registro malformado (mudança sem campos, tipos errados) conta como erro daquele
+cenário e nunca derruba o bloco nem o pool.
+"""
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from prompt_edit.diff import preservation
+from prompt_edit.edits import POSITIONS, apply_changes, as_change_list
+from prompt_edit.outline import outline_for
+
+DEFAULT_CHUNK_SIZE = 512
+MAX_EXAMPLES = 20
+COUNTERS = (
+    "records", "success", "action_ok", "section_ok", "apply_errors", "clean",
+    "original_lines", "preserved_lines", "unexpected_losses", "unexpected_insertions", "whitespace_only",
+)
+NEW_SECTION_LABEL = "nova seção"   # expected_section de cenários que pedem uma seção nova
+
+
+def change_errors(change) -> list:
+    """Problemas de forma da mudança gravada (campos locais como usage/target são aceitos)"""
+    if not isinstance(change, dict):
+        return ["mudança não é um objeto"]
+    changes = change.get("changes", [change]) if "changes" in change else [change]
+    if not isinstance(changes, list):
+        return ["changes não é uma lista"]
+    errors = []
+    for i, c in enumerate(changes):
+        if not isinstance(c, dict):
+            errors.append(f"[{i}]: não é um objeto")
+            continue
+        for name in ("section", "lineToAdd"):
+            if not isinstance(c.get(name), str):
+                errors.append(f"[{i}].{name}: esperado string")
+        if c.get("position") not in POSITIONS:
+            errors.append(f"[{i}].position: {c.get('position')!r} fora de {POSITIONS}")
+    return errors
+
+
+def change_action(change: dict) -> str:
+    """
+    add | update. Um 'replace' com texto vazio (remoção) também conta como update:
+    é o gabarito dos cenários de remoção (synth) e dos resultados já gravados
+    """
+    return "update" if change["position"] == "replace" else "add"
+
+
+def score_change(document: str, scenario: dict, change: dict, outline=None) -> dict:
+    """Checagens de um cenário: ação (add/update), seção esperada e documento resultante"""
+    changes = as_change_list(change)
+    expected = scenario["expected_action"]
+    actions = [change_action(c) for c in changes]
+    sections = [c["section"] for c in changes]
+    # Em modo multi basta uma das mudanças acertar
+    actual = expected if expected in actions else (actions[0] if actions else "-")
+    action_correct = expected == actual
+    outline = outline or outline_for(document)
+    matches = [outline.match(s) for s in sections]
+    expected_section = scenario["expected_section"].lower()
+    section_correct = any(expected_section in s.lower() for s in sections) or (
+        # Seção nova: basta o rótulo não cair em nenhum heading existente
+        expected_section == NEW_SECTION_LABEL and any(m is None for m in matches))
+    return {
+        "changes": changes,
+        "action": actual,
+        "sections": sections,
+        "action_correct": action_correct,
+        "section_correct": section_correct,
+        "success": action_correct and section_correct,
+        # Heading em que cada rótulo cai de fato (None = vira seção nova) e a confiança
+        "resolved": [(m.section.title, m.confidence) if m else None for m in matches],
+        "updated": apply_changes(document, changes, outline),
+    }
+
+
+def empty_totals() -> dict:
+    totals = dict.fromkeys(COUNTERS, 0)
+    totals["failures"] = []
+    return totals
+
+
+def merge_totals(into: dict, part: dict) -> dict:
+    for name in COUNTERS:
+        into[name] += part[name]
+    into["failures"].extend(part["failures"][:MAX_EXAMPLES - len(into["failures"])])
+    return into
+
+
+_document = None
+_outline = None
+
+
+def _init_worker(document: str):
+    global _document, _outline
+    _document = document
+    _outline = outline_for(document)
+
+
+def score_chunk(records: list) -> dict:
+    """Agregado parcial de um bloco de registros {id, scenario, change, expected_action, expected_section}"""
+    totals = empty_totals()
+    for record in records:
+        totals["records"] += 1
+        try:
+            errors = change_errors(record["change"])
+            if errors:
+                raise ValueError("; ".join(errors))
+            score = score_change(_document, record, record["change"], _outline)
+            report = preservation(_document, score["updated"], [c["lineToAdd"] for c in score["changes"]])
+        except (AttributeError, KeyError, TypeError, ValueError) as e:
+            totals["apply_errors"] += 1
+            if len(totals["failures"]) < MAX_EXAMPLES:
+                totals["failures"].append({"id": record.get("id"), "error": str(e)[:200]})
+            continue
+        totals["success"] += score["success"]
+        totals["action_ok"] += score["action_correct"]
+        totals["section_ok"] += score["section_correct"]
+
+        replaced = sum(c["position"] == "replace" for c in score["changes"])
+        totals["clean"] += not report.unexpected_insertions and len(report.unexpected_losses) <= replaced
+        totals["original_lines"] += report.original_lines
+        totals["preserved_lines"] += report.preserved_lines
+        totals["unexpected_losses"] += len(report.unexpected_losses)
+        totals["unexpected_insertions"] += len(report.unexpected_insertions)
+        totals["whitespace_only"] += report.whitespace_only
+        if not score["success"] and len(totals["failures"]) < MAX_EXAMPLES:
+            totals["failures"].append({"id": record.get("id"), "action": score["action"],
+                                       "sections": score["sections"]})
+    return totals
+
+
+def _chunks(records, size: int):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def reevaluate(document: str, records, workers: int = None, chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """
+    `records` é qualquer iterável (consumido em streaming); no máximo 2 blocos por
+    worker ficam em voo. workers=1 roda no processo atual (útil para comparar).
+    """
+    workers = workers or os.cpu_count() or 1
+    start = time.perf_counter()
+    totals = empty_totals()
+
+    if workers == 1:
+        _init_worker(document)
+        for chunk in _chunks(records, chunk_size):
+            merge_totals(totals, score_chunk(chunk))
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(document,)) as pool:
+            in_flight = set()
+            for chunk in _chunks(records, chunk_size):
+                if len(in_flight) >= 2 * workers:
+                    done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        merge_totals(totals, future.result())
+                in_flight.add(pool.submit(score_chunk, chunk))
+            for future in in_flight:
+                merge_totals(totals, future.result())
+
+    elapsed = time.perf_counter() - start
+    n = totals["records"]
+    return {
+        **totals,
+        "workers": workers,
+        "chunk_size": chunk_size,
+        "elapsed_s": round(elapsed, 3),
+        "records_per_sec": round(n / elapsed, 1) if elapsed > 0 else 0.0,
+        "success_rate": round(totals["success"] / n, 4) if n else 0.0,
+        "preservation_ratio": round(totals["preserved_lines"] / max(1, totals["original_lines"]), 4),
+    }
@@ -0,0 +1,384 @@
+"""
+Histórico append-only das rodadas dos harnesses, com detecção de regressão.
+
+out/models_test_report.json é sobrescrito a cada execução; aqui cada rodada vira
+uma linha em `runs` (harness, commit do git, árvore suja?, momento) e cada
+amostra medida uma linha em `samples` (modelo, estratégia, documento, tamanho do
+documento, concorrência, latência, tokens e validade), em SQLite sob out/.
+Nada é atualizado nem apagado: comparar duas rodadas quaisquer continua possível.
+
+`compare` reamostra (bootstrap) a diferença de médias entre a base e a rodada
+candidata por combinação e métrica; só é regressão quando o intervalo de
+confiança inteiro está do lado ruim e o efeito passa de `min_effect` da média da
+base. `openmetrics` exporta uma rodada em texto OpenMetrics (Prometheus/Pushgateway).
+
+    python -m prompt_edit runs list
+    python -m prompt_edit runs compare [--baseline 12] [--candidate 15]
+    python -m prompt_edit runs export > out/metrics.txt
+
+PROMPT_EDIT_RUNS_DB muda o arquivo (padrão out/runs.sqlite); PROMPT_EDIT_RUNS=0
+desliga a gravação pelos harnesses.
+"""
+import argparse
+import json
+import os
+import random
+import sqlite3
+import statistics
+import subprocess
+import sys
+from dataclasses import dataclass
+from datetime import datetime, timezone
+
+from prompt_edit.bench import percentile
+
+DEFAULT_PATH = os.path.join("out", "runs.sqlite")
+DEFAULT_RESAMPLES = 2000
+DEFAULT_CONFIDENCE = 0.95
+DEFAULT_MIN_EFFECT = 0.05
+KEY_COLUMNS = ("model", "strategy", "document", "concurrency")
+
+# métrica -> (expressão SQL, sentido em que piora: +1 maior é pior, -1 menor é pior)
+METRICS = {
+    "latency_s": ("latency_s", 1),
+    "tokens": ("prompt_tokens + completion_tokens", 1),
+    "valid": ("valid", -1),
+}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    created_at TEXT NOT NULL,
+    harness TEXT NOT NULL,
+    git_commit TEXT NOT NULL,
+    git_dirty INTEGER NOT NULL,
+    meta TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS samples (
+    run_id INTEGER NOT NULL REFERENCES runs(id),
+    model TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    document TEXT NOT NULL,
+    document_chars INTEGER NOT NULL,
+    concurrency INTEGER NOT NULL,
+    ok INTEGER NOT NULL,
+    latency_s REAL,
+    prompt_tokens INTEGER NOT NULL DEFAULT 0,
+    completion_tokens INTEGER NOT NULL DEFAULT 0,
+    cached_tokens INTEGER NOT NULL DEFAULT 0,
+    valid INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS samples_run ON samples(run_id);
+"""
+
+
+def git_revision() -> tuple:
+    """(commit, árvore com mudanças não commitadas?); ('unknown', False) fora de um repositório"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                check=True).stdout.strip()
+        status = subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                capture_output=True, text=True, check=True).stdout
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown", False
+    return commit, bool(status.strip())
+
+
+def sample(model: str, strategy: str, document: str, document_chars: int, concurrency: int = 1,
+           ok: bool = True, latency_s: float = None, prompt_tokens: int = 0, completion_tokens: int = 0,
+           cached_tokens: int = 0, valid: bool = False) -> dict:
+    """Uma amostra no formato de `RunStore.record` (falhas entram com ok=False e sem latência)"""
+    return {"model": model, "strategy": strategy, "document": document, "document_chars": document_chars,
+            "concurrency": concurrency, "ok": bool(ok), "latency_s": latency_s,
+            "prompt_tokens": prompt_tokens or 0, "completion_tokens": completion_tokens or 0,
+            "cached_tokens": cached_tokens or 0, "valid": bool(valid)}
+
+
+def bootstrap_delta(base: list, candidate: list, resamples: int = DEFAULT_RESAMPLES,
+                    confidence: float = DEFAULT_CONFIDENCE, rng: random.Random = None) -> tuple:
+    """IC percentil da diferença de médias (candidata - base), reamostrando os dois lados"""
+    rng = rng or random.Random(0)
+    deltas = sorted(
+        statistics.fmean(rng.choices(candidate, k=len(candidate))) - statistics.fmean(rng.choices(base, k=len(base)))
+        for _ in range(resamples)
+    )
+    tail = (1 - confidence) / 2
+    return deltas[int(tail * (resamples - 1))], deltas[int(round((1 - tail) * (resamples - 1)))]
+
+
+@dataclass
+class Comparison:
+    key: tuple             # (modelo, estratégia, documento, concorrência)
+    metric: str
+    base_mean: float
+    candidate_mean: float
+    ci_low: float
+    ci_high: float
+    n_base: int
+    n_candidate: int
+    verdict: str           # "regression", "improvement" ou "same"
+
+    @property
+    def delta(self) -> float:
+        return self.candidate_mean - self.base_mean
+
+    def describe(self) -> str:
+        model, strategy, document, concurrency = self.key
+        mark = {"regression": "🔺", "improvement": "🔻"}.get(self.verdict, "  ")
+        return (f"{mark} {model:<10} {strategy:<12} {document:<10} c={concurrency:<3} {self.metric:<10} "
+                f"{self.base_mean:10.4g} → {self.candidate_mean:<10.4g} Δ={self.delta:+.4g} "
+                f"IC[{self.ci_low:+.4g}, {self.ci_high:+.4g}] n={self.n_base}/{self.n_candidate}")
+
+
+class RunStore:
+    """Rodadas e amostras em SQLite; só acrescenta."""
+
+    def __init__(self, path: str = DEFAULT_PATH, enabled: bool = True):
+        self.path = path
+        self.enabled = enabled
+        self._db = None
+
+    @classmethod
+    def from_env(cls) -> "RunStore":
+        return cls(
+            path=os.environ.get("PROMPT_EDIT_RUNS_DB", DEFAULT_PATH),
+            enabled=os.environ.get("PROMPT_EDIT_RUNS", "1") not in ("", "0"),
+        )
+
+    @property
+    def db(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path)
+            self._db.row_factory = sqlite3.Row
+            self._db.executescript(SCHEMA)
+        return self._db
+
+    def record(self, harness: str, samples, meta: dict = None, revision: tuple = None) -> int:
+        """Grava uma rodada com suas amostras (uma transação) e devolve o id; 0 se desligado"""
+        if not self.enabled:
+            return 0
+        commit, dirty = revision or git_revision()
+        created_at = datetime.now(timezone.utc).isoformat(timespec="seconds")
+        with self.db:
+            run_id = self.db.execute(
+                "INSERT INTO runs (created_at, harness, git_commit, git_dirty, meta) VALUES (?, ?, ?, ?, ?)",
+                (created_at, harness, commit, int(dirty), json.dumps(meta or {}, sort_keys=True, default=str)),
+            ).lastrowid
+            self.db.executemany(
+                "INSERT INTO samples (run_id, model, strategy, document, document_chars, concurrency, ok, latency_s,"
+                " prompt_tokens, completion_tokens, cached_tokens, valid)"
+                " VALUES (:run_id, :model, :strategy, :document, :document_chars, :concurrency, :ok, :latency_s,"
+                " :prompt_tokens, :completion_tokens, :cached_tokens, :valid)",
+                ({**s, "run_id": run_id} for s in samples),
+            )
+        return run_id
+
+    def runs(self, harness: str = None, limit: int = None) -> list:
+        """Rodadas mais recentes primeiro, com contagem de amostras"""
+        query = ("SELECT runs.*, COUNT(samples.run_id) AS samples FROM runs"
+                 " LEFT JOIN samples ON samples.run_id = runs.id"
+                 + (" WHERE harness = ?" if harness else "") + " GROUP BY runs.id ORDER BY runs.id DESC"
+                 + (f" LIMIT {int(limit)}" if limit else ""))
+        return self.db.execute(query, (harness,) if harness else ()).fetchall()
+
+    def run(self, run_id: int):
+        return self.db.execute("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+
+    def latest(self, harness: str = None, before: int = None, commit: str = None):
+        """Rodada mais recente (do harness, anterior a `before`, no commit com esse prefixo)"""
+        clauses, params = [], []
+        if harness:
+            clauses.append("harness = ?")
+            params.append(harness)
+        if before:
+            clauses.append("id < ?")
+            params.append(before)
+        if commit:
+            clauses.append("git_commit LIKE ?")
+            params.append(f"{commit}%")
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        return self.db.execute(f"SELECT * FROM runs{where} ORDER BY id DESC LIMIT 1", params).fetchone()
+
+    def values(self, run_id: int, metric: str) -> dict:
+        """{chave: [valores]} da métrica; latência e tokens só das amostras ok, validade de todas"""
+        expression = METRICS[metric][0]
+        where = "run_id = ?" + ("" if metric == "valid" else " AND ok = 1")
+        grouped = {}
+        for row in self.db.execute(f"SELECT {', '.join(KEY_COLUMNS)}, {expression} AS value FROM samples"
+                                   f" WHERE {where}", (run_id,)):
+            if row["value"] is not None:
+                grouped.setdefault(tuple(row[c] for c in KEY_COLUMNS), []).append(float(row["value"]))
+        return grouped
+
+    def compare(self, base_id: int, candidate_id: int, metrics=tuple(METRICS), resamples: int = DEFAULT_RESAMPLES,
+                confidence: float = DEFAULT_CONFIDENCE, min_effect: float = DEFAULT_MIN_EFFECT,
+                seed: int = 0) -> list:
+        """Comparison por (combinação presente nas duas rodadas, métrica), em ordem estável"""
+        rng = random.Random(seed)
+        comparisons = []
+        for metric in metrics:
+            worse = METRICS[metric][1]
+            base, candidate = self.values(base_id, metric), self.values(candidate_id, metric)
+            for key in sorted(base.keys() & candidate.keys(), key=str):
+                old, new = base[key], candidate[key]
+                low, high = bootstrap_delta(old, new, resamples, confidence, rng)
+                base_mean, candidate_mean = statistics.fmean(old), statistics.fmean(new)
+                big_enough = abs(candidate_mean - base_mean) > min_effect * abs(base_mean)
+                verdict = "same"
+                if big_enough and (low > 0 if worse > 0 else high < 0):
+                    verdict = "regression"
+                elif big_enough and (high < 0 if worse > 0 else low > 0):
+                    verdict = "improvement"
+                comparisons.append(Comparison(key, metric, base_mean, candidate_mean, low, high,
+                                              len(old), len(new), verdict))
+        return comparisons
+
+    def openmetrics(self, run_id: int) -> str:
+        """Texto OpenMetrics de uma rodada: latência (summary), tokens e validade por combinação"""
+        run = self.run(run_id)
+        if run is None:
+            raise KeyError(f"rodada {run_id} não existe")
+        timestamp = datetime.fromisoformat(run["created_at"]).timestamp()
+        rows = self.db.execute(f"SELECT {', '.join(KEY_COLUMNS)}, document_chars, ok, latency_s, prompt_tokens,"
+                               f" completion_tokens, cached_tokens, valid FROM samples WHERE run_id = ?",
+                               (run_id,)).fetchall()
+        groups = {}
+        for row in rows:
+            labels = {"harness": run["harness"], **{c: row[c] for c in KEY_COLUMNS},
+                      "document_chars": row["document_chars"]}
+            groups.setdefault(_labels(labels), []).append(row)
+
+        lines = ["# TYPE prompt_edit_run info", "# HELP prompt_edit_run Rodada exportada",
+                 f"prompt_edit_run_info{_labels({'harness': run['harness'], 'run': run['id'], 'commit': run['git_commit'], 'dirty': bool(run['git_dirty'])})} 1 {timestamp:.3f}"]
+
+        def family(name, kind, help_text, unit=None):
+            lines.append(f"# TYPE {name} {kind}")
+            if unit:
+                lines.append(f"# UNIT {name} {unit}")
+            lines.append(f"# HELP {name} {help_text}")
+
+        family("prompt_edit_latency_seconds", "summary", "Latência por chamada bem-sucedida", "seconds")
+        for labels, group in groups.items():
+            latencies = [r["latency_s"] for r in group if r["ok"] and r["latency_s"] is not None]
+            for q in (0.5, 0.9, 0.99):
+                if latencies:
+                    value = round(percentile(latencies, q * 100), 6)
+                    lines.append(f"prompt_edit_latency_seconds{labels[:-1]},quantile=\"{q}\"}} {value} {timestamp:.3f}")
+            lines.append(f"prompt_edit_latency_seconds_sum{labels} {sum(latencies)} {timestamp:.3f}")
+            lines.append(f"prompt_edit_latency_seconds_count{labels} {len(latencies)} {timestamp:.3f}")
+        for name, column, help_text in (("prompt_edit_prompt_tokens", "prompt_tokens", "Tokens de entrada (média)"),
+                                        ("prompt_edit_completion_tokens", "completion_tokens",
+                                         "Tokens de saída (média)"),
+                                        ("prompt_edit_cached_tokens", "cached_tokens", "Tokens em cache (média)")):
+            family(name, "gauge", help_text)
+            for labels, group in groups.items():
+                ok = [r[column] for r in group if r["ok"]]
+                if ok:
+                    lines.append(f"{name}{labels} {statistics.fmean(ok):.4f} {timestamp:.3f}")
+        family("prompt_edit_valid_ratio", "gauge", "Fração de respostas válidas", "ratio")
+        for labels, group in groups.items():
+            lines.append(f"prompt_edit_valid_ratio{labels} {sum(r['valid'] for r in group) / len(group):.4f} "
+                         f"{timestamp:.3f}")
+        family("prompt_edit_samples", "gauge", "Amostras na rodada (com falhas)")
+        for labels, group in groups.items():
+            lines.append(f"prompt_edit_samples{labels} {len(group)} {timestamp:.3f}")
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+
+def _escape(value) -> str:
+    if isinstance(value, bool):
+        value = str(value).lower()
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _resolve(store: RunStore, value: str, harness: str = None):
+    """Id numérico ou prefixo de commit (rodada mais recente nele)"""
+    run = store.run(int(value)) if value.isdigit() else store.latest(harness, commit=value)
+    if run is None:
+        raise SystemExit(f"rodada não encontrada: {value}")
+    return run
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Histórico de rodadas: lista, compara (bootstrap) e exporta")
+    parser.add_argument("--db", help=f"Arquivo SQLite (padrão: PROMPT_EDIT_RUNS_DB ou {DEFAULT_PATH})")
+    sub = parser.add_subparsers(dest="command", required=True)
+    listing = sub.add_parser("list", help="Rodadas mais recentes")
+    listing.add_argument("--harness")
+    listing.add_argument("--limit", type=int, default=20)
+    compare = sub.add_parser("compare", help="Regressões da candidata contra a base (sai com 1 se houver)")
+    compare.add_argument("--candidate", help="Id ou prefixo de commit (padrão: rodada mais recente)")
+    compare.add_argument("--baseline", help="Id ou prefixo de commit (padrão: rodada anterior do mesmo harness)")
+    compare.add_argument("--harness")
+    compare.add_argument("--metrics", nargs="+", choices=list(METRICS), default=list(METRICS))
+    compare.add_argument("--resamples", type=int, default=DEFAULT_RESAMPLES)
+    compare.add_argument("--confidence", type=float, default=DEFAULT_CONFIDENCE)
+    compare.add_argument("--min-effect", type=float, default=DEFAULT_MIN_EFFECT,
+                         help="Efeito mínimo relativo à média da base para contar (padrão: 5%%)")
+    compare.add_argument("--all", action="store_true", help="Mostra também as combinações sem mudança")
+    export = sub.add_parser("export", help="Texto OpenMetrics de uma rodada")
+    export.add_argument("--run", help="Id ou prefixo de commit (padrão: rodada mais recente)")
+    export.add_argument("--harness")
+    export.add_argument("--output", help="Arquivo de saída (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    store = RunStore.from_env()
+    if args.db:
+        store.path = args.db
+    try:
+        if args.command == "list":
+            for run in store.runs(args.harness, args.limit):
+                meta = json.loads(run["meta"])
+                print(f"{run['id']:>5} {run['created_at']} {run['harness']:<10} {run['git_commit'][:10]}"
+                      f"{'*' if run['git_dirty'] else ' '} {run['samples']:>6} amostras "
+                      + " ".join(f"{k}={v}" for k, v in sorted(meta.items())))
+            return 0
+
+        if args.command == "export":
+            run = _resolve(store, args.run, args.harness) if args.run else store.latest(args.harness)
+            if run is None:
+                raise SystemExit("nenhuma rodada gravada")
+            text = store.openmetrics(run["id"])
+            if args.output:
+                with open(args.output, "w", encoding="utf-8") as f:
+                    f.write(text)
+            else:
+                sys.stdout.write(text)
+            return 0
+
+        candidate = _resolve(store, args.candidate, args.harness) if args.candidate else store.latest(args.harness)
+        if candidate is None:
+            raise SystemExit("nenhuma rodada gravada")
+        baseline = (_resolve(store, args.baseline, candidate["harness"]) if args.baseline
+                    else store.latest(candidate["harness"], before=candidate["id"]))
+        if baseline is None:
+            raise SystemExit(f"sem rodada anterior de {candidate['harness']} para comparar")
+        comparisons = store.compare(baseline["id"], candidate["id"], args.metrics, args.resamples,
+                                    args.confidence, args.min_effect)
+        print(f"Base {baseline['id']} ({baseline['git_commit'][:10]}, {baseline['created_at']}) → "
+              f"candidata {candidate['id']} ({candidate['git_commit'][:10]}, {candidate['created_at']}), "
+              f"IC {args.confidence:.0%}, {args.resamples} reamostragens")
+        for c in comparisons:
+            if args.all or c.verdict != "same":
+                print(c.describe())
+        regressions = sum(c.verdict == "regression" for c in comparisons)
+        improvements = sum(c.verdict == "improvement" for c in comparisons)
+        print(f"{len(comparisons)} comparações: {regressions} regressões, {improvements} melhorias")
+        return 1 if regressions else 0
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,109 @@
+"""
+Leitura incremental de respostas em streaming (SSE) do chat completions.
+
+Mede o que o usuário sente na UI do prompt-improver: tempo até o primeiro byte,
+tempo até o primeiro token, intervalos entre tokens e tokens/s de saída. O conteúdo
+JSON é remontado conforme os deltas chegam.
+"""
+import json
+import time
+from dataclasses import dataclass, field
+from typing import Optional
+
+
+@dataclass
+class StreamMetrics:
+    ttfb: float = 0.0                       # headers recebidos (s desde o envio)
+    ttft: Optional[float] = None            # primeiro delta com conteúdo
+    total: float = 0.0                      # fim do stream
+    json_complete: Optional[float] = None   # primeiro instante em que o buffer virou JSON válido
+    gaps: list = field(default_factory=list)
+    chunks: int = 0
+    completion_tokens: int = 0
+
+    @property
+    def tokens_per_sec(self) -> float:
+        """Taxa de decodificação: tokens de saída / tempo após o primeiro token"""
+        if self.ttft is None or self.total <= self.ttft:
+            return 0.0
+        return self.completion_tokens / (self.total - self.ttft)
+
+    def gap_percentile(self, q: float) -> float:
+        if not self.gaps:
+            return 0.0
+        ordered = sorted(self.gaps)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def as_dict(self) -> dict:
+        return {
+            "ttfb_s": round(self.ttfb, 3),
+            "ttft_s": None if self.ttft is None else round(self.ttft, 3),
+            "total_s": round(self.total, 3),
+            "json_complete_s": None if self.json_complete is None else round(self.json_complete, 3),
+            "gap_p50_ms": round(self.gap_percentile(0.5) * 1000, 1),
+            "gap_max_ms": round(max(self.gaps, default=0.0) * 1000, 1),
+            "completion_tokens": self.completion_tokens,
+            "tokens_per_sec": round(self.tokens_per_sec, 1),
+        }
+
+
+def iter_sse_events(lines):
+    """Eventos `data:` de um stream SSE (bytes ou str por linha), até o [DONE]"""
+    for raw in lines:
+        line = raw.decode("utf-8") if isinstance(raw, bytes) else raw
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            return
+        if data:
+            yield json.loads(data)
+
+
+def stream_payload(payload: dict) -> dict:
+    """Mesmo payload com stream ligado e usage no último chunk"""
+    return {**payload, "stream": True, "stream_options": {"include_usage": True}}
+
+
+def consume_stream(lines, start: float, ttfb: float, on_delta=None):
+    """
+    Consome o stream e devolve (data, metrics), onde `data` tem o mesmo formato de uma
+    resposta não-streaming ({"choices": [{"message": {"content"}}], "usage"}).
+    `start` é o time.perf_counter() do envio; `on_delta(texto, buffer)` é opcional.
+    """
+    metrics = StreamMetrics(ttfb=ttfb)
+    parts = []
+    usage = {}
+    last = None
+    depth = 0
+
+    for event in iter_sse_events(lines):
+        now = time.perf_counter() - start
+        if event.get("usage"):
+            usage = event["usage"]
+        for choice in event.get("choices") or ():
+            delta = (choice.get("delta") or {}).get("content")
+            if not delta:
+                continue
+            metrics.chunks += 1
+            if metrics.ttft is None:
+                metrics.ttft = now
+            else:
+                metrics.gaps.append(now - last)
+            last = now
+            parts.append(delta)
+            # Conta chaves fora de strings só de forma aproximada; o json.loads confirma
+            depth += delta.count("{") - delta.count("}")
+            if metrics.json_complete is None and depth <= 0 and "}" in delta:
+                try:
+                    json.loads("".join(parts))
+                    metrics.json_complete = now
+                except ValueError:
+                    pass
+            if on_delta:
+                on_delta(delta, parts)
+
+    metrics.total = time.perf_counter() - start
+    metrics.completion_tokens = usage.get("completion_tokens", metrics.chunks)
+    content = "".join(parts)
+    return {"choices": [{"message": {"content": content}}], "usage": usage}, metrics
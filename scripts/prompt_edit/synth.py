@@ -0,0 +1,225 @@
+"""
+Gerador determinístico de prompts de agente sintéticos para testes de carga.
+
+Produz documentos com a mesma cara do tests/fixtures/master_prompt.txt (headings
+numerados aninhados, bullets, blocos de código, citações, português acentuado) de
+10 KB a 1 MB+, cada um com cenários de edição com gabarito (seção e linha esperadas).
+Mesma semente + mesmo tamanho = mesmo documento.
+
+Uso (a partir de scripts/): python -m prompt_edit.synth --sizes 10k 100k 1m --out ../out/synth
+"""
+import argparse
+import json
+import os
+import random
+from dataclasses import dataclass, field
+
+DEFAULT_SEED = 1337
+ANCHOR_SECTION = "Tecnologias padrão"   # mesma seção usada pelos testes com ADDED_LINE
+
+TOPICS = [
+    "Quem você é", "Escopo atual", ANCHOR_SECTION, "Padrões de UI/UX", "Estrutura de pastas",
+    "Contratos de dados", "Regras duras do agente", "Fluxo do chat", "Formato das respostas",
+    "Negociação de preços", "Catálogo de chapas", "Logística e frete", "Atendimento pós-venda",
+    "Tom de voz", "Objeções comuns", "Integração com CRM", "Métricas de conversão",
+    "Segurança e privacidade", "Internacionalização", "Agenda de follow-up", "Proibições",
+    "Exemplos de diálogo", "Glossário técnico", "Políticas de desconto", "Qualificação de leads",
+]
+QUALIFIERS = ["avançado", "por região", "para exportação", "de inverno", "revisado", "B2B",
+              "em espanhol", "para arquitetos", "de alto padrão", "emergencial"]
+SUBJECTS = ["O agente", "A IA", "Você", "O vendedor virtual", "O assistente", "A persona Leandro Uchoa",
+            "O time comercial", "O cliente", "O sistema"]
+VERBS = ["deve confirmar", "precisa registrar", "nunca deve prometer", "sempre explica", "evita citar",
+         "pode sugerir", "verifica", "prioriza", "organiza", "responde sobre"]
+OBJECTS = ["o prazo de entrega das chapas", "a disponibilidade no cavalete", "o preço por metro quadrado",
+           "as condições de pagamento", "o acabamento polido ou levigado", "a espessura de 2 cm ou 3 cm",
+           "o histórico de negociação", "a cotação em dólar", "o idioma preferido do cliente",
+           "a origem do granito", "a reserva do lote", "as fotos do material", "o horário comercial",
+           "a política de amostras", "a integração com o WhatsApp"]
+TAILS = ["com clareza e educação.", "sem pressionar o cliente.", "antes de enviar a proposta.",
+         "usando no máximo duas frases.", "e registra tudo no CRM.", "conforme a tabela vigente.",
+         "quando houver dúvida técnica.", "respeitando a LGPD.", "em português, espanhol ou inglês.",
+         "com ênfase em exportação."]
+CODE_LANGS = ["ts", "json", "bash"]
+
+
+def parse_size(text: str) -> int:
+    """'10k' -> 10240, '1m' -> 1048576, '5000' -> 5000 (bytes UTF-8)"""
+    text = text.strip().lower()
+    units = {"k": 1024, "m": 1024 * 1024}
+    if text[-1:] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
+@dataclass
+class SyntheticDocument:
+    seed: int
+    target_bytes: int
+    text: str
+    headings: list = field(default_factory=list)    # títulos na ordem do documento
+    scenarios: list = field(default_factory=list)   # cenários com gabarito
+
+    @property
+    def size_label(self) -> str:
+        size = len(self.text.encode("utf-8"))
+        return f"{size // 1024}k" if size < 1024 * 1024 else f"{size / (1024 * 1024):.1f}m"
+
+
+class _Builder:
+    def __init__(self, rng: random.Random):
+        self.rng = rng
+        self.lines = []
+        self.size = 0
+        self.headings = []
+        self.bodies = {}     # título -> bullets de primeiro nível (para cenários de update/remove)
+        self.used = set()
+
+    def emit(self, line: str = ""):
+        self.lines.append(line)
+        self.size += len(line.encode("utf-8")) + 1
+
+    def sentence(self) -> str:
+        r = self.rng
+        return f"{r.choice(SUBJECTS)} {r.choice(VERBS)} {r.choice(OBJECTS)} {r.choice(TAILS)}"
+
+    def title(self, n: int, sub: bool = False) -> str:
+        base = TOPICS[n] if n < len(TOPICS) and not sub else self.rng.choice(TOPICS)
+        # Subseções sempre levam qualificador: os títulos "puros" ficam para as seções numeradas
+        title = f"{base} {self.rng.choice(QUALIFIERS)}" if sub else base
+        while title in self.used:
+            title = f"{base} {self.rng.choice(QUALIFIERS)} {self.rng.randint(2, 999)}"
+        self.used.add(title)
+        return title
+
+    def bullets(self, title: str, count: int, nested: bool = True):
+        items = self.bodies.setdefault(title, [])
+        for _ in range(count):
+            line = f"* {self.sentence()}"
+            items.append(line)
+            self.emit(line)
+            if nested and self.rng.random() < 0.25:
+                for _ in range(self.rng.randint(1, 3)):
+                    self.emit(f"  * {self.sentence()}")
+
+    def code_block(self):
+        lang = self.rng.choice(CODE_LANGS)
+        self.emit(f"```{lang}")
+        if lang == "bash":
+            # '#' dentro de bloco de código NÃO é heading
+            self.emit("# instala dependências do projeto")
+            self.emit("pnpm add ai @ai-sdk/openai zod")
+        elif lang == "json":
+            self.emit('{ "idioma": "pt-BR", "persona": "Leandro Uchoa", "moeda": "BRL" }')
+        else:
+            self.emit("export interface Mensagem { autor: 'usuario' | 'ia'; texto: string; criadaEm: string }")
+        self.emit("```")
+
+    def section(self, n: int):
+        r = self.rng
+        title = self.title(n)
+        self.headings.append(title)
+        self.emit(f"## {n + 1}) {title}")
+        self.emit("")
+        if r.random() < 0.4:
+            self.emit(f"> **Nota**: {self.sentence()}")
+            self.emit("")
+        self.bullets(title, r.randint(3, 8))
+        for m in range(r.randint(0, 3)):
+            sub = f"{n + 1}.{m + 1} {self.title(n, sub=True)}"
+            self.headings.append(sub)
+            self.emit("")
+            self.emit(f"### {sub}")
+            self.emit("")
+            self.emit(" ".join(self.sentence() for _ in range(r.randint(2, 4))))
+            self.emit("")
+            self.bullets(sub, r.randint(2, 5))
+            if r.random() < 0.3:
+                self.emit("")
+                self.code_block()
+        self.emit("")
+        self.emit("---")
+        self.emit("")
+
+
+def _scenarios(builder: _Builder, rng: random.Random, count: int) -> list:
+    scenarios = []
+    candidates = [t for t in builder.headings if builder.bodies.get(t)]
+    for n in range(count):
+        title = ANCHOR_SECTION if n == 0 else rng.choice(candidates)
+        kind = ["add", "update", "remove"][n % 3]
+        if kind == "add":
+            line = f"* {builder.sentence()}"
+            scenarios.append({
+                "name": f"ADICIONAR em {title}",
+                "instruction": f'Adicione esta linha ao final da seção "{title}":\n{line}',
+                "expected_action": "add",
+                "expected_section": title,
+                "target_line": line,
+                "change": {"section": title, "lineToAdd": line, "position": "after"},
+            })
+        else:
+            old = rng.choice(builder.bodies[title])
+            new = "" if kind == "remove" else f"* {builder.sentence()}"
+            instruction = (f'Remova da seção "{title}" a linha:\n{old}' if kind == "remove"
+                           else f'Na seção "{title}", troque a linha:\n{old}\npor:\n{new}')
+            scenarios.append({
+                "name": f"{'REMOVER' if kind == 'remove' else 'ATUALIZAR'} em {title}",
+                "instruction": instruction,
+                "expected_action": "update",
+                "expected_section": title,
+                "target_line": new,
+                "replaced_line": old,
+            })
+    return scenarios
+
+
+def generate(target_bytes: int, seed: int = DEFAULT_SEED, scenarios: int = 6) -> SyntheticDocument:
+    """Documento com pelo menos `target_bytes` bytes (UTF-8) e `scenarios` cenários com gabarito"""
+    rng = random.Random(f"{seed}:{target_bytes}")
+    builder = _Builder(rng)
+    builder.emit("# Agente Luchoa — Prompt mestre sintético")
+    builder.emit("")
+    builder.emit("> **Objetivo**: documento gerado para testes de desempenho do editor de prompts. "
+                 "Conteúdo em português com acentuação, listas, blocos de código e seções aninhadas.")
+    builder.emit("")
+    builder.emit("---")
+    builder.emit("")
+    n = 0
+    while builder.size < target_bytes or n < 4:
+        builder.section(n)
+        n += 1
+    return SyntheticDocument(
+        seed=seed,
+        target_bytes=target_bytes,
+        text="\n".join(builder.lines),
+        headings=builder.headings,
+        scenarios=_scenarios(builder, rng, scenarios),
+    )
+
+
+def write_corpus(directory: str, sizes: list, seed: int = DEFAULT_SEED, scenarios: int = 6) -> list:
+    """Grava <tam>.md e <tam>.scenarios.jsonl para cada tamanho; devolve os caminhos dos .md"""
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for size in sizes:
+        doc = generate(parse_size(size) if isinstance(size, str) else size, seed, scenarios)
+        base = os.path.join(directory, f"synthetic_{doc.size_label}")
+        with open(f"{base}.md", "w", encoding="utf-8") as f:
+            f.write(doc.text)
+        with open(f"{base}.scenarios.jsonl", "w", encoding="utf-8") as f:
+            for scenario in doc.scenarios:
+                f.write(json.dumps(scenario, ensure_ascii=False) + "\n")
+        paths.append(f"{base}.md")
+    return paths
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Gera prompts sintéticos para testes de carga")
+    parser.add_argument("--sizes", nargs="+", default=["10k", "100k", "1m"])
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED)
+    parser.add_argument("--scenarios", type=int, default=6)
+    parser.add_argument("--out", default=os.path.join("..", "out", "synth"))
+    args = parser.parse_args()
+    for path in write_corpus(args.out, args.sizes, args.seed, args.scenarios):
+        print(f"✓ {path}")
@@ -0,0 +1,176 @@
+"""
+Estimativa offline de tokens, calibrada pelo usage real.
+
+Sem vocabulário BPE: o texto é quebrado como o pré-tokenizador dos modelos GPT
+(palavras, grupos de até 3 dígitos, sequências de pontuação, quebras de linha) e
+cada pedaço custa uma quantidade fixa por tamanho — palavras com acento
+(português) quebram em mais subpalavras que as ASCII. Cada mensagem soma o
+overhead do formato de chat e o response_format entra pelo tamanho do schema.
+
+A contagem bruta é corrigida por um fator por modelo, aprendido com o
+usage.prompt_tokens das respostas (razão das somas com decaimento, então o
+fator acompanha mudanças de tokenizer). O estimador também guarda a média de
+completion_tokens por modelo, usada pelo planner. A calibração persiste em
+out/token_calibration.json (PROMPT_EDIT_TOKEN_CALIBRATION), separada por backend
+(OPENAI_BASE_URL): o usage do mockserver (len // 4) ou de outro provedor nunca
+mexe no fator aprendido com a API real. Arquivos antigos, sem backend, valem
+para a API da OpenAI.
+
+Uma instância é chamável como `estimator(payload)` (prompt + orçamento de saída),
+a mesma assinatura do estimador do RateLimiter.
+"""
+import json
+import math
+import os
+import re
+import threading
+from functools import lru_cache
+
+from prompt_edit.ratelimit import DEFAULT_OUTPUT_TOKENS
+
+DEFAULT_CALIBRATION_PATH = os.path.join("out", "token_calibration.json")
+DEFAULT_BACKEND = "https://api.openai.com/v1"   # = client.DEFAULT_BASE_URL, sem importar httpx
+PIECE_RE = re.compile(r"[^\W\d_]+|\d{1,3}|\s*\n+|[^\w\s]+|\s+")
+MESSAGE_OVERHEAD = 3    # <|start|>role ... <|end|>
+REPLY_PRIMING = 3       # <|start|>assistant<|message|>
+DECAY = 0.98            # peso das amostras antigas na calibração
+
+
+def _piece_tokens(piece: str) -> int:
+    first = piece[0]
+    if first.isalpha():
+        if piece.isascii():
+            return max(1, math.ceil(len(piece) / 5))
+        return max(1, math.ceil(len(piece) / 3.5))
+    if first.isdigit():
+        return 1
+    if piece.isspace():
+        return 1
+    return max(1, math.ceil(len(piece.encode("utf-8")) / 3))
+
+
+@lru_cache(maxsize=256)
+def count_text(text: str) -> int:
+    """Tokens brutos (sem calibração); em cache por texto, já que o documento se repete"""
+    return sum(_piece_tokens(piece) for piece in PIECE_RE.findall(text)) if text else 0
+
+
+def raw_prompt_tokens(payload: dict) -> int:
+    total = REPLY_PRIMING
+    for message in payload.get("messages", ()):
+        content = message.get("content") or ""
+        if isinstance(content, list):  # partes multimodais: só o texto conta aqui
+            content = "".join(part.get("text", "") for part in content if isinstance(part, dict))
+        total += MESSAGE_OVERHEAD + count_text(content) + count_text(message.get("role", ""))
+    response_format = payload.get("response_format")
+    if response_format and response_format.get("type") == "json_schema":
+        total += count_text(json.dumps(response_format["json_schema"], ensure_ascii=False))
+    return total
+
+
+class _Calibration:
+    def __init__(self, raw: float = 0.0, actual: float = 0.0, samples: int = 0,
+                 completion: float = 0.0, responses: float = 0.0):
+        self.raw = raw
+        self.actual = actual
+        self.samples = samples
+        self.completion = completion
+        self.responses = responses
+
+    @property
+    def scale(self) -> float:
+        return self.actual / self.raw if self.raw else 1.0
+
+    @property
+    def mean_completion(self):
+        return self.completion / self.responses if self.responses else None
+
+    def as_dict(self) -> dict:
+        return {"raw": round(self.raw, 1), "actual": round(self.actual, 1), "samples": self.samples,
+                "completion": round(self.completion, 1), "responses": round(self.responses, 3),
+                "scale": round(self.scale, 4)}
+
+
+class TokenEstimator:
+    """Thread-safe; um fator de calibração por modelo ("" = padrão para modelos sem amostras)."""
+
+    def __init__(self, calibration: dict = None, path: str = None, backend: str = DEFAULT_BACKEND):
+        self.path = path
+        self.backend = backend
+        self._models = {}
+        self._lock = threading.Lock()
+        for model, data in (calibration or {}).items():
+            data = {name: value for name, value in data.items() if name != "scale"}
+            self._models[model] = _Calibration(**data)
+
+    @classmethod
+    def from_env(cls) -> "TokenEstimator":
+        path = os.environ.get("PROMPT_EDIT_TOKEN_CALIBRATION", DEFAULT_CALIBRATION_PATH)
+        backend = (os.environ.get("OPENAI_BASE_URL") or DEFAULT_BACKEND).rstrip("/")
+        return cls(_load_backends(path).get(backend), path, backend)
+
+    def scale(self, model: str) -> float:
+        calibration = self._models.get(model) or self._models.get("")
+        return calibration.scale if calibration else 1.0
+
+    def prompt_tokens(self, payload: dict) -> int:
+        return math.ceil(raw_prompt_tokens(payload) * self.scale(payload.get("model", "")))
+
+    def expected_output(self, payload: dict) -> int:
+        """max_tokens pedido; senão a média observada do modelo; senão DEFAULT_OUTPUT_TOKENS"""
+        requested = payload.get("max_completion_tokens") or payload.get("max_tokens")
+        if requested:
+            return requested
+        calibration = self._models.get(payload.get("model", ""))
+        mean = calibration.mean_completion if calibration else None
+        return math.ceil(mean) if mean else DEFAULT_OUTPUT_TOKENS
+
+    def __call__(self, payload: dict) -> int:
+        """Reserva para o RateLimiter: prompt estimado + orçamento máximo de saída"""
+        output = payload.get("max_completion_tokens") or payload.get("max_tokens") or DEFAULT_OUTPUT_TOKENS
+        return self.prompt_tokens(payload) + output
+
+    def observe(self, payload: dict, usage: dict):
+        """Ajusta o fator do modelo (e o padrão "") com o usage real da resposta"""
+        actual = (usage or {}).get("prompt_tokens")
+        if not actual:
+            return
+        raw = raw_prompt_tokens(payload)
+        completion = usage.get("completion_tokens") or 0
+        with self._lock:
+            for model in (payload.get("model", ""), ""):
+                c = self._models.setdefault(model, _Calibration())
+                c.raw = c.raw * DECAY + raw
+                c.actual = c.actual * DECAY + actual
+                c.completion = c.completion * DECAY + completion
+                c.responses = c.responses * DECAY + 1
+                c.samples += 1
+
+    def calibration(self) -> dict:
+        with self._lock:
+            return {model: c.as_dict() for model, c in sorted(self._models.items())}
+
+    def save(self, path: str = None):
+        """Grava a calibração deste backend, preservando a dos outros no mesmo arquivo"""
+        path = path or self.path or DEFAULT_CALIBRATION_PATH
+        if not self._models:
+            return
+        backends = _load_backends(path)
+        backends[self.backend] = self.calibration()
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(backends, f, indent=2, sort_keys=True)
+            f.write("\n")
+        os.replace(tmp, path)
+
+
+def _load_backends(path: str) -> dict:
+    """{backend: {modelo: calibração}}; o formato antigo ({modelo: calibração}) vira o da API real"""
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if any(isinstance(value, dict) and "raw" in value for value in data.values()):
+        return {DEFAULT_BACKEND: data}
+    return data
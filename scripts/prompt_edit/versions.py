@@ -0,0 +1,242 @@
+"""
+Histórico de versões de um prompt: keyframes periódicos + deltas por linha.
+
+Cada versão guarda só o delta de linhas em relação à anterior (a partir de
+diff.opcodes): inteiro positivo copia N linhas da versão anterior, negativo pula
+N linhas e lista insere linhas novas. A cada `keyframe_interval` versões (ou
+quando o delta sairia maior que o texto) vai uma cópia completa, então
+reconstruir qualquer versão custa no máximo um keyframe + (intervalo - 1) deltas.
+
+Em disco é JSONL gzip, uma linha por versão. Cada commit acrescenta um membro
+gzip ao arquivo (append barato, sem reescrever nada); `compact()` regrava tudo
+em um membro só, que comprime melhor. Uma gravação interrompida perde apenas a
+última versão.
+
+    python -m prompt_edit.versions list out/history.jsonl.gz
+    python -m prompt_edit.versions show out/history.jsonl.gz 12
+    python -m prompt_edit.versions diff out/history.jsonl.gz 3 12
+"""
+import argparse
+import gzip
+import json
+import os
+import time
+import zlib
+from collections import OrderedDict
+from dataclasses import dataclass
+
+from prompt_edit.diff import opcodes, unified_diff
+
+DEFAULT_KEYFRAME_INTERVAL = 20
+CACHED_VERSIONS = 8
+
+
+@dataclass
+class VersionInfo:
+    number: int           # 1, 2, 3... na ordem dos commits
+    timestamp: float
+    message: str
+    chars: int
+    lines: int
+    keyframe: bool
+
+
+def make_delta(old_lines: list, new_lines: list) -> list:
+    delta = []
+    for tag, i1, i2, j1, j2 in opcodes(old_lines, new_lines):
+        if tag == "equal":
+            delta.append(i2 - i1)
+            continue
+        if i2 > i1:
+            delta.append(i1 - i2)
+        if j2 > j1:
+            delta.append(new_lines[j1:j2])
+    return delta
+
+
+def apply_delta(old_lines: list, delta: list) -> list:
+    lines = []
+    pos = 0
+    for op in delta:
+        if isinstance(op, list):
+            lines.extend(op)
+        elif op > 0:
+            lines.extend(old_lines[pos:pos + op])
+            pos += op
+        else:
+            pos -= op
+    return lines
+
+
+def _encode(record: dict) -> str:
+    return json.dumps(record, ensure_ascii=False, separators=(",", ":"))
+
+
+class VersionStore:
+    """Versões de UM documento; `path=None` mantém tudo só em memória."""
+
+    def __init__(self, path: str = None, keyframe_interval: int = DEFAULT_KEYFRAME_INTERVAL):
+        self.path = path
+        self.keyframe_interval = max(1, keyframe_interval)
+        self._infos = []
+        self._payloads = []   # ("key", linhas) ou ("delta", ops), paralelo a _infos
+        self._cache = OrderedDict()  # número -> linhas reconstruídas (LRU pequeno)
+        self._since_keyframe = 0
+        self._damaged = False
+        if path and os.path.exists(path):
+            self._load(path)
+
+    # --- leitura ------------------------------------------------------------
+
+    def _load(self, path: str):
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            try:
+                for line in f:
+                    self._append_record(json.loads(line))
+            except (EOFError, zlib.error, gzip.BadGzipFile, ValueError):
+                # Último membro truncado por queda: fica a versão anterior e o próximo
+                # commit regrava o arquivo (anexar depois do lixo o tornaria ilegível)
+                self._damaged = True
+
+    def _append_record(self, record: dict):
+        keyframe = "key" in record
+        self._infos.append(VersionInfo(record["v"], record["t"], record.get("msg", ""),
+                                       record["chars"], record["lines"], keyframe))
+        self._payloads.append(("key", record["key"]) if keyframe else ("delta", record["delta"]))
+        self._since_keyframe = 0 if keyframe else self._since_keyframe + 1
+
+    def __len__(self) -> int:
+        return len(self._infos)
+
+    def versions(self) -> list:
+        return list(self._infos)
+
+    def info(self, number: int) -> VersionInfo:
+        if not 1 <= number <= len(self._infos):
+            raise KeyError(f"versão {number} não existe (1..{len(self._infos)})")
+        return self._infos[number - 1]
+
+    def lines(self, number: int) -> list:
+        """Linhas da versão: keyframe mais próximo (ou versão em cache) + deltas seguintes"""
+        self.info(number)
+        cached = self._cache.get(number)
+        if cached is not None:
+            self._cache.move_to_end(number)
+            return cached
+        start = number
+        while self._payloads[start - 1][0] != "key" and start - 1 not in self._cache:
+            start -= 1
+        if self._payloads[start - 1][0] == "key":
+            lines = self._payloads[start - 1][1]
+        else:
+            start -= 1
+            lines = self._cache[start]
+        for n in range(start + 1, number + 1):
+            lines = apply_delta(lines, self._payloads[n - 1][1])
+        self._remember(number, lines)
+        return lines
+
+    def get(self, number: int = None) -> str:
+        """Texto da versão (a mais recente se `number` for omitido)"""
+        return "\n".join(self.lines(number or len(self._infos)))
+
+    def diff(self, a: int, b: int, n: int = 3) -> str:
+        return unified_diff(self.lines(a), self.lines(b), f"v{a}", f"v{b}", n)
+
+    def _remember(self, number: int, lines: list):
+        self._cache[number] = lines
+        self._cache.move_to_end(number)
+        while len(self._cache) > CACHED_VERSIONS:
+            self._cache.popitem(last=False)
+
+    # --- escrita ------------------------------------------------------------
+
+    def commit(self, text: str, message: str = "") -> VersionInfo:
+        """Nova versão; texto idêntico à última não cria versão (devolve a última)"""
+        new_lines = text.split("\n")
+        record = {"v": len(self._infos) + 1, "t": round(time.time(), 3), "msg": message,
+                  "chars": len(text), "lines": len(new_lines)}
+        if self._infos:
+            old_lines = self.lines(len(self._infos))
+            if old_lines == new_lines:
+                return self._infos[-1]
+            if self._since_keyframe + 1 < self.keyframe_interval:
+                delta = make_delta(old_lines, new_lines)
+                if len(_encode(delta)) < len(text):
+                    record["delta"] = delta
+        if "delta" not in record:
+            record["key"] = new_lines
+
+        self._append_record(record)
+        self._remember(record["v"], new_lines)
+        if self._damaged:
+            self.compact()
+        elif self.path:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            with gzip.open(self.path, "at", encoding="utf-8") as f:
+                f.write(_encode(record) + "\n")
+        return self._infos[-1]
+
+    def _records(self):
+        for info, (kind, payload) in zip(self._infos, self._payloads):
+            yield {"v": info.number, "t": info.timestamp, "msg": info.message,
+                   "chars": info.chars, "lines": info.lines, kind: payload}
+
+    def compact(self, path: str = None):
+        """Regrava o histórico inteiro em um único membro gzip (troca atômica)"""
+        path = path or self.path
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            for record in self._records():
+                f.write(_encode(record) + "\n")
+        os.replace(tmp, path)
+        if path == self.path:
+            self._damaged = False
+
+    def stats(self) -> dict:
+        """Tamanho do histórico (JSON sem gzip) contra guardar cópias completas"""
+        stored = sum(len(_encode(payload)) for _, payload in self._payloads)
+        full = sum(info.chars for info in self._infos)
+        return {
+            "versions": len(self._infos),
+            "keyframes": sum(info.keyframe for info in self._infos),
+            "stored_chars": stored,
+            "full_copy_chars": full,
+            "ratio": round(full / stored, 1) if stored else 0.0,
+        }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Histórico de versões de prompt (keyframes + deltas)")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list").add_argument("path")
+    show = sub.add_parser("show")
+    show.add_argument("path")
+    show.add_argument("version", type=int, nargs="?")
+    diff = sub.add_parser("diff")
+    diff.add_argument("path")
+    diff.add_argument("a", type=int)
+    diff.add_argument("b", type=int)
+    sub.add_parser("compact").add_argument("path")
+    args = parser.parse_args(argv)
+
+    store = VersionStore(args.path)
+    if args.command == "list":
+        for info in store.versions():
+            stamp = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(info.timestamp))
+            kind = "K" if info.keyframe else " "
+            print(f"v{info.number:<5} {kind} {stamp}  {info.chars:>7} chars {info.lines:>5} linhas  {info.message}")
+        print(json.dumps(store.stats()))
+    elif args.command == "show":
+        print(store.get(args.version))
+    elif args.command == "diff":
+        print(store.diff(args.a, args.b), end="")
+    elif args.command == "compact":
+        before = os.path.getsize(args.path)
+        store.compact()
+        print(f"{before} -> {os.path.getsize(args.path)} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,17 +4,15 @@ NOVO TESTE RADICAL: Forçar GPT retornar APENAS JSON com response_format='json_s
 Isso garante que o modelo retorna apenas JSON válido, não pode cortar.
 """
 import os
-import requests
+import re
 import json
 import time
+import argparse
 
-API_KEY = os.environ.get('OPENAI_API_KEY')
-if not API_KEY:
-    print('ERROR: OPENAI_API_KEY not set')
-    exit(1)
-
-with open('tests/fixtures/master_prompt.txt', 'r', encoding='utf-8') as f:
-    master_prompt = f.read()
+from prompt_edit import profiling
+from prompt_edit.corpus import load_master_prompt
+from prompt_edit.layout import CacheStats, build_messages, cached_tokens
+from prompt_edit.pruning import prune_document
 
 ADDED_LINE = '* Sempre memorize o nome do cliente durante a conversa.'
 
@@ -37,163 +35,204 @@ system = (
     'Retorne as mudanças para um documento em JSON puro.'
 )
 
-instruction = (
-    f'DOCUMENTO:\n{master_prompt}\n\n'
-    f'TAREFA: Adicione esta linha ao final da seção "## 3) Tecnologias padrão":\n{ADDED_LINE}\n'
-    f'Retorne APENAS JSON (sem texto antes/depois). Nenhuma explicação adicional.'
-)
+task = f'TAREFA: Adicione esta linha ao final da seção "## 3) Tecnologias padrão":\n{ADDED_LINE}\n'
+
+METRIC_COLUMNS = ['prompt_tokens', 'cached_tokens', 'attempts', 'total_s', 'ttfb_s', 'ttft_s', 'json_complete_s',
+                  'gap_p50_ms', 'gap_max_ms', 'completion_tokens', 'tokens_per_sec']
 
-headers = {
-    'Authorization': f'Bearer {API_KEY}',
-    'Content-Type': 'application/json'
-}
 
-print('=== TESTE RADICAL: response_format JSON Schema ===\n')
-
-# Teste 1: COM response_format='json_schema'
-print('[1] Testando com response_format="json_schema" (JSON obrigatório):')
-
-payload = {
-    'model': 'gpt-5.1',
-    'messages': [
-        {'role': 'system', 'content': system},
-        {'role': 'user', 'content': instruction}
-    ],
-    'temperature': 0,
-    'response_format': {
-        'type': 'json_schema',
-        'json_schema': {
-            'name': 'PromptEditChange',
-            'schema': json_schema
+def build_test_messages(master_prompt: str, prune: bool = False) -> tuple:
+    """(mensagens, info da poda): --prune manda só as seções relevantes + sumário de headings"""
+    document, prune_info = prune_document(master_prompt, task) if prune else (master_prompt, None)
+    instruction = (
+        f'{task}'
+        f'Retorne APENAS JSON (sem texto antes/depois). Nenhuma explicação adicional.'
+    )
+    # Prefixo estável (system → documento) e a tarefa por último: aproveita o cache de prompts
+    return build_messages(system, document, instruction), prune_info
+
+
+def build_payload(messages, model, schema):
+    payload = {'model': model, 'messages': messages, 'temperature': 0}
+    if schema:
+        payload['response_format'] = {
+            'type': 'json_schema',
+            'json_schema': {
+                'name': 'PromptEditChange',
+                'schema': json_schema
+            }
         }
-    }
-}
+    return payload
 
-start = time.time()
-try:
-    r = requests.post('https://api.openai.com/v1/chat/completions', 
-                     headers=headers, 
-                     data=json.dumps(payload), 
-                     timeout=120)
-    r.raise_for_status()
-    data = r.json()
-    duration = time.time() - start
-    
-    text = data['choices'][0]['message']['content']
-    print(f'✓ Resposta em {duration:.1f}s')
-    print(f'  Tamanho: {len(text)} chars')
-    print(f'  Tokens: {data["usage"]["total_tokens"]}')
-    
-    # Parse JSON
-    try:
-        change = json.loads(text)
-        print(f'✓ JSON parseado corretamente')
-        print(f'  Section: {change.get("section", "?")}')
-        print(f'  LineToAdd: {change.get("lineToAdd", "?")[:50]}...')
-        print(f'  Position: {change.get("position", "?")}')
-        
-        if ADDED_LINE in change.get('lineToAdd', ''):
-            print(f'✅ Contém a linha-alvo!')
+
+class Runner:
+    """Envia as variantes e junta métricas por rótulo (--stream: SSE com TTFB, TTFT, intervalos e tokens/s)"""
+
+    def __init__(self, client, stream: bool = False):
+        self.client = client
+        self.stream = stream
+        self.metrics = {}
+        self.cache_stats = CacheStats()
+
+    def run_chat(self, label, payload):
+        if self.stream:
+            result, m = self.client.stream(payload)
+            self.metrics[label] = {**m.as_dict(), 'prompt_tokens': result.usage.get('prompt_tokens', '-'),
+                                   'cached_tokens': cached_tokens(result.usage), 'attempts': result.attempts}
         else:
-            print(f'⚠️ Linha-alvo NOT FOUND')
-            
-    except json.JSONDecodeError as e:
-        print(f'✗ Erro ao parsear JSON: {e}')
-        print(f'  Resposta: {text[:300]}')
-        
-except Exception as e:
-    print(f'✗ Erro: {e}')
-
-# Teste 2: SEM response_format (controle)
-print('\n[2] Testando SEM response_format (controle - modo tradicional):')
-
-payload2 = {
-    'model': 'gpt-5.1',
-    'messages': [
-        {'role': 'system', 'content': system},
-        {'role': 'user', 'content': instruction}
-    ],
-    'temperature': 0,
-}
+            result = self.client.chat(payload)
+            self.metrics[label] = {'total_s': round(result.latency_s, 3),
+                                   'prompt_tokens': result.usage.get('prompt_tokens', '-'),
+                                   'cached_tokens': cached_tokens(result.usage), 'attempts': result.attempts}
+        self.cache_stats.record(payload['model'], result.usage, result.latency_s)
+        return result.data
+
+    def print_metrics_table(self):
+        print(f'{"variante":<24}' + ''.join(f'{c:>18}' for c in METRIC_COLUMNS))
+        for label, m in self.metrics.items():
+            print(f'{label:<24}' + ''.join(f'{str(m.get(c, "-")):>18}' for c in METRIC_COLUMNS))
 
-start = time.time()
-try:
-    r = requests.post('https://api.openai.com/v1/chat/completions', 
-                     headers=headers, 
-                     data=json.dumps(payload2), 
-                     timeout=120)
-    r.raise_for_status()
-    data = r.json()
-    duration = time.time() - start
-    
-    text = data['choices'][0]['message']['content']
-    print(f'✓ Resposta em {duration:.1f}s')
-    print(f'  Tamanho: {len(text)} chars')
-    print(f'  Tokens: {data["usage"]["total_tokens"]}')
-    
-    # Tentar extrair JSON
-    import re
-    m = re.search(r'\{[\s\S]*\}', text)
-    if m:
+
+def check_json_schema(runner, messages):
+    # Teste 1: COM response_format='json_schema'
+    print('[1] Testando com response_format="json_schema" (JSON obrigatório):')
+
+    payload = build_payload(messages, 'gpt-5.1', schema=True)
+
+    start = time.time()
+    try:
+        data = runner.run_chat('json_schema gpt-5.1', payload)
+        duration = time.time() - start
+
+        text = data['choices'][0]['message']['content']
+        print(f'✓ Resposta em {duration:.1f}s')
+        print(f'  Tamanho: {len(text)} chars')
+        print(f'  Tokens: {data["usage"].get("total_tokens", "N/A")}')
+
+        # Parse JSON
         try:
-            change = json.loads(m.group(0))
-            print(f'✓ JSON extraído')
+            change = json.loads(text)
+            print(f'✓ JSON parseado corretamente')
             print(f'  Section: {change.get("section", "?")}')
+            print(f'  LineToAdd: {change.get("lineToAdd", "?")[:50]}...')
+            print(f'  Position: {change.get("position", "?")}')
+
             if ADDED_LINE in change.get('lineToAdd', ''):
                 print(f'✅ Contém a linha-alvo!')
-        except:
-            print(f'✗ Falha ao parsear JSON extraído')
-    else:
-        print(f'✗ Nenhum JSON encontrado')
-        print(f'  Resposta: {text[:300]}')
-        
-except Exception as e:
-    print(f'✗ Erro: {e}')
-
-# Teste 3: gpt-4o (para comparar)
-print('\n[3] Testando gpt-4o com response_format JSON Schema (para comparar):')
-
-payload3 = {
-    'model': 'gpt-4o',
-    'messages': [
-        {'role': 'system', 'content': system},
-        {'role': 'user', 'content': instruction}
-    ],
-    'temperature': 0,
-    'response_format': {
-        'type': 'json_schema',
-        'json_schema': {
-            'name': 'PromptEditChange',
-            'schema': json_schema
-        }
-    }
-}
+            else:
+                print(f'⚠️ Linha-alvo NOT FOUND')
+
+        except json.JSONDecodeError as e:
+            print(f'✗ Erro ao parsear JSON: {e}')
+            print(f'  Resposta: {text[:300]}')
+
+    except Exception as e:
+        print(f'✗ Erro: {e}')
+
 
-start = time.time()
-try:
-    r = requests.post('https://api.openai.com/v1/chat/completions', 
-                     headers=headers, 
-                     data=json.dumps(payload3), 
-                     timeout=120)
-    r.raise_for_status()
-    data = r.json()
-    duration = time.time() - start
-    
-    text = data['choices'][0]['message']['content']
-    print(f'✓ Resposta em {duration:.1f}s')
-    print(f'  Tamanho: {len(text)} chars')
-    
+def check_free_text(runner, messages):
+    # Teste 2: SEM response_format (controle)
+    print('\n[2] Testando SEM response_format (controle - modo tradicional):')
+
+    payload = build_payload(messages, 'gpt-5.1', schema=False)
+
+    start = time.time()
     try:
-        change = json.loads(text)
-        if ADDED_LINE in change.get('lineToAdd', ''):
-            print(f'✅ gpt-4o também funciona!')
-    except:
-        print(f'✗ Erro ao parsear JSON')
-        
-except Exception as e:
-    print(f'✗ Erro: {e}')
-
-print('\n=== CONCLUSÕES ===')
-print('Se [1] funciona: Use response_format="json_schema" para garantir JSON válido')
-print('Se [2] falha: O modelo não respeita instruções de retornar APENAS JSON')
-print('Se [3] funciona: Pode ser alternativa ao gpt-5.1')
+        data = runner.run_chat('livre gpt-5.1', payload)
+        duration = time.time() - start
+
+        text = data['choices'][0]['message']['content']
+        print(f'✓ Resposta em {duration:.1f}s')
+        print(f'  Tamanho: {len(text)} chars')
+        print(f'  Tokens: {data["usage"].get("total_tokens", "N/A")}')
+
+        # Tentar extrair JSON
+        m = re.search(r'\{[\s\S]*\}', text)
+        if m:
+            try:
+                change = json.loads(m.group(0))
+                print(f'✓ JSON extraído')
+                print(f'  Section: {change.get("section", "?")}')
+                if ADDED_LINE in change.get('lineToAdd', ''):
+                    print(f'✅ Contém a linha-alvo!')
+            except:
+                print(f'✗ Falha ao parsear JSON extraído')
+        else:
+            print(f'✗ Nenhum JSON encontrado')
+            print(f'  Resposta: {text[:300]}')
+
+    except Exception as e:
+        print(f'✗ Erro: {e}')
+
+
+def check_gpt4o(runner, messages):
+    # Teste 3: gpt-4o (para comparar)
+    print('\n[3] Testando gpt-4o com response_format JSON Schema (para comparar):')
+
+    payload = build_payload(messages, 'gpt-4o', schema=True)
+
+    start = time.time()
+    try:
+        data = runner.run_chat('json_schema gpt-4o', payload)
+        duration = time.time() - start
+
+        text = data['choices'][0]['message']['content']
+        print(f'✓ Resposta em {duration:.1f}s')
+        print(f'  Tamanho: {len(text)} chars')
+
+        try:
+            change = json.loads(text)
+            if ADDED_LINE in change.get('lineToAdd', ''):
+                print(f'✅ gpt-4o também funciona!')
+        except:
+            print(f'✗ Erro ao parsear JSON')
+
+    except Exception as e:
+        print(f'✗ Erro: {e}')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='response_format json_schema vs. texto livre')
+    parser.add_argument('--prune', action='store_true',
+                        help='Envia só as seções relevantes + sumário de headings (fallback: documento inteiro)')
+    parser.add_argument('--stream', action='store_true',
+                        help='Usa SSE e mede TTFB, TTFT, intervalos entre tokens e tokens/s')
+    args = parser.parse_args(argv)
+
+    from prompt_edit.cache import ResponseCache
+    from prompt_edit.client import ChatClient, requires_api_key
+
+    api_key = os.environ.get('OPENAI_API_KEY')
+    cache = ResponseCache.from_env()  # PROMPT_EDIT_CACHE=record|replay|passthrough
+    profiling.configure_from_env()  # PROMPT_EDIT_TRACE=out/trace.json, PROMPT_EDIT_PROFILE=1
+    if not api_key and requires_api_key() and not cache.offline:  # mock local: OPENAI_BASE_URL
+        print('ERROR: OPENAI_API_KEY not set')
+        return 1
+
+    messages, prune_info = build_test_messages(load_master_prompt(), args.prune)
+
+    print('=== TESTE RADICAL: response_format JSON Schema ===\n')
+    if prune_info:
+        print(f'Contexto podado: {prune_info["context_chars"]}/{prune_info["original_chars"]} chars '
+              f'(pruned={prune_info["pruned"]}, confiança={prune_info["confidence"]}, seções={prune_info["sections"]})\n')
+
+    with ChatClient(api_key=api_key, timeout=120, cache=cache) as client:
+        runner = Runner(client, args.stream)
+        check_json_schema(runner, messages)
+        check_free_text(runner, messages)
+        check_gpt4o(runner, messages)
+
+    print('\n=== MÉTRICAS ' + ('(streaming SSE)' if args.stream else '(sem streaming)') + ' ===')
+    runner.print_metrics_table()
+    print(runner.cache_stats.describe())
+    profiling.finish()
+
+    print('\n=== CONCLUSÕES ===')
+    print('Se [1] funciona: Use response_format="json_schema" para garantir JSON válido')
+    print('Se [2] falha: O modelo não respeita instruções de retornar APENAS JSON')
+    print('Se [3] funciona: Pode ser alternativa ao gpt-5.1')
+    return 0
+
+
+if __name__ == '__main__':
+    exit(main())
@@ -5,17 +5,52 @@ Valida que o GPT escolhe corretamente entre:
 - ADICIONAR nova linha
 - ATUALIZAR linha existente
 - REMOVER conteúdo
+
+Os cenários vêm de JSONL (padrão tests/fixtures/scenarios.jsonl), lidos sob demanda;
+cada resultado é gravado em out/scenario_results.jsonl assim que termina e
+--resume retoma uma rodada interrompida pulando os cenários já concluídos.
+
+Rodadas noturnas podem ir pela Batch API: --batch-build compila o corpus em um
+JSONL de requisições e --batch-ingest pontua o arquivo de saída, com a mesma
+avaliação das rodadas síncronas (python -m prompt_edit.batch local|submit
+gera a saída).
+
+Rodadas ao vivo também entram no histórico (out/runs.sqlite, uma amostra por
+cenário com latência, tokens e acerto); python -m prompt_edit runs compare
+aponta regressões contra a rodada anterior.
 """
 
 import os
 import json
-import httpx
-from dotenv import load_dotenv
+import time
+import argparse
+from typing import TYPE_CHECKING
+
+from prompt_edit.corpus import ResultLog, count_scenarios, iter_results, iter_scenarios
+from prompt_edit.document import Document
+from prompt_edit.edits import as_change_list, response_format
+from prompt_edit.fastpath import FastPath
+from prompt_edit.layout import CacheStats, build_messages, cached_tokens, prompt_cache_key
+from prompt_edit.planner import BudgetExceeded, Planner
+from prompt_edit import profiling
+from prompt_edit.profiling import span
+from prompt_edit.pruning import prune_document
+from prompt_edit.ratelimit import RateLimiter
+from prompt_edit.reeval import DEFAULT_CHUNK_SIZE, reevaluate, score_change
+from prompt_edit.runs import RunStore, sample
+from prompt_edit.tokens import TokenEstimator
+from prompt_edit.versions import VersionStore
 
-load_dotenv()
+if TYPE_CHECKING:
+    from prompt_edit.client import AsyncChatClient, ChatClient, ChatResult
 
-API_KEY = os.getenv("OPENAI_API_KEY")
 MODEL = "gpt-4o"  # Usar 4o para testes (mais rápido)
+DEFAULT_CONCURRENCY = 8
+TIMEOUT = 30.0
+
+_client = None
+_planner = None
+_fast_path = None
 
 # Prompt master de exemplo (simplificado)
 MASTER_PROMPT = """# Agente de Atendimento
@@ -37,42 +72,35 @@ Você é um assistente de vendas chamado Lucas.
 * Não fornecer dados sensíveis
 """
 
-# Cenários de teste
-TEST_SCENARIOS = [
-    {
-        "name": "ADICIONAR nova linha",
-        "instruction": "Adicione uma regra para sempre perguntar o nome do cliente",
-        "expected_action": "add",
-        "expected_section": "Comportamento"
-    },
-    {
-        "name": "ATUALIZAR linha existente", 
-        "instruction": "Mude o nome do assistente de Lucas para Pedro",
-        "expected_action": "update",
-        "expected_section": "Identidade"
-    },
-    {
-        "name": "ADICIONAR tecnologia",
-        "instruction": "Adicione suporte a Telegram na lista de tecnologias",
-        "expected_action": "add",
-        "expected_section": "Tecnologias"
-    },
-    {
-        "name": "ATUALIZAR horário",
-        "instruction": "Altere o horário de atendimento para 9h às 20h",
-        "expected_action": "update",
-        "expected_section": "Regras de Negócio"
-    },
+# Cenários de teste (JSONL, um por linha) e log de resultados append-only
+DEFAULT_SCENARIOS = "tests/fixtures/scenarios.jsonl"
+DEFAULT_RESULTS = "out/scenario_results.jsonl"
+MAX_LISTED = 50  # resumo lista cada cenário só em rodadas pequenas; nas grandes, só as falhas
+
+MULTI_CHANGE_FORMAT = """Retorne APENAS JSON no formato:
+{
+  "changes": [
     {
-        "name": "ADICIONAR regra nova seção",
-        "instruction": "Adicione uma seção de Proibições com: nunca falar de concorrentes",
-        "expected_action": "add",
-        "expected_section": "nova seção"
+      "section": "nome da seção onde fazer a mudança",
+      "lineToAdd": "texto exato a adicionar ou novo texto para substituição",
+      "position": "after" | "before" | "replace",
+      "explanation": "breve explicação do que foi feito"
     }
-]
+  ]
+}
+Se a instrução pedir várias mudanças, retorne TODAS em "changes" (uma por linha afetada)."""
 
-def call_gpt_for_edit(instruction: str) -> dict:
-    """Chama GPT para analisar e retornar mudança em JSON"""
+
+def build_edit_request(instruction: str, multi: bool = False, prune: bool = False) -> dict:
+    """
+    Monta o payload da chamada de edição (compartilhado entre modo síncrono e assíncrono).
+    Com multi=True o modelo devolve {"changes": [...]} e uma instrução composta
+    custa uma única chamada. Com prune=True só as seções relevantes vão por inteiro
+    (o resto vira sumário de headings), com fallback para o documento completo.
+    A instrução vai na última mensagem: system + documento formam um prefixo estável
+    que o cache de prompts do provedor reaproveita entre edições do mesmo documento;
+    o prompt_cache_key (hash do documento) manda essas edições ao mesmo servidor de cache.
+    """
     
     system_prompt = """Você é um editor de prompts de IA. Analise a instrução do usuário e retorne APENAS um JSON indicando a mudança necessária.
 
@@ -88,194 +116,603 @@ Retorne APENAS JSON no formato:
   "position": "after" | "before" | "replace",
   "explanation": "breve explicação do que foi feito"
 }"""
+    if multi:
+        system_prompt = system_prompt[:system_prompt.index("Retorne APENAS JSON")] + MULTI_CHANGE_FORMAT
 
-    user_message = f"""PROMPT ATUAL:
-{MASTER_PROMPT}
+    document, _ = prune_document(MASTER_PROMPT, instruction) if prune else (MASTER_PROMPT, None)
+    label = "PROMPT ATUAL" if document is MASTER_PROMPT else "PROMPT ATUAL (resumo: seções omitidas aparecem como […]; use os headings exatamente como estão)"
 
-INSTRUÇÃO DO USUÁRIO:
+    user_message = f"""INSTRUÇÃO DO USUÁRIO:
 {instruction}
 
 Analise e retorne o JSON com a mudança necessária."""
 
-    response = httpx.post(
-        "https://api.openai.com/v1/chat/completions",
-        headers={
-            "Authorization": f"Bearer {API_KEY}",
-            "Content-Type": "application/json"
-        },
-        json={
-            "model": MODEL,
-            "messages": [
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_message}
-            ],
-            "response_format": {
-                "type": "json_schema",
-                "json_schema": {
-                    "name": "PromptEditChange",
-                    "strict": True,
-                    "schema": {
-                        "type": "object",
-                        "properties": {
-                            "section": {"type": "string"},
-                            "lineToAdd": {"type": "string"},
-                            "position": {"type": "string", "enum": ["after", "before", "replace"]},
-                            "explanation": {"type": "string"}
-                        },
-                        "required": ["section", "lineToAdd", "position", "explanation"],
-                        "additionalProperties": False
-                    }
-                }
-            },
-            "temperature": 0.3
-        },
-        timeout=30.0
-    )
-    
-    data = response.json()
-    content = data["choices"][0]["message"]["content"]
-    return json.loads(content)
+    return {
+        "model": MODEL,
+        "messages": build_messages(system_prompt, document, user_message, label),
+        "response_format": response_format(multi),
+        "temperature": 0.3,
+        "prompt_cache_key": prompt_cache_key(MASTER_PROMPT),
+    }
 
 
-def apply_change(original: str, change: dict) -> str:
-    """Aplica a mudança no documento original"""
-    section = change["section"]
-    line_to_add = change["lineToAdd"]
-    position = change["position"]
-    
-    lines = original.split("\n")
-    result = []
-    section_found = False
+def get_planner() -> Planner:
+    """
+    Planner pré-envio com o estimador calibrado (out/token_calibration.json);
+    orçamentos via PROMPT_EDIT_MAX_COST / _MAX_LATENCY / _MAX_PROMPT_TOKENS
+    """
+    global _planner
+    if _planner is None:
+        _planner = Planner.from_env(TokenEstimator.from_env())
+    return _planner
+
+
+def get_fast_path() -> FastPath:
+    """
+    Regras locais sobre o MASTER_PROMPT para instruções triviais; limiar via
+    PROMPT_EDIT_FAST_PATH_MIN_CONFIDENCE, PROMPT_EDIT_FAST_PATH=0 desliga
+    """
+    global _fast_path
+    if _fast_path is None:
+        _fast_path = FastPath.from_env(MASTER_PROMPT)
+    return _fast_path
+
+
+def get_client() -> 'ChatClient':
+    """Cliente compartilhado (pool keep-alive + retry) criado na primeira chamada"""
+    global _client
+    if _client is None:
+        from prompt_edit.client import ChatClient
+        _client = ChatClient(api_key=os.getenv("OPENAI_API_KEY"), timeout=TIMEOUT,
+                             limiter=RateLimiter(estimator=get_planner().estimator))
+    return _client
+
+
+def prepare_edit_request(instruction: str, multi: bool = False, prune: bool = False) -> tuple:
+    """
+    (payload, plan) conferido antes do envio: fora do orçamento, tenta a versão podada
+    (--prune) e, se ainda não couber, levanta BudgetExceeded sem gastar a chamada
+    """
+    payload = build_edit_request(instruction, multi, prune)
+    downscope = None if prune else (lambda _: build_edit_request(instruction, multi, True))
+    return get_planner().check(payload, downscope)
+
+
+def parse_edit_response(result: 'ChatResult', plan=None) -> dict:
+    """Extrai o JSON da mudança a partir da resposta do chat completions"""
+    change = json.loads(result.content)
+    change["usage"] = result.usage
+    change["latency_s"] = result.latency_s
+    if plan is not None:
+        change["estimated_prompt_tokens"] = plan.prompt_tokens
+    return change
+
+
+def call_gpt_for_edit(instruction: str, multi: bool = False, prune: bool = False) -> dict:
+    """Chama GPT para analisar e retornar mudança em JSON"""
+    with span("build_request"):
+        payload, plan = prepare_edit_request(instruction, multi, prune)
+    result = get_client().chat(payload)
+    with span("parse_response"):
+        return parse_edit_response(result, plan)
+
+
+def local_edit(instruction: str, multi: bool = False):
+    """Mudança pelo caminho rápido (mesmo formato da resposta do GPT) ou None abaixo do limiar"""
+    start = time.perf_counter()
+    with span("fast_path"):
+        edit = get_fast_path().edit(instruction)
+    if edit is None:
+        return None
+    change = edit.as_response(multi)
+    change["usage"] = {}
+    change["latency_s"] = time.perf_counter() - start
+    change["fast_path"] = {"rule": edit.rule, "confidence": edit.confidence}
+    return change
+
+
+def edit_instruction(instruction: str, multi: bool = False, prune: bool = False) -> dict:
+    """Caminho rápido local quando a instrução é trivial; senão call_gpt_for_edit"""
+    return local_edit(instruction, multi) or call_gpt_for_edit(instruction, multi, prune)
+
+
+async def call_gpt_for_edit_async(client: 'AsyncChatClient', instruction: str,
+                                  multi: bool = False, prune: bool = False) -> dict:
+    """Versão assíncrona de call_gpt_for_edit usando um AsyncChatClient compartilhado (keep-alive)"""
+    with span("build_request"):
+        payload, plan = prepare_edit_request(instruction, multi, prune)
+    result = await client.chat(payload)
+    with span("parse_response"):
+        return parse_edit_response(result, plan)
+
+
+async def edit_instruction_async(client: 'AsyncChatClient', instruction: str,
+                                 multi: bool = False, prune: bool = False) -> dict:
+    return local_edit(instruction, multi) or await call_gpt_for_edit_async(client, instruction, multi, prune)
+
+
+def report_scenario(i: int, total: int, scenario: dict, change: dict = None, error: Exception = None) -> dict:
+    """Imprime o resultado de um cenário e retorna o registro para o resumo"""
+    print(f"\n{'='*60}")
+    print(f"[{i}/{total}] {scenario['name']}")
+    print(f"{'='*60}")
+    print(f"📝 Instrução: {scenario['instruction']}")
+    print()
     
-    for i, line in enumerate(lines):
-        # Encontrar seção
-        if section.lower() in line.lower():
-            section_found = True
-            
-            if position == "before":
-                result.append(line_to_add)
-                result.append(line)
-            elif position == "replace":
-                result.append(line_to_add if line_to_add else "")
-            else:  # after
-                result.append(line)
-                # Adicionar após o conteúdo da seção (próxima linha não-vazia)
-                continue
-        elif section_found and position == "after":
-            # Adicionar após primeira linha de conteúdo
-            if line.strip() and not line.startswith("#"):
-                result.append(line)
-                result.append(line_to_add)
-                section_found = False
-                continue
-            result.append(line)
+    try:
+        if error is not None:
+            raise error
+        
+        with span("score"):
+            score = score_change(MASTER_PROMPT, scenario, change)
+        changes = score["changes"]
+        
+        fast = change.get("fast_path")
+        if fast:
+            print(f"⚡ Caminho rápido local ({len(changes)} mudança(s), regra {fast['rule']}, "
+                  f"confiança {fast['confidence']:.2f}):")
         else:
-            result.append(line)
-    
-    # Se seção não encontrada, adicionar no final
-    if not section_found and position == "after":
-        result.append("")
-        result.append(f"## {section}")
-        result.append(line_to_add)
-    
-    return "\n".join(result)
+            print(f"📋 Resposta GPT ({len(changes)} mudança(s)):")
+        for c, resolved in zip(changes, score["resolved"]):
+            target = f"{resolved[0]} (confiança {resolved[1]:.2f})" if resolved else "seção nova"
+            print(f"   section: {c['section']} → {target}")
+            print(f"   position: {c['position']}")
+            print(f"   lineToAdd: {c['lineToAdd'][:60]}..." if len(c['lineToAdd']) > 60 else f"   lineToAdd: {c['lineToAdd']}")
+            print(f"   explanation: {c['explanation']}")
+        
+        # Verificar se ação está correta (em modo multi basta uma das mudanças acertar)
+        expected, actual, sections = scenario["expected_action"], score["action"], score["sections"]
+        
+        print()
+        if score["action_correct"]:
+            print(f"   ✅ Ação correta: {actual} (esperado: {expected})")
+        else:
+            print(f"   ⚠️ Ação diferente: {actual} (esperado: {expected})")
+        
+        if score["section_correct"]:
+            print(f"   ✅ Seção correta: {', '.join(sections)}")
+        else:
+            print(f"   ⚠️ Seção diferente: {', '.join(sections)} (esperado: {scenario['expected_section']})")
+        
+        # Mudanças já aplicadas por score_change (uma passada, mesmo com várias)
+        original_lines = len(MASTER_PROMPT.split("\n"))
+        updated_lines = len(score["updated"].split("\n"))
+        
+        print()
+        print(f"   📊 Original: {original_lines} linhas → Atualizado: {updated_lines} linhas")
+        
+        return {
+            "id": scenario["id"],
+            "scenario": scenario["name"],
+            "success": score["success"],
+            "change": change,
+            "prompt_tokens": change.get("usage", {}).get("prompt_tokens", 0)
+        }
+        
+    except Exception as e:
+        print(f"   ❌ ERRO: {e}")
+        return {
+            "id": scenario["id"],
+            "scenario": scenario["name"],
+            "success": False,
+            "error": str(e)
+        }
 
 
-def run_tests():
-    """Executa todos os cenários de teste"""
+def print_header(mode: str, total: int, pending: int):
     print("=" * 70)
     print("🧪 TESTE DE CENÁRIOS DE EDIÇÃO GPT")
     print("=" * 70)
     print(f"Modelo: {MODEL}")
-    print(f"Cenários: {len(TEST_SCENARIOS)}")
+    print(f"Cenários: {total}" + (f" ({pending} pendentes)" if pending != total else ""))
+    print(f"Modo: {mode}")
     print()
-    
-    results = []
-    
-    for i, scenario in enumerate(TEST_SCENARIOS, 1):
-        print(f"\n{'='*60}")
-        print(f"[{i}/{len(TEST_SCENARIOS)}] {scenario['name']}")
-        print(f"{'='*60}")
-        print(f"📝 Instrução: {scenario['instruction']}")
-        print()
-        
-        try:
-            # Chamar GPT
-            change = call_gpt_for_edit(scenario["instruction"])
-            
-            print(f"📋 Resposta GPT:")
-            print(f"   section: {change['section']}")
-            print(f"   position: {change['position']}")
-            print(f"   lineToAdd: {change['lineToAdd'][:60]}..." if len(change['lineToAdd']) > 60 else f"   lineToAdd: {change['lineToAdd']}")
-            print(f"   explanation: {change['explanation']}")
-            
-            # Verificar se ação está correta
-            expected = scenario["expected_action"]
-            actual = "update" if change["position"] == "replace" else "add"
-            
-            action_correct = (expected == actual)
-            section_correct = scenario["expected_section"].lower() in change["section"].lower()
-            
-            print()
-            if action_correct:
-                print(f"   ✅ Ação correta: {actual} (esperado: {expected})")
-            else:
-                print(f"   ⚠️ Ação diferente: {actual} (esperado: {expected})")
-            
-            if section_correct:
-                print(f"   ✅ Seção correta: {change['section']}")
-            else:
-                print(f"   ⚠️ Seção diferente: {change['section']} (esperado: {scenario['expected_section']})")
-            
-            # Aplicar mudança
-            updated = apply_change(MASTER_PROMPT, change)
-            
-            # Mostrar diff resumido
-            original_lines = len(MASTER_PROMPT.split("\n"))
-            updated_lines = len(updated.split("\n"))
-            
-            print()
-            print(f"   📊 Original: {original_lines} linhas → Atualizado: {updated_lines} linhas")
-            
-            results.append({
-                "scenario": scenario["name"],
-                "success": action_correct and section_correct,
-                "change": change
-            })
-            
-        except Exception as e:
-            print(f"   ❌ ERRO: {e}")
-            results.append({
-                "scenario": scenario["name"],
-                "success": False,
-                "error": str(e)
-            })
-    
-    # Resumo final
+
+
+def print_summary(results, elapsed: float):
+    """Resumo final em uma passada (aceita o próprio ResultLog: memória constante)"""
     print("\n" + "=" * 70)
     print("📊 RESUMO DOS TESTES")
     print("=" * 70)
     
-    success_count = sum(1 for r in results if r["success"])
-    print(f"✅ Sucesso: {success_count}/{len(results)}")
-    
+    total = success_count = 0
+    prompt_tokens = prompt_calls = 0
+    estimate_error = estimated_calls = 0
+    fast_count = fast_success = 0
+    stats = CacheStats()
+    listed, failures = [], []
     for r in results:
+        total += 1
+        success_count += bool(r["success"])
+        if r.get("prompt_tokens"):
+            prompt_tokens += r["prompt_tokens"]
+            prompt_calls += 1
+        if r.get("prompt_tokens") and r.get("change", {}).get("estimated_prompt_tokens"):
+            estimate_error += abs(r["change"]["estimated_prompt_tokens"] - r["prompt_tokens"]) / r["prompt_tokens"]
+            estimated_calls += 1
+        if r.get("change", {}).get("fast_path"):
+            fast_count += 1
+            fast_success += bool(r["success"])
+        elif "change" in r:
+            stats.record(MODEL, r["change"].get("usage"), r["change"].get("latency_s"))
+        if len(listed) < MAX_LISTED:
+            listed.append(r)
+        if not r["success"] and len(failures) < MAX_LISTED:
+            failures.append(r)
+    
+    print(f"✅ Sucesso: {success_count}/{total}")
+    print(f"⏱️ Tempo total: {elapsed:.1f}s")
+    if prompt_calls:
+        print(f"📦 Tokens de entrada: média {prompt_tokens / prompt_calls:.0f} (total {prompt_tokens})")
+        print(f"♻️ {stats.describe()}")
+    if total:
+        print(f"⚡ Caminho rápido local: {fast_count}/{total} ({fast_count / total:.0%}) sem chamada ao modelo"
+              + (f", {fast_success} com sucesso" if fast_count else ""))
+    if estimated_calls:
+        print(f"🔮 Estimativa pré-envio de tokens: erro médio {estimate_error / estimated_calls:.1%}")
+    
+    if total > MAX_LISTED and failures:
+        print(f"   (primeiras {len(failures)} falhas)")
+    for r in listed if total <= MAX_LISTED else failures:
         status = "✅" if r["success"] else "❌"
         print(f"   {status} {r['scenario']}")
     
     print()
     print("🎯 CONCLUSÃO:")
-    if success_count == len(results):
+    if success_count == total:
         print("   GPT analisa corretamente ADICIONAR vs ATUALIZAR!")
-    elif success_count >= len(results) * 0.8:
+    elif success_count >= total * 0.8:
         print("   GPT funciona bem na maioria dos casos")
     else:
         print("   Ajustes podem ser necessários no prompt do sistema")
 
 
-if __name__ == "__main__":
-    if not API_KEY:
-        print("❌ OPENAI_API_KEY não encontrada no .env")
-        exit(1)
+def describe(options: dict) -> str:
+    return "".join(f" / {name}" for name, enabled in options.items() if enabled)
+
+
+def pending_scenarios(paths, log: ResultLog, resume: bool):
+    """Gerador (índice, cenário) dos cenários ainda sem resultado no log"""
+    done = log.completed_ids() if resume else set()
+    for i, scenario in enumerate(iter_scenarios(paths), 1):
+        if scenario["id"] not in done:
+            yield i, scenario
+
+
+def run_tests(options: dict = None, paths=DEFAULT_SCENARIOS, results_path: str = DEFAULT_RESULTS,
+              resume: bool = False):
+    """
+    Executa os cenários (sequencial, uma chamada por vez), gravando cada resultado
+    no log assim que sai. `options` vai direto para call_gpt_for_edit (multi, prune).
+    """
+    options = options or {}
+    total = count_scenarios(paths)
+    with ResultLog(results_path, resume) as log:
+        pending = sum(1 for _ in pending_scenarios(paths, log, resume)) if resume else total
+        print_header("sequencial" + describe(options), total, pending)
+        
+        start = time.perf_counter()
+        for i, scenario in pending_scenarios(paths, log, resume):
+            try:
+                with span("scenario", "flow", id=scenario["id"]):
+                    change = edit_instruction(scenario["instruction"], **options)
+            except Exception as e:
+                log.append(report_scenario(i, total, scenario, error=e))
+                continue
+            log.append(report_scenario(i, total, scenario, change))
+        
+        print_summary(log, time.perf_counter() - start)
+
+
+async def run_pool(scenarios, concurrency: int, options: dict, on_done):
+    """
+    `concurrency` workers consomem o mesmo iterador de cenários, reaproveitando as
+    conexões de um único AsyncChatClient. on_done(i, scenario, change, error) é
+    chamado na ordem do corpus: resultados que terminam antes da vez ficam num
+    buffer até o prefixo contíguo sair. Em execução + no buffer há no máximo
+    2 × `concurrency` cenários (um cenário lento segura o resto só até esse limite).
+    """
+    import asyncio
+    from prompt_edit.client import AsyncChatClient
+    
+    # Admissão por RPM/TPM: evita rajadas de 429 quando a concorrência passa do limite da conta
+    limiter = RateLimiter(estimator=get_planner().estimator)
+    
+    async with AsyncChatClient(api_key=os.getenv("OPENAI_API_KEY"), timeout=TIMEOUT, max_connections=concurrency,
+                               limiter=limiter) as client:
+        window = asyncio.Semaphore(2 * concurrency)
+        items = enumerate(scenarios)
+        finished = {}
+        next_seq = 0
+        
+        def flush():
+            nonlocal next_seq
+            while next_seq in finished:
+                on_done(*finished.pop(next_seq))
+                next_seq += 1
+                window.release()
+        
+        async def worker():
+            while True:
+                await window.acquire()
+                item = next(items, None)
+                if item is None:
+                    window.release()
+                    return
+                seq, (i, scenario) = item
+                try:
+                    with span("scenario", "flow", id=scenario["id"]):
+                        change = await edit_instruction_async(client, scenario["instruction"], **options)
+                    finished[seq] = (i, scenario, change, None)
+                except Exception as e:
+                    finished[seq] = (i, scenario, None, e)
+                flush()
+        
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+    
+    for model, stats in limiter.stats().items():
+        print(f"Rate limit {model}: {stats['admitted']} admitidas, {stats['throttled_429']} × 429, "
+              f"{stats['waited_s']}s em espera (RPM {stats['rpm_limit']:.0f}, TPM {stats['tpm_limit']:.0f})")
+
+
+def run_tests_async(concurrency: int = DEFAULT_CONCURRENCY, options: dict = None, paths=DEFAULT_SCENARIOS,
+                    results_path: str = DEFAULT_RESULTS, resume: bool = False):
+    """
+    Executa os cenários em paralelo (asyncio). O tempo total fica próximo de
+    (requisição mais lenta) × N/concurrency em vez da soma de todas.
+    Os resultados são impressos e gravados na ordem do corpus, como no modo sequencial.
+    """
+    options = options or {}
+    total = count_scenarios(paths)
+    with ResultLog(results_path, resume) as log:
+        pending = sum(1 for _ in pending_scenarios(paths, log, resume)) if resume else total
+        print_header(f"assíncrono (concorrência {concurrency})" + describe(options), total, pending)
+        
+        def on_done(i, scenario, change, error):
+            log.append(report_scenario(i, total, scenario, change, error))
+        
+        import asyncio
+        start = time.perf_counter()
+        asyncio.run(run_pool(pending_scenarios(paths, log, resume), concurrency, options, on_done))
+        print_summary(log, time.perf_counter() - start)
+
+
+def record_run(results_path: str, options: dict, concurrency: int) -> int:
+    """
+    Grava a rodada no histórico de rodadas (PROMPT_EDIT_RUNS_DB, padrão out/runs.sqlite):
+    uma amostra por cenário do log, separando caminho rápido local e chamadas ao modelo.
+    """
+    strategy = ("multi" if options.get("multi") else "single") + ("_prune" if options.get("prune") else "")
+    tags = {"model": MODEL, "document": f"{len(MASTER_PROMPT) // 1000}k", "document_chars": len(MASTER_PROMPT),
+            "concurrency": concurrency}
     
-    run_tests()
+    def samples():
+        for r in iter_results(results_path):
+            change = r.get("change") or {}
+            usage = change.get("usage") or {}
+            yield sample(**tags, strategy="fast_path" if change.get("fast_path") else strategy, ok="change" in r,
+                         latency_s=change.get("latency_s"), prompt_tokens=usage.get("prompt_tokens"),
+                         completion_tokens=usage.get("completion_tokens"), cached_tokens=cached_tokens(usage),
+                         valid=r["success"])
+    
+    store = RunStore.from_env()
+    try:
+        return store.record("scenarios", samples(), meta={"base_url": os.getenv("OPENAI_BASE_URL", ""),
+                                                          "fast_path": get_fast_path().enabled, **options})
+    finally:
+        store.close()
+
+
+def build_batch(batch_path: str, options: dict = None, paths=DEFAULT_SCENARIOS) -> list:
+    """
+    Compila o corpus em requisições da Batch API (custom_id = id do cenário + hash do
+    payload). Passa pelo mesmo pré-envio das rodadas síncronas: recusados ficam de fora.
+    """
+    from prompt_edit.batch import write_batch
+    
+    options = options or {}
+    planner = get_planner()
+    
+    def items():
+        for scenario in iter_scenarios(paths):
+            try:
+                payload, _ = prepare_edit_request(scenario["instruction"], **options)
+            except BudgetExceeded as e:
+                print(f"   💰 {scenario['id']}: {e}")
+                continue
+            yield scenario["id"], payload
+    
+    parts = write_batch(items(), batch_path)
+    for path, count in parts:
+        print(f"📦 {count} requisições em {path}")
+    if planner.downscoped or planner.refused:
+        print(f"💰 Pré-envio: {planner.downscoped} podados para caber no orçamento, {planner.refused} recusados")
+    return parts
+
+
+def ingest_batch(output_paths, paths=DEFAULT_SCENARIOS, results_path: str = DEFAULT_RESULTS,
+                 resume: bool = False):
+    """
+    Pontua, em streaming, os arquivos de saída da Batch API como se fossem respostas
+    síncronas: report_scenario + log de resultados + resumo. Respostas repetidas (lote
+    reenviado) contam uma vez; com `resume`, cenários já no log são pulados.
+    """
+    from prompt_edit.batch import iter_output
+    
+    scenarios = {s["id"]: (i, s) for i, s in enumerate(iter_scenarios(paths), 1)}
+    total = len(scenarios)
+    with ResultLog(results_path, resume) as log:
+        done = log.completed_ids() if resume else set()
+        print_header(f"Batch API ({', '.join(output_paths)})", total, total - len(done))
+        
+        start = time.perf_counter()
+        unknown = 0
+        for path in output_paths:
+            for outcome in iter_output(path):
+                if outcome.id not in scenarios:
+                    unknown += 1
+                    continue
+                if outcome.id in done:
+                    continue
+                done.add(outcome.id)
+                i, scenario = scenarios[outcome.id]
+                if outcome.result is None:
+                    log.append(report_scenario(i, total, scenario, error=RuntimeError(outcome.error)))
+                    continue
+                try:
+                    change = parse_edit_response(outcome.result)
+                except Exception as e:
+                    log.append(report_scenario(i, total, scenario, error=e))
+                    continue
+                log.append(report_scenario(i, total, scenario, change))
+        
+        if unknown:
+            print(f"\n⚠️ {unknown} respostas sem cenário correspondente no corpus (ignoradas)")
+        missing = total - len(done)
+        if missing:
+            print(f"⚠️ {missing} cenários sem resposta no lote")
+        print_summary(log, time.perf_counter() - start)
+
+
+def rescore(paths=DEFAULT_SCENARIOS, results_path: str = DEFAULT_RESULTS, workers: int = None,
+            chunk_size: int = DEFAULT_CHUNK_SIZE) -> dict:
+    """
+    Reavalia offline (sem API) as respostas já gravadas no log, com as expectativas
+    atuais do corpus: apply_changes, diff de preservação e checagens em paralelo.
+    """
+    expectations = {s["id"]: (s["expected_action"], s["expected_section"]) for s in iter_scenarios(paths)}
+    
+    def records():
+        for r in iter_results(results_path):
+            if "change" in r and r.get("id") in expectations:
+                action, section = expectations[r["id"]]
+                yield {"id": r["id"], "change": r["change"], "expected_action": action, "expected_section": section}
+    
+    report = reevaluate(MASTER_PROMPT, records(), workers, chunk_size)
+    n = report["records"]
+    print(f"🔁 Reavaliados {n} registros de {results_path} em {report['elapsed_s']}s "
+          f"({report['records_per_sec']}/s, {report['workers']} processos, blocos de {report['chunk_size']})")
+    print(f"✅ Sucesso: {report['success']}/{n} (ação {report['action_ok']}, seção {report['section_ok']}, "
+          f"erros ao aplicar {report['apply_errors']})")
+    print(f"🧩 Preservação: {report['preservation_ratio']:.2%} das linhas, {report['clean']}/{n} edições limpas "
+          f"(perdas inesperadas {report['unexpected_losses']}, inserções inesperadas {report['unexpected_insertions']})")
+    for failure in report["failures"][:10]:
+        print(f"   ❌ {failure}")
+    return report
+
+
+def replay_session(results_path: str = DEFAULT_RESULTS, history_path: str = None) -> Document:
+    """
+    Aplica, em sequência, todas as mudanças gravadas no log a UM documento (como uma
+    sessão longa de edição na UI), na piece table: sem cópia do texto por edição.
+    Cada versão vai para o histórico (keyframes + deltas; em disco se `history_path`).
+    No fim desfaz tudo e confere que o original volta intacto.
+    """
+    document = Document(MASTER_PROMPT)
+    history = VersionStore(history_path)
+    history.commit(MASTER_PROMPT, "original")
+    start = time.perf_counter()
+    edits = 0
+    for r in iter_results(results_path):
+        if "change" in r:
+            document.apply_changes(as_change_list(r["change"]))
+            history.commit(document.text(), r.get("id", ""))
+            edits += 1
+    elapsed = time.perf_counter() - start
+    stats = document.stats()
+    print(f"🧵 Sessão: {edits} edições em {elapsed * 1000:.1f}ms → {stats['lines']} linhas, "
+          f"{stats['pieces']} peças, {stats['added_lines']} linhas adicionadas, {stats['undo']} passos de undo")
+    kept = history.stats()
+    print(f"🗂️ Histórico: {kept['versions']} versões ({kept['keyframes']} keyframes), "
+          f"{kept['stored_chars']} chars em vez de {kept['full_copy_chars']} ({kept['ratio']}x menor)"
+          + (f" → {history_path}" if history_path else ""))
+    while document.undo():
+        pass
+    print("   ↩️ Undo até o início: " + ("original restaurado" if document.text() == MASTER_PROMPT else "DIVERGENTE"))
+    while document.redo():
+        pass
+    return document
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Cenários de edição de prompt via GPT")
+    parser.add_argument("--async", dest="use_async", action="store_true",
+                        help="Executa os cenários em paralelo com um AsyncClient compartilhado")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY,
+                        help=f"Máximo de requisições simultâneas no modo --async (padrão: {DEFAULT_CONCURRENCY})")
+    parser.add_argument("--multi", action="store_true",
+                        help='Pede {"changes": [...]} e aplica todas as mudanças em uma passada')
+    parser.add_argument("--prune", action="store_true",
+                        help="Envia só as seções relevantes + sumário de headings (compare acerto e tokens com/sem)")
+    parser.add_argument("--no-fast-path", action="store_true",
+                        help="Manda toda instrução ao modelo (sem o caminho rápido local)")
+    parser.add_argument("--scenarios", nargs="+", default=[DEFAULT_SCENARIOS],
+                        help=f"Arquivos JSONL de cenários (padrão: {DEFAULT_SCENARIOS})")
+    parser.add_argument("--results", default=DEFAULT_RESULTS,
+                        help=f"Log JSONL de resultados, gravado a cada cenário (padrão: {DEFAULT_RESULTS})")
+    parser.add_argument("--resume", action="store_true",
+                        help="Continua o log existente, pulando cenários que já têm resultado")
+    parser.add_argument("--rescore", action="store_true",
+                        help="Não chama a API: reavalia o log de --results em paralelo (ProcessPoolExecutor)")
+    parser.add_argument("--session", action="store_true",
+                        help="Não chama a API: aplica todas as mudanças do log em sequência a um documento (com undo)")
+    parser.add_argument("--history",
+                        help="Com --session: grava cada versão em um histórico gzip (keyframes + deltas)")
+    parser.add_argument("--batch-build", metavar="PATH",
+                        help="Não chama a API: grava as requisições do corpus em JSONL da Batch API")
+    parser.add_argument("--batch-ingest", metavar="PATH", nargs="+",
+                        help="Não chama a API: pontua arquivo(s) de saída da Batch API e grava em --results")
+    parser.add_argument("--workers", type=int, help="Processos do --rescore (padrão: núcleos da máquina)")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE,
+                        help=f"Registros por bloco enviado a cada processo (padrão: {DEFAULT_CHUNK_SIZE})")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    from dotenv import load_dotenv
+    load_dotenv()
+    args = parse_args(argv)
+    # PROMPT_EDIT_TRACE=out/trace.json / PROMPT_EDIT_PROFILE=1: spans por fase + cProfile das fases locais
+    profiling.configure_from_env()
+    if args.rescore:
+        rescore(args.scenarios, args.results, args.workers, args.chunk_size)
+        return 0
+    if args.session:
+        replay_session(args.results, args.history)
+        return 0
+    if args.batch_build:
+        build_batch(args.batch_build, {"multi": args.multi, "prune": args.prune}, args.scenarios)
+        return 0
+    if args.batch_ingest:
+        ingest_batch(args.batch_ingest, args.scenarios, args.results, args.resume)
+        return 0
+    
+    from prompt_edit.client import requires_api_key
+    if not os.getenv("OPENAI_API_KEY") and requires_api_key():
+        print("❌ OPENAI_API_KEY não encontrada no .env (ou aponte OPENAI_BASE_URL para o mock local)")
+        return 1
+    
+    if args.no_fast_path:
+        get_fast_path().enabled = False
+    options = {"multi": args.multi, "prune": args.prune}
+    corpus = {"paths": args.scenarios, "results_path": args.results, "resume": args.resume}
+    if args.use_async:
+        run_tests_async(max(1, args.concurrency), options, **corpus)
+    else:
+        run_tests(options, **corpus)
+    run_id = record_run(args.results, options, max(1, args.concurrency) if args.use_async else 1)
+    if run_id:
+        print(f"🗄️ Rodada {run_id} no histórico (python -m prompt_edit runs compare)")
+    planner = get_planner()
+    if planner.downscoped or planner.refused:
+        print(f"💰 Pré-envio: {planner.downscoped} podados para caber no orçamento, {planner.refused} recusados")
+    fast = get_fast_path().stats()
+    if fast["handled"]:
+        print(f"⚡ Regras do caminho rápido: " + ", ".join(f"{rule} {n}" for rule, n in sorted(fast["rules"].items())))
+    planner.estimator.save()  # calibração aprendida com o usage desta rodada
+    profiling.finish()
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,11 @@
+import os
+
+import pytest
+
+FIXTURES = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, "tests", "fixtures")
+
+
+@pytest.fixture(scope="session")
+def master_prompt() -> str:
+    with open(os.path.join(FIXTURES, "master_prompt.txt"), "r", encoding="utf-8") as f:
+        return f.read()
@@ -0,0 +1,50 @@
+"""Arquivos da Batch API: custom_id estável, divisão em partes e ida e volta pelo mock."""
+import json
+import os
+
+from prompt_edit.batch import custom_id, item_id, iter_output, run_local, write_batch
+from prompt_edit.mockserver import MockBackend, load_rules
+
+FIXTURES = os.path.join(os.path.dirname(__file__), os.pardir, os.pardir, "tests", "fixtures")
+
+
+def payload(content: str) -> dict:
+    return {"model": "gpt-x", "messages": [{"role": "user", "content": content}]}
+
+
+def test_custom_id_is_stable_and_tracks_the_payload():
+    first = custom_id("cenario|1", payload("a"))
+    assert first == custom_id("cenario|1", payload("a"))
+    assert first != custom_id("cenario|1", payload("b"))
+    assert item_id(first) == "cenario|1"
+
+
+def test_write_batch_splits_and_deduplicates(tmp_path):
+    path = str(tmp_path / "input.jsonl")
+    items = [("a", payload("1")), ("b", payload("2")), ("a", payload("1")), ("c", payload("3"))]
+    parts = write_batch(iter(items), path, max_requests=2)
+    assert [(os.path.basename(p), n) for p, n in parts] == [("input.jsonl", 2), ("input.part2.jsonl", 1)]
+    with open(parts[1][0], encoding="utf-8") as f:
+        line = json.loads(f.readline())
+    assert line["url"] == "/v1/chat/completions" and item_id(line["custom_id"]) == "c"
+
+
+def test_local_run_round_trips_through_iter_output(tmp_path):
+    source, output = str(tmp_path / "input.jsonl"), str(tmp_path / "output.jsonl")
+    items = [("telegram", payload("Adicione suporte a Telegram")), ("livre", payload("oi"))]
+    write_batch(items, source)
+    backend = MockBackend(profile="instant", rules=load_rules(os.path.join(FIXTURES, "mock_responses.jsonl")))
+    assert run_local(source, output, backend) == 2
+
+    outcomes = {outcome.id: outcome for outcome in iter_output(output)}
+    assert set(outcomes) == {"telegram", "livre"}
+    assert json.loads(outcomes["telegram"].result.content)["lineToAdd"] == "* Telegram"
+    assert outcomes["livre"].status == 200 and outcomes["livre"].result.content == "ok"
+
+
+def test_failed_lines_become_errors(tmp_path):
+    output = tmp_path / "output.jsonl"
+    output.write_text(json.dumps({"custom_id": "x|abc", "response": {"status_code": 429, "body": {
+        "error": {"message": "Rate limit"}}}, "error": None}) + "\n", encoding="utf-8")
+    (outcome,) = iter_output(str(output))
+    assert outcome.result is None and outcome.error == "Rate limit" and outcome.id == "x"
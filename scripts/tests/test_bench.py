@@ -0,0 +1,25 @@
+"""Benchmark estatístico: respostas malformadas contam como amostras com falha."""
+import json
+
+from prompt_edit.bench import measure, run_benchmark
+
+DOCUMENT = "# Agente\n## Regras\n* Sem spam"
+LINE = "* Sempre cumprimente"
+GOOD = {"choices": [{"message": {"content": json.dumps({"section": "Regras", "lineToAdd": LINE})}}],
+        "usage": {"prompt_tokens": 10, "completion_tokens": 5}}
+
+
+def test_malformed_response_is_a_failed_sample():
+    for data in ({}, {"choices": []}, None):
+        sample = measure(lambda payload: data, {}, DOCUMENT, LINE)
+        assert not sample["ok"] and sample["error"]
+    assert measure(lambda payload: GOOD, {}, DOCUMENT, LINE)["target_hit"]
+
+
+def test_benchmark_survives_bad_responses():
+    responses = iter([GOOD, {"choices": []}, GOOD, GOOD])
+    report = run_benchmark(lambda payload: next(responses), ["m"], {"json": lambda model, doc: {"model": model}},
+                           {"doc": DOCUMENT}, LINE, repetitions=3, warmup=1)
+    (row,) = report["results"]
+    assert (row["samples"], row["errors"]) == (3, 1)
+    assert row["target_hit_rate"] == round(2 / 3, 4)
@@ -0,0 +1,54 @@
+"""Cache de respostas por conteúdo: chave, record/replay e despejo LRU."""
+import pytest
+
+from prompt_edit.cache import CacheMiss, ResponseCache, cache_key
+
+PAYLOAD = {"model": "gpt-x", "messages": [{"role": "user", "content": "oi"}], "temperature": 0}
+
+
+def test_cache_key_ignores_transport_fields():
+    assert cache_key(PAYLOAD) == cache_key({**PAYLOAD, "stream": True, "prompt_cache_key": "abc"})
+    assert cache_key(PAYLOAD) != cache_key({**PAYLOAD, "temperature": 1})
+
+
+def test_record_then_replay(tmp_path):
+    calls = []
+
+    def send(payload):
+        calls.append(payload)
+        return {"choices": [{"message": {"content": "olá"}}]}
+
+    recorder = ResponseCache(str(tmp_path), "record")
+    assert recorder.fetch(PAYLOAD, send) == send(PAYLOAD)
+
+    replay = ResponseCache(str(tmp_path), "replay")
+    assert replay.fetch(PAYLOAD, lambda payload: pytest.fail("replay não chama a API")) == send(PAYLOAD)
+    with pytest.raises(CacheMiss):
+        replay.fetch({**PAYLOAD, "model": "outro"}, send)
+    assert (replay.hits, replay.misses) == (1, 1)
+
+
+def test_eviction_keeps_recently_used(tmp_path):
+    cache = ResponseCache(str(tmp_path), "record", max_bytes=250)
+    payloads = [{**PAYLOAD, "model": f"m{i}"} for i in range(3)]
+    data = {"content": "x" * 100}
+    cache.put(payloads[0], data)
+    cache.put(payloads[1], data)
+    cache.get(payloads[0])
+    cache.put(payloads[2], data)
+    fresh = ResponseCache(str(tmp_path), "replay")
+    assert fresh.get(payloads[0]) == data and fresh.get(payloads[2]) == data
+    assert fresh.get(payloads[1]) is None
+
+
+def test_memory_tier_respects_max_bytes(tmp_path):
+    cache = ResponseCache(str(tmp_path), "record", max_bytes=250)
+    payloads = [{**PAYLOAD, "model": f"m{i}"} for i in range(3)]
+    data = {"content": "x" * 100}
+    for payload in payloads:
+        cache.put(payload, data)
+        cache.get(payloads[0])
+    assert cache._memory_bytes <= 250 and len(cache._memory) == 2
+    # A mesma instância não serve da memória o que o disco já despejou
+    assert cache.get(payloads[1]) is None
+    assert cache.get(payloads[0]) == data and cache.get(payloads[2]) == data
@@ -0,0 +1,36 @@
+"""CLI única: subcomandos importados sob demanda e scripts sem efeitos no import."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from prompt_edit.cli import COMMANDS, main
+
+SCRIPTS = os.path.join(os.path.dirname(__file__), os.pardir)
+
+
+def run_python(code: str, cwd: str = None, **env) -> subprocess.CompletedProcess:
+    environment = {**os.environ, "PYTHONPATH": os.path.abspath(SCRIPTS), **env}
+    return subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, env=environment,
+                          cwd=cwd or os.path.abspath(os.path.join(SCRIPTS, os.pardir)), timeout=60)
+
+
+def test_help_lists_commands_without_loading_them(capsys):
+    assert main(["--help"]) == 0
+    out = capsys.readouterr().out
+    assert all(name in out for name in COMMANDS)
+    assert main(["nao-existe"]) == 2
+
+
+def test_importing_the_cli_does_not_load_http_clients():
+    done = run_python("import sys, prompt_edit.cli; print(sorted({'httpx', 'dotenv'} & set(sys.modules)))")
+    assert done.returncode == 0, done.stderr
+    assert done.stdout.strip() == "[]"
+
+
+@pytest.mark.parametrize("name", sorted(COMMANDS))
+def test_command_modules_import_without_side_effects(name, tmp_path):
+    done = run_python(f"import {COMMANDS[name][0]}", cwd=str(tmp_path), OPENAI_API_KEY="")
+    assert done.returncode == 0, done.stderr
+    assert done.stdout == "" and os.listdir(tmp_path) == []  # nada de .env, out/ ou prints no import
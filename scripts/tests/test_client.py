@@ -0,0 +1,88 @@
+"""ChatClient contra o mockserver em processo (sem rede)."""
+import json
+
+import httpx
+import pytest
+
+from prompt_edit.cache import CacheMiss, ResponseCache
+from prompt_edit.client import ChatClient
+from prompt_edit.mockserver import MockServer
+
+
+def test_stream_retry_resends_original_payload():
+    server = MockServer(profile="instant")
+    backend = server.backend
+    bodies, admit = [], backend.admit
+
+    def admit_once_429(model, tokens):
+        if backend.requests == 1:
+            return 429, {"retry-after": "0"}
+        return admit(model, tokens)
+
+    respond = backend.respond
+
+    def recording_respond(payload):
+        bodies.append(payload)
+        return respond(payload)
+
+    backend.admit = admit_once_429
+    backend.respond = recording_respond
+    payload = {"model": "gpt-4o", "messages": [{"role": "user", "content": "diga ok"}]}
+    with server as base_url, ChatClient(api_key="x", base_url=base_url, backoff_max=0.05) as client:
+        result, metrics = client.stream(payload)
+
+    assert result.attempts == 2
+    assert result.content == "ok"
+    assert len(bodies) == 2
+    assert bodies[1] == bodies[0]
+    assert bodies[1]["messages"] == payload["messages"]
+    assert "error" not in json.dumps(bodies[1])
+
+
+class DropAfterFirstChunk(httpx.SyncByteStream):
+    """Stream SSE que cai (ReadError) depois do primeiro delta"""
+
+    def __iter__(self):
+        event = {"choices": [{"index": 0, "delta": {"content": "Olá"}}]}
+        yield f"data: {json.dumps(event)}\n\n".encode()
+        raise httpx.ReadError("conexão caiu")
+
+
+def test_stream_is_not_retried_after_deltas_were_delivered():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(200, headers={"content-type": "text/event-stream"}, stream=DropAfterFirstChunk())
+
+    client = ChatClient(api_key="x", base_url="http://mock/v1", backoff_max=0.01)
+    client._http = httpx.Client(base_url=client.base_url, transport=httpx.MockTransport(handler))
+    deltas = []
+    with client, pytest.raises(httpx.ReadError):
+        client.stream({"model": "gpt-4o", "messages": []}, on_delta=lambda delta, parts: deltas.append(delta))
+    assert deltas == ["Olá"] and len(calls) == 1
+
+    # Sem on_delta nada chegou ao chamador: o retry continua valendo
+    calls.clear()
+    client._http = httpx.Client(base_url=client.base_url, transport=httpx.MockTransport(handler))
+    with client, pytest.raises(httpx.ReadError):
+        client.stream({"model": "gpt-4o", "messages": []})
+    assert len(calls) == client.retry.max_retries + 1
+
+
+def test_stream_records_and_replays_through_the_cache(tmp_path):
+    payload = {"model": "gpt-4o", "messages": [{"role": "user", "content": "diga ok"}]}
+    with MockServer(profile="instant") as base_url, \
+            ChatClient(api_key="x", base_url=base_url, cache=ResponseCache(str(tmp_path), "record")) as client:
+        recorded, _ = client.stream(payload)
+
+    # Replay: servidor inexistente, nada pode ir para a rede
+    replay = ResponseCache(str(tmp_path), "replay")
+    deltas = []
+    with ChatClient(api_key="", base_url="http://127.0.0.1:9/v1", cache=replay) as client:
+        result, metrics = client.stream(payload, on_delta=lambda delta, parts: deltas.append(delta))
+        with pytest.raises(CacheMiss):
+            client.stream({**payload, "model": "outro"})
+    assert result.cached and result.content == recorded.content == "ok"
+    assert deltas == ["ok"] and metrics.chunks == 1
+    assert replay.hits == 1
@@ -0,0 +1,39 @@
+"""Log de resultados: retomada e registros de erro."""
+import json
+
+from prompt_edit.corpus import ResultLog, iter_results
+
+
+def write_log(path, records):
+    path.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+
+
+def test_resume_retries_errored_scenarios(tmp_path):
+    path = tmp_path / "results.jsonl"
+    write_log(path, [
+        {"id": "a", "success": True, "change": {"section": "x"}},
+        {"id": "b", "success": False, "error": "HTTP 429"},
+        {"id": "c", "success": False, "change": {"section": "y"}},
+    ])
+    with ResultLog(str(path), resume=True) as log:
+        assert log.completed_ids() == {"a", "c"}
+        log.append({"id": "b", "success": True, "change": {"section": "z"}})
+    records = list(iter_results(str(path)))
+    assert [r["id"] for r in records] == ["a", "c", "b"]
+    assert all("error" not in r for r in records)
+
+
+def test_resume_after_truncated_line(tmp_path):
+    path = tmp_path / "results.jsonl"
+    path.write_text(json.dumps({"id": "a", "change": {}}) + "\n" + '{"id": "b", "cha', encoding="utf-8")
+    with ResultLog(str(path), resume=True) as log:
+        assert log.completed_ids() == {"a"}
+        log.append({"id": "b", "change": {}})
+    assert [r["id"] for r in iter_results(str(path))] == ["a", "b"]
+
+
+def test_fresh_log_truncates(tmp_path):
+    path = tmp_path / "results.jsonl"
+    write_log(path, [{"id": "a", "change": {}}])
+    with ResultLog(str(path)) as log:
+        assert log.completed_ids() == set()
@@ -0,0 +1,17 @@
+"""Extração do documento inteiro da resposta (estratégia de debug_changes)."""
+from debug_changes import build_payload, extract_document
+from prompt_edit.diff import preservation
+from prompt_edit.mockserver import MockBackend
+
+
+def test_echoed_fixture_round_trips(master_prompt):
+    # O mock devolve o documento intacto: blocos de código internos não podem cortar a extração
+    content = MockBackend(profile="instant").respond(build_payload(master_prompt))["content"]
+    block, updated = extract_document(content + "\n\nPronto!")
+    assert block and updated == master_prompt.strip()
+    report = preservation(master_prompt, updated)
+    assert report.clean and report.preservation_ratio == 1.0
+
+
+def test_missing_block():
+    assert extract_document("sem bloco") == ("", "")
@@ -0,0 +1,53 @@
+"""Diff por hash de linha: opcodes no formato do difflib e análise de preservação."""
+import difflib
+import random
+
+from prompt_edit.diff import opcodes, preservation, unified_diff
+
+
+def rebuild(a: list, b: list, codes: list) -> list:
+    out = []
+    for tag, i1, i2, j1, j2 in codes:
+        out.extend(a[i1:i2] if tag == "equal" else b[j1:j2])
+    return out
+
+
+def test_opcodes_cover_both_sides_and_rebuild_target():
+    rng = random.Random(3)
+    vocabulary = [f"linha {i}" for i in range(12)] + ["", "```"]
+    for _ in range(200):
+        a = [rng.choice(vocabulary) for _ in range(rng.randint(0, 30))]
+        b = [rng.choice(vocabulary) for _ in range(rng.randint(0, 30))]
+        codes = opcodes(a, b)
+        assert rebuild(a, b, codes) == b
+        for tag, i1, i2, j1, j2 in codes:
+            if tag == "equal":
+                assert a[i1:i2] == b[j1:j2]
+        if codes:
+            assert codes[0][1] == codes[0][3] == 0
+            assert codes[-1][2] == len(a) and codes[-1][4] == len(b)
+
+
+def test_unified_diff_matches_difflib_on_simple_edit(master_prompt):
+    a = master_prompt.split("\n")
+    b = a[:10] + ["* linha nova"] + a[10:]
+    ours = unified_diff(a, b)
+    reference = "".join(line if line.endswith("\n") else line + "\n" for line in difflib.unified_diff(
+        a, b, "original", "atualizado", lineterm=""))
+    assert ours == reference
+    assert unified_diff(a, a) == ""
+
+
+def test_preservation_classifies_changes(master_prompt):
+    lines = master_prompt.split("\n")
+    expected = "* Sempre memorize o nome do cliente."
+    updated = lines[:5] + [expected, "* intrusa"] + lines[5:-1] + [lines[-1] + "  "]
+    report = preservation(master_prompt, "\n".join(updated), [expected])
+    assert [line.strip() for line in report.expected_insertions] == [expected]
+    assert [line.strip() for line in report.unexpected_insertions] == ["* intrusa"]
+    assert not report.unexpected_losses and not report.clean
+
+    i = next(i for i, line in enumerate(lines) if line.startswith("* "))
+    removed = preservation(master_prompt, "\n".join(lines[:i] + lines[i + 1:]))
+    assert [line.strip() for line in removed.unexpected_losses] == [lines[i].strip()]
+    assert preservation(master_prompt, master_prompt).clean
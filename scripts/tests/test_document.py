@@ -0,0 +1,70 @@
+"""Document (piece table) contra o caminho de texto de edits.apply_changes."""
+import random
+
+from prompt_edit.document import Document
+from prompt_edit.edits import apply_changes
+from prompt_edit.outline import outline_for
+
+FENCED = "\n".join([
+    "# Prompt",
+    "## A",
+    "texto de A",
+    "```",
+    "## B",
+    "```",
+    "## C",
+    "texto de C",
+])
+
+
+def titles(sections) -> list:
+    return [(s.title, s.line, s.body_end_line, s.end_line) for s in sections]
+
+
+def assert_same(document: Document):
+    assert titles(document.sections()) == titles(outline_for(document.text()).sections)
+
+
+def test_removing_a_fence_line_reclassifies_headings():
+    changes = [{"section": "A", "lineToAdd": "", "position": "replace", "target": "```"}]
+    document = Document(FENCED).apply_changes(changes)
+    assert document.text() == apply_changes(FENCED, changes)
+    # Sem a cerca de abertura, a de fechamento passa a abrir um bloco que engole "## C"
+    assert [s.title for s in document.sections()] == ["Prompt", "A", "B"]
+    assert_same(document)
+
+
+def test_replacing_a_line_with_a_fence_hides_headings_below():
+    changes = [{"section": "A", "lineToAdd": "```", "position": "replace", "target": "texto de A"}]
+    document = Document(FENCED).apply_changes(changes)
+    assert document.text() == apply_changes(FENCED, changes)
+    assert [s.title for s in document.sections()] == ["Prompt", "A", "B"]
+    assert_same(document)
+
+
+def test_undo_and_redo_restore_sections():
+    document = Document(FENCED)
+    before = titles(document.sections())
+    document.delete_lines(3, 4)
+    after = titles(document.sections())
+    assert after != before
+    assert document.undo() and titles(document.sections()) == before
+    assert document.redo() and titles(document.sections()) == after
+    assert not document.redo()
+
+
+def test_random_edits_match_text_path(master_prompt):
+    rng = random.Random(7)
+    labels = [s.title for s in outline_for(master_prompt).sections] + ["Seção nova"]
+    document, text = Document(master_prompt), master_prompt
+    for step in range(40):
+        label = rng.choice(labels)
+        position = rng.choice(["before", "after", "replace"])
+        line = rng.choice([f"* item {step}", "```", f"## Extra {step}", ""])
+        change = {"section": label, "lineToAdd": line, "position": position}
+        if rng.random() < 0.3:
+            change["edge"] = rng.choice(["start", "end"])
+        document.apply_changes([change])
+        text = apply_changes(text, [change])
+        assert document.text() == text
+        assert_same(document)
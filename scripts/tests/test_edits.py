@@ -0,0 +1,53 @@
+"""Schema de múltiplas mudanças e regras de conflito de edits.apply_changes."""
+from prompt_edit.edits import CHANGE_SCHEMA, CHANGES_SCHEMA, apply_changes, as_change_list, response_format
+
+DOCUMENT = "\n".join([
+    "# Agente",
+    "## Comportamento",
+    "* Seja educado",
+    "## Regras",
+    "* Sem spam",
+])
+
+
+def change(section: str, text: str, position: str = "after") -> dict:
+    return {"section": section, "lineToAdd": text, "position": position, "explanation": ""}
+
+
+def test_response_format_single_and_multi():
+    single, multi = response_format(), response_format(multi=True)
+    assert single["json_schema"]["name"] == "PromptEditChange"
+    assert single["json_schema"]["schema"] is CHANGE_SCHEMA and single["json_schema"]["strict"]
+    assert multi["json_schema"]["name"] == "PromptEditChanges"
+    assert multi["json_schema"]["schema"] is CHANGES_SCHEMA
+    assert CHANGES_SCHEMA["properties"]["changes"]["items"] is CHANGE_SCHEMA
+
+
+def test_as_change_list_accepts_both_shapes():
+    one = change("Regras", "* x")
+    assert as_change_list(one) == [one]
+    assert as_change_list({"changes": [one, one]}) == [one, one]
+
+
+def test_inserts_keep_order_without_duplicates():
+    updated = apply_changes(DOCUMENT, [change("Regras", "* a"), change("Regras", "* b"), change("Regras", "* a")])
+    assert updated.split("\n")[3:] == ["## Regras", "* Sem spam", "* a", "* b"]
+
+
+def test_last_replace_wins_and_inserts_survive():
+    updated = apply_changes(DOCUMENT, [
+        change("Comportamento", "## Postura", "replace"),
+        change("Comportamento", "* antes", "before"),
+        change("Comportamento", "## Conduta", "replace"),
+        change("Comportamento", "* depois"),
+    ])
+    assert updated.split("\n")[:5] == ["# Agente", "* antes", "## Conduta", "* Seja educado", "* depois"]
+
+
+def test_missing_sections_become_one_block_per_label():
+    updated = apply_changes(DOCUMENT, [
+        change("Proibições", "* a"), change("Comportamento", "* b"), change("Proibições", "* c"),
+        change("Extras", "* d"), change("Proibições", "* e", "before"),
+    ])
+    assert updated.endswith("* Sem spam\n\n## Proibições\n* a\n* c\n\n## Extras\n* d")
+    assert "* Seja educado\n* b\n## Regras" in updated
@@ -0,0 +1,94 @@
+"""Regras do caminho rápido e posição das inserções (edits.plan_changes)."""
+from prompt_edit.document import Document
+from prompt_edit.edits import apply_changes
+from prompt_edit.fastpath import FastPath
+from prompt_edit.synth import generate
+from test_edit_scenarios import MASTER_PROMPT
+
+SECTION = "## 3) Tecnologias padrão"
+LINE = "* Sempre memorize o nome do cliente durante a conversa."
+
+
+def section_body(text: str) -> list:
+    lines = text.split("\n")
+    start = lines.index(SECTION) + 1
+    end = next(i for i in range(start, len(lines)) if lines[i].startswith("## "))
+    return [line for line in lines[start:end] if line.strip()]
+
+
+def test_add_line_at_end_of_section(master_prompt):
+    edit = FastPath(master_prompt).parse(f'TAREFA: Adicione esta linha ao final da seção "{SECTION}":\n{LINE}')
+    assert edit.rule == "add_line" and edit.changes[0]["edge"] == "end"
+    updated = apply_changes(master_prompt, edit.changes)
+    assert section_body(updated)[-1] == LINE
+    assert section_body(updated)[:-1] == section_body(master_prompt)
+
+
+def test_add_line_at_start_of_section(master_prompt):
+    edit = FastPath(master_prompt).parse(f'Adicione esta linha ao início da seção "{SECTION}": {LINE}')
+    updated = apply_changes(master_prompt, edit.changes)
+    assert section_body(updated)[0] == LINE
+    assert section_body(updated)[1:] == section_body(master_prompt)
+
+
+def test_document_applies_edges_like_text(master_prompt):
+    fast = FastPath(master_prompt)
+    for instruction in (f'Adicione ao final da seção "{SECTION}" a linha: {LINE}',
+                        f'Adicione esta linha no início da seção "{SECTION}": {LINE}'):
+        changes = fast.parse(instruction).changes
+        assert Document(master_prompt).apply_changes(changes).text() == apply_changes(master_prompt, changes)
+
+
+def test_remove_quoted_line(master_prompt):
+    testes = next(line for line in master_prompt.split("\n") if line.startswith("* **Testes**"))
+    edit = FastPath(master_prompt).parse(f'Remova a linha "{testes}"')
+    assert edit.rule == "remove_line" and edit.confidence == 1.0
+    updated = apply_changes(master_prompt, edit.changes)
+    assert testes not in updated
+    assert len(updated.split("\n")) == len(master_prompt.split("\n")) - 1
+    assert Document(master_prompt).apply_changes(edit.changes).text() == updated
+
+
+def test_ambiguous_term_is_below_threshold(master_prompt):
+    # "Tailwind" aparece em mais de uma linha: a regra não decide sozinha
+    assert FastPath(master_prompt).edit("Mude Tailwind para UnoCSS") is None
+
+
+def test_low_confidence_goes_to_model(master_prompt):
+    fast = FastPath(master_prompt, min_confidence=0.99)
+    assert fast.edit("Melhore o tom das respostas") is None
+    assert fast.stats()["fallback"] == 1
+
+
+def test_unanchored_term_goes_to_model():
+    # O termo existe no corpo, mas nada na instrução diz que ele é o valor trocado
+    fast = FastPath(MASTER_PROMPT)
+    for instruction in ("Mude a regra de emojis para nunca usar emojis",
+                        "Altere o tom de profissional para descontraído"):
+        assert fast.parse(instruction).confidence < fast.min_confidence
+        assert fast.edit(instruction) is None
+    assert fast.stats()["handled"] == 0
+
+
+def test_anchored_or_quoted_term_is_replaced():
+    fast = FastPath(MASTER_PROMPT)
+    name = fast.edit("Mude o nome do assistente de Lucas para Pedro")
+    assert name.changes[0]["lineToAdd"] == "Você é um assistente de vendas chamado Pedro."
+    tone = fast.edit('Altere o tom de "profissional" para "descontraído"')
+    assert tone.changes[0]["lineToAdd"] == "* Seja sempre educado e descontraído"
+
+
+def test_synth_phrasings_are_handled_locally():
+    doc = generate(30_000, scenarios=9)
+    fast = FastPath(doc.text)
+    for scenario in doc.scenarios:
+        edit = fast.edit(scenario["instruction"])
+        assert edit is not None, scenario["instruction"]
+        updated = apply_changes(doc.text, edit.changes)
+        assert Document(doc.text).apply_changes(edit.changes).text() == updated
+        lines = updated.split("\n")
+        if "replaced_line" in scenario:
+            assert lines.count(scenario["replaced_line"]) == doc.text.split("\n").count(scenario["replaced_line"]) - 1
+        if scenario["target_line"]:
+            assert scenario["target_line"] in lines
+    assert fast.stats()["rules"] == {"add_line": 3, "replace_line": 3, "remove_line": 3}
@@ -0,0 +1,42 @@
+"""hedged_chat com um cliente falso (tempos controlados, sem rede)."""
+import asyncio
+
+import pytest
+
+from prompt_edit.client import ChatResult
+from prompt_edit.hedge import HedgeFailed, hedged_chat
+
+# modelo -> (segundos até responder, sucesso?)
+BEHAVIOUR = {"slow": (0.5, True), "broken": (0.0, False), "fast": (0.02, True)}
+
+
+class FakeClient:
+    async def chat(self, payload, timeout=None):
+        seconds, ok = BEHAVIOUR[payload["model"]]
+        await asyncio.sleep(seconds)
+        if not ok:
+            raise RuntimeError("HTTP 500")
+        return ChatResult(content=payload["model"], usage={}, latency_s=seconds)
+
+
+def run(models, delay):
+    return asyncio.run(hedged_chat(FakeClient(), lambda m: {"model": m}, models, lambda r: r.content, delay))
+
+
+def test_failure_releases_next_model_while_primary_in_flight():
+    result = run(["slow", "broken", "fast"], delay=0.1)
+    assert result.model == "fast"
+    launched = {a.model: a.launched_s for a in result.attempts}
+    # "fast" sai logo depois da falha de "broken" (~0.1s), não no próximo atraso (~0.2s)
+    assert launched["fast"] - launched["broken"] < 0.05
+    assert [a.outcome for a in result.attempts] == ["cancelled", "error", "won"]
+
+
+def test_primary_wins_before_delay():
+    result = run(["fast", "slow"], delay=0.2)
+    assert result.model == "fast" and len(result.attempts) == 1
+
+
+def test_all_failed():
+    with pytest.raises(HedgeFailed):
+        run(["broken", "broken"], delay=1.0)
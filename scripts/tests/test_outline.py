@@ -0,0 +1,92 @@
+"""Outline: headings e spans, resolução de seções e aplicação de mudanças."""
+import random
+
+from prompt_edit.edits import apply_change, apply_changes
+from prompt_edit.outline import Outline
+
+DOCUMENT = "\n".join([
+    "# Agente",
+    "",
+    "## Nova 1",
+    "* item",
+    "",
+    "## 3) Tecnologias padrão",
+    "* Next.js",
+    "",
+    "## 4) Regras gerais",
+    "* Sem spam",
+])
+
+
+def test_sections_and_spans():
+    outline = Outline(DOCUMENT)
+    assert [(s.level, s.title) for s in outline.sections] == [
+        (1, "Agente"), (2, "Nova 1"), (2, "3) Tecnologias padrão"), (2, "4) Regras gerais")]
+    top, tech = outline.sections[0], outline.sections[2]
+    assert [child.title for child in top.children] == ["Nova 1", "3) Tecnologias padrão", "4) Regras gerais"]
+    assert top.body_end_line == 2 and top.end_line == len(outline.lines)
+    assert (tech.line, tech.body_end_line, tech.end_line) == (5, 8, 8)
+    assert outline.body_lines(tech) == ["* Next.js", ""]
+
+
+def test_find_by_normalized_key():
+    outline = Outline(DOCUMENT)
+    assert outline.find("## 3) **Tecnologias** padrão").line == 5
+    assert outline.find("regras gerais").title == "4) Regras gerais"
+    assert outline.find("* Next.js") is None  # linhas do corpo nunca viram seção
+
+
+def test_apply_change_positions():
+    after = apply_change(DOCUMENT, {"section": "Tecnologias padrão", "lineToAdd": "* Vue", "position": "after"})
+    assert after.split("\n")[5:9] == ["## 3) Tecnologias padrão", "* Next.js", "* Vue", ""]
+    before = apply_change(DOCUMENT, {"section": "Regras gerais", "lineToAdd": "---", "position": "before"})
+    assert "* Next.js\n\n---\n## 4) Regras gerais\n" in before
+    missing = {"section": "Proibições", "lineToAdd": "* x", "position": "after"}
+    assert apply_change(DOCUMENT, missing) == DOCUMENT + "\n\n## Proibições\n* x"
+    assert apply_change(DOCUMENT, {**missing, "position": "before"}) == DOCUMENT
+
+
+def test_exact_and_partial_labels():
+    outline = Outline(DOCUMENT)
+    assert outline.match("## 3) **Tecnologias** padrão").method == "exact"
+    match = outline.match("Tecnologias")
+    assert match.section.title == "3) Tecnologias padrão" and match.confidence >= 0.6
+    assert outline.match("Seção 4").section.title == "4) Regras gerais"
+
+
+def test_different_numbers_do_not_fuzzy_match():
+    outline = Outline(DOCUMENT)
+    assert outline.match("Nova 5") is None
+    assert outline.match("5) Regras") is None
+    assert outline.match("4) Regras").section.title == "4) Regras gerais"
+
+
+def test_numbered_new_section_is_appended():
+    updated = apply_changes(DOCUMENT, [{"section": "Nova 5", "lineToAdd": "* x", "position": "after"}])
+    assert updated.endswith("\n\n## Nova 5\n* x")
+    assert updated.startswith(DOCUMENT)
+
+
+def test_headings_inside_fences_are_ignored():
+    outline = Outline("## A\n```\n## B\n```\n## C")
+    assert [s.title for s in outline.sections] == ["A", "C"]
+    assert outline.sections[0].end_line == 4
+
+
+def test_splice_matches_list_model():
+    rng = random.Random(3)
+    for _ in range(200):
+        lines = [f"l{i}" for i in range(rng.randint(1, 8))]
+        inserts = {rng.randint(0, len(lines)): [f"i{k}"] for k in range(rng.randint(0, 3))}
+        replaces = {rng.randrange(1, len(lines)): rng.choice([f"r{k}", None])
+                    for k in range(rng.randint(0, 2)) if len(lines) > 1}
+        expected = []
+        for i, line in enumerate(lines):
+            expected += inserts.get(i, [])
+            if i in replaces:
+                if replaces[i] is not None:
+                    expected.append(replaces[i])
+            else:
+                expected.append(line)
+        expected += inserts.get(len(lines), [])
+        assert Outline("\n".join(lines)).splice(inserts, replaces) == "\n".join(expected)
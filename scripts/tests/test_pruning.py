@@ -0,0 +1,20 @@
+"""Poda de contexto: seções relevantes expandidas, demais só com o heading."""
+from prompt_edit.pruning import prune_document, tokenize
+
+
+def test_tokenize_drops_stopwords_and_accents():
+    assert tokenize("Adicione à seção de Tecnologias o Next.js") == ["tecnologias", "next"]
+
+
+def test_relevant_section_is_expanded(master_prompt):
+    context, info = prune_document(master_prompt, "Adicione UnoCSS às tecnologias padrão do Tailwind")
+    assert info["pruned"] and info["context_chars"] < info["original_chars"]
+    assert "Tecnologias padrão" in info["sections"][0]
+    assert "[…]" in context
+    headings = [line for line in master_prompt.split("\n") if line.startswith("## ")]
+    assert all(heading in context for heading in headings)
+
+
+def test_low_confidence_keeps_whole_document(master_prompt):
+    context, info = prune_document(master_prompt, "xyzzy")
+    assert context == master_prompt and not info["pruned"]
@@ -0,0 +1,41 @@
+"""Token buckets por modelo: espera, sincronização por headers e pausa após 429."""
+from prompt_edit.ratelimit import RateLimiter, TokenBucket, estimate_tokens, parse_reset
+
+
+def payload(model: str = "gpt-x", chars: int = 400) -> dict:
+    return {"model": model, "messages": [{"role": "user", "content": "x" * chars}], "max_tokens": 100}
+
+
+def test_parse_reset_formats():
+    assert parse_reset("6m0s") == 360.0
+    assert parse_reset("20ms") == 0.02
+    assert parse_reset("1.5") == 1.5
+    assert parse_reset("") == 0.0
+
+
+def test_estimate_tokens_counts_messages_and_output():
+    assert estimate_tokens(payload()) == 400 // 4 + 8 + 100
+
+
+def test_bucket_wait_and_refill():
+    bucket = TokenBucket(capacity=10, per_second=2)
+    now = bucket.updated
+    assert bucket.wait_time(10, now) == 0.0
+    bucket.tokens -= 10
+    assert bucket.wait_time(4, now) == 2.0
+    assert bucket.wait_time(4, now + 2.0) == 0.0
+    assert bucket.wait_time(50, now + 5.0) == 0.0  # maior que a capacidade: só espera encher
+
+
+def test_headers_shrink_the_bucket_and_429_pauses_the_model():
+    limiter = RateLimiter(rpm=600, tpm=100_000)
+    limiter.acquire(payload())
+    limiter.observe("gpt-x", {"x-ratelimit-limit-requests": "600", "x-ratelimit-remaining-requests": "0",
+                              "x-ratelimit-reset-requests": "30s"})
+    assert limiter._try_reserve("gpt-x", 10) > 0
+    assert limiter._try_reserve("outro", 10) == 0  # buckets são por modelo
+
+    limiter.penalize("outro", 5.0)
+    assert limiter._try_reserve("outro", 10) > 4.0
+    stats = limiter.stats()
+    assert stats["gpt-x"]["admitted"] == 1 and stats["outro"]["throttled_429"] == 1
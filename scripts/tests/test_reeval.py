@@ -0,0 +1,45 @@
+"""Reavaliação offline: registros malformados viram erro do cenário, não do pool."""
+from prompt_edit.reeval import change_errors, reevaluate, score_change
+from prompt_edit.synth import generate
+
+SECTION = "## 3) Tecnologias padrão"
+
+
+def record(id_, change):
+    return {"id": id_, "expected_action": "add", "expected_section": "Tecnologias", "change": change}
+
+
+def test_malformed_records_are_counted_per_scenario(master_prompt):
+    good = {"section": SECTION, "lineToAdd": "* Vitest", "position": "after", "explanation": ""}
+    records = [
+        record("ok", good),
+        record("null-line", {**good, "lineToAdd": None}),
+        record("bad-position", {**good, "position": "middle"}),
+        record("not-a-dict", "texto livre"),
+        {"id": "no-change", "expected_action": "add", "expected_section": "x"},
+        record("multi", {"changes": [good, {**good, "section": None}]}),
+    ]
+    for workers in (1, 2):
+        report = reevaluate(master_prompt, iter(records), workers=workers, chunk_size=2)
+        assert report["records"] == 6
+        assert report["success"] == 1
+        assert report["apply_errors"] == 5
+        assert {f["id"] for f in report["failures"]} == {"null-line", "bad-position", "not-a-dict",
+                                                         "no-change", "multi"}
+
+
+def test_change_errors_accepts_local_fields():
+    change = {"section": "x", "lineToAdd": "", "position": "replace", "target": "y", "usage": {}}
+    assert change_errors(change) == []
+    assert change_errors({"changes": [change]}) == []
+    assert change_errors({"changes": "x"}) == ["changes não é uma lista"]
+
+
+def test_synth_removal_scores_as_update():
+    doc = generate(20_000)
+    scenario = next(s for s in doc.scenarios if s["name"].startswith("REMOVER"))
+    change = {"section": scenario["expected_section"], "lineToAdd": "", "position": "replace",
+              "target": scenario["replaced_line"], "explanation": ""}
+    score = score_change(doc.text, scenario, change)
+    assert score["action"] == "update" and score["success"]
+    assert scenario["replaced_line"] not in score["updated"].split("\n")
@@ -0,0 +1,55 @@
+"""Histórico de rodadas: comparação por bootstrap e exportação OpenMetrics."""
+import random
+
+from prompt_edit.runs import RunStore, bootstrap_delta, sample
+
+REVISION = ("abc1234", False)
+
+
+def latencies(store: RunStore, mean: float, seed: int, n: int = 40) -> int:
+    rng = random.Random(seed)
+    samples = [sample("gpt-x", "json_only", "master", 5000, latency_s=max(0.01, rng.gauss(mean, 0.1)),
+                      prompt_tokens=1000, completion_tokens=200, valid=True) for _ in range(n)]
+    samples.append(sample("gpt-x", "json_only", "master", 5000, ok=False))
+    return store.record("models", samples, revision=REVISION)
+
+
+def verdicts(comparisons) -> dict:
+    return {c.metric: c.verdict for c in comparisons}
+
+
+def test_bootstrap_interval_contains_true_delta():
+    rng = random.Random(1)
+    base = [rng.gauss(1.0, 0.2) for _ in range(200)]
+    candidate = [rng.gauss(1.5, 0.2) for _ in range(200)]
+    low, high = bootstrap_delta(base, candidate, rng=random.Random(2))
+    assert low < 0.5 < high and low > 0.3
+
+
+def test_compare_flags_regression_and_noise(tmp_path):
+    store = RunStore(str(tmp_path / "runs.sqlite"))
+    base = latencies(store, 1.0, seed=1)
+    noise = latencies(store, 1.0, seed=2)
+    slower = latencies(store, 1.5, seed=3)
+    assert verdicts(store.compare(base, noise)) == {"latency_s": "same", "tokens": "same", "valid": "same"}
+    assert verdicts(store.compare(base, slower))["latency_s"] == "regression"
+    assert verdicts(store.compare(slower, base))["latency_s"] == "improvement"
+    assert store.latest("models")["id"] == slower
+    store.close()
+
+
+def test_openmetrics_export(tmp_path):
+    store = RunStore(str(tmp_path / "runs.sqlite"))
+    run_id = latencies(store, 1.0, seed=1)
+    text = store.openmetrics(run_id)
+    assert text.endswith("# EOF\n")
+    assert 'commit="abc1234"' in text
+    assert 'prompt_edit_samples{harness="models",model="gpt-x"' in text
+    assert any(line.startswith("prompt_edit_valid_ratio") and " 0.9756 " in line for line in text.splitlines())
+    store.close()
+
+
+def test_disabled_store_records_nothing(tmp_path):
+    store = RunStore(str(tmp_path / "runs.sqlite"), enabled=False)
+    assert latencies(store, 1.0, seed=1) == 0
+    assert not (tmp_path / "runs.sqlite").exists()
@@ -0,0 +1,30 @@
+"""Pool assíncrono do harness de cenários: resultados na ordem do corpus."""
+import asyncio
+import random
+
+import test_edit_scenarios as harness
+
+
+def test_run_pool_reports_in_corpus_order(monkeypatch):
+    rng = random.Random(7)
+    delays = {i: rng.uniform(0, 0.02) for i in range(1, 31)}
+    in_flight = peak = 0
+
+    async def fake_edit(client, instruction, **options):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(delays[int(instruction)])
+        in_flight -= 1
+        if int(instruction) % 7 == 0:
+            raise RuntimeError("timeout")
+        return {"instruction": instruction}
+
+    monkeypatch.setattr(harness, "edit_instruction_async", fake_edit)
+    scenarios = ((i, {"id": str(i), "instruction": str(i)}) for i in range(1, 31))
+    done = []
+    asyncio.run(harness.run_pool(scenarios, 4, {}, lambda i, scenario, change, error: done.append((i, error))))
+
+    assert [i for i, _ in done] == list(range(1, 31))
+    assert [i for i, error in done if error] == [7, 14, 21, 28]
+    assert peak <= 4
@@ -0,0 +1,32 @@
+"""Gerador sintético: determinismo, tamanho e gabarito dos cenários."""
+from prompt_edit.outline import Outline
+from prompt_edit.synth import ANCHOR_SECTION, generate, parse_size, write_corpus
+
+
+def test_parse_size():
+    assert (parse_size("10k"), parse_size("1m"), parse_size("5000")) == (10240, 1024 * 1024, 5000)
+
+
+def test_same_seed_same_document():
+    first, second = generate(20_000, seed=3), generate(20_000, seed=3)
+    assert first.text == second.text and first.scenarios == second.scenarios
+    assert generate(20_000, seed=4).text != first.text
+    assert len(first.text.encode("utf-8")) >= 20_000
+
+
+def test_scenarios_point_at_real_sections_and_lines():
+    doc = generate(30_000, scenarios=9)
+    outline = Outline(doc.text)
+    lines = set(doc.text.split("\n"))
+    assert doc.scenarios[0]["expected_section"] == ANCHOR_SECTION
+    for scenario in doc.scenarios:
+        assert outline.find(scenario["expected_section"]) is not None
+        if "replaced_line" in scenario:
+            assert scenario["replaced_line"] in lines
+
+
+def test_write_corpus(tmp_path):
+    (path,) = write_corpus(str(tmp_path), ["10k"], scenarios=3)
+    assert path.endswith("synthetic_10k.md")
+    with open(path.replace(".md", ".scenarios.jsonl"), encoding="utf-8") as f:
+        assert len(f.readlines()) == 3
@@ -0,0 +1,39 @@
+"""Calibração do TokenEstimator por backend."""
+import json
+
+from prompt_edit.tokens import DEFAULT_BACKEND, TokenEstimator
+
+PAYLOAD = {"model": "gpt-4o", "messages": [{"role": "user", "content": "Adicione uma linha à seção 3"}]}
+
+
+def test_calibration_is_kept_per_backend(tmp_path, monkeypatch):
+    path = str(tmp_path / "calibration.json")
+    monkeypatch.setenv("PROMPT_EDIT_TOKEN_CALIBRATION", path)
+
+    monkeypatch.delenv("OPENAI_BASE_URL", raising=False)
+    real = TokenEstimator.from_env()
+    real.observe(PAYLOAD, {"prompt_tokens": 40, "completion_tokens": 10})
+    real.save()
+    real_scale = real.scale("gpt-4o")
+
+    monkeypatch.setenv("OPENAI_BASE_URL", "http://127.0.0.1:8765/v1/")
+    mock = TokenEstimator.from_env()
+    assert mock.scale("gpt-4o") == 1.0
+    mock.observe(PAYLOAD, {"prompt_tokens": 400, "completion_tokens": 10})
+    mock.save()
+
+    monkeypatch.delenv("OPENAI_BASE_URL")
+    assert TokenEstimator.from_env().scale("gpt-4o") == real_scale
+    with open(path, encoding="utf-8") as f:
+        assert set(json.load(f)) == {DEFAULT_BACKEND, "http://127.0.0.1:8765/v1"}
+
+
+def test_legacy_file_belongs_to_real_api(tmp_path, monkeypatch):
+    path = tmp_path / "calibration.json"
+    path.write_text(json.dumps({"gpt-4o": {"raw": 100, "actual": 150, "samples": 3,
+                                           "completion": 30, "responses": 3}}), encoding="utf-8")
+    monkeypatch.setenv("PROMPT_EDIT_TOKEN_CALIBRATION", str(path))
+    monkeypatch.delenv("OPENAI_BASE_URL", raising=False)
+    assert TokenEstimator.from_env().scale("gpt-4o") == 1.5
+    monkeypatch.setenv("OPENAI_BASE_URL", "http://localhost:8765/v1")
+    assert TokenEstimator.from_env().scale("gpt-4o") == 1.0
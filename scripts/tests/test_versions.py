@@ -0,0 +1,54 @@
+"""Histórico de versões com keyframes + deltas, em memória e em gzip."""
+import gzip
+import random
+
+from prompt_edit.versions import VersionStore, apply_delta, make_delta
+
+
+def edited_versions(master_prompt: str, count: int) -> list:
+    rng = random.Random(11)
+    lines = master_prompt.split("\n")
+    texts = []
+    for step in range(count):
+        i = rng.randrange(len(lines) + 1)
+        if rng.random() < 0.3 and lines:
+            del lines[min(i, len(lines) - 1)]
+        else:
+            lines.insert(i, f"* regra {step}")
+        texts.append("\n".join(lines))
+    return texts
+
+
+def test_delta_round_trip(master_prompt):
+    old = master_prompt.split("\n")
+    for text in edited_versions(master_prompt, 10):
+        new = text.split("\n")
+        assert apply_delta(old, make_delta(old, new)) == new
+
+
+def test_every_version_is_reconstructed(master_prompt):
+    texts = edited_versions(master_prompt, 30)
+    store = VersionStore(keyframe_interval=7)
+    for text in texts:
+        store.commit(text)
+    assert len(store) == 30
+    assert store.commit(texts[-1]).number == 30  # texto igual não cria versão
+    assert 1 < store.stats()["keyframes"] < 30
+    for number in random.Random(5).sample(range(1, 31), 30):
+        assert store.get(number) == texts[number - 1]
+
+
+def test_reload_and_truncated_tail(tmp_path, master_prompt):
+    path = str(tmp_path / "v.jsonl.gz")
+    texts = edited_versions(master_prompt, 6)
+    store = VersionStore(path, keyframe_interval=4)
+    for text in texts[:5]:
+        store.commit(text)
+    assert [VersionStore(path).get(n) for n in range(1, 6)] == texts[:5]
+
+    with open(path, "ab") as f:
+        f.write(gzip.compress(b'{"v": 6, "t": 0')[:-6])  # membro cortado no meio
+    damaged = VersionStore(path)
+    assert len(damaged) == 5
+    damaged.commit(texts[5])
+    assert [VersionStore(path).get(n) for n in range(1, 7)] == texts